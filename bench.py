@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the compiler.
+
+    python bench.py sanitize --lines 500000
+    python bench.py static --lines 20000
+    python bench.py memory --lines 200000
+    python bench.py dialogue --rows 200000
+    python bench.py logging --lines 200000
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+import unicodedata
+from pathlib import Path
+
+from src.build import collect_group_actions
+from src.bytecode import bytecode_cache
+from src.compiler import Validator, sanitize, sanitize_text, stream_fsm
+from src.model import ScriptGroup
+from src.records import materialize
+
+
+# ==========================================
+# HELPERS
+# ==========================================
+
+def timed(fn, *args, repeat=3):
+    """Best wall time of `repeat` runs, and the last result."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        sanitize_text.cache_clear()
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def synthetic_script(lines: int, seed: int = 0) -> list[dict]:
+    """
+    A flattened script that looks like a real one: mostly dialogue from a
+    handful of speakers, some typographic quotes, sprites and choices.
+    """
+    rng = random.Random(seed)
+    speakers = ["Cupa", "Andr", "Sumia", "Narrator", ""]
+    plain = ["Hello there!", "What are you doing here?", "I think it's going to rain.", "Let's go home."]
+    fancy = ["“Really?” she said…", "It’s fine — trust me.", "Wait up!", "Line one\nline two"]
+    script = []
+    for i in range(lines):
+        roll = rng.random()
+        if roll < 0.8:
+            script.append({
+                "type": "dialogue", "action": "say",
+                "label": rng.choice(speakers),
+                "content": rng.choice(fancy if rng.random() < 0.2 else plain),
+                "id": i,
+            })
+        elif roll < 0.95:
+            script.append({
+                "type": "show_sprite", "action": "show", "sprite": "cupa",
+                "location": "characters/cupa/default/happy.png", "position": "CENTER",
+                "wRatio": 16, "hRatio": 9, "id": i,
+            })
+        else:
+            script.append({
+                "type": "choice", "action": "choice",
+                "choice": [{"label": "yes", "display": "“Yes”"}, {"label": "no", "display": "No…"}],
+                "id": i,
+            })
+    return script
+
+
+# ==========================================
+# SANITIZE
+# ==========================================
+
+def legacy_sanitize(data_list):
+    """sanitize() as it was before the translate-table rewrite (top-level strings only)."""
+    replacements = {
+        '\u201c': '"', '\u201d': '"', '\u2018': "'", '\u2019': "'",
+        '\u2013': '-', '\u2014': '-', '\u2026': '...', '\u00a0': ' ',
+    }
+
+    def sanitize_string(text):
+        if not isinstance(text, str):
+            return text
+        for old, new in replacements.items():
+            text = text.replace(old, new)
+        return "".join(char if unicodedata.category(char)[0] != "C" else "?" for char in text)
+
+    def sanitize_dict(d):
+        return {k: sanitize_string(v) if isinstance(v, str) else v for k, v in d.items()}
+
+    return [sanitize_dict(d) for d in data_list]
+
+def bench_sanitize(args):
+    script = synthetic_script(args.lines)
+    print(f"sanitize() on {args.lines:,} states")
+
+    legacy_time, legacy = timed(legacy_sanitize, script, repeat=args.repeat)
+    new_time, new = timed(sanitize, script, repeat=args.repeat)
+
+    # Top-level fields must match; the new one also cleans nested values
+    for old_state, new_state in zip(legacy, new):
+        for key, value in old_state.items():
+            if isinstance(value, str):
+                assert new_state[key] == value, (old_state, new_state)
+
+    print(f"  legacy : {legacy_time:8.3f}s")
+    print(f"  current: {new_time:8.3f}s  ({legacy_time / new_time:.1f}x)")
+
+
+# ==========================================
+# STATIC COMPILE
+# ==========================================
+
+def synthetic_source(lines: int, seed: int = 0) -> str:
+    """A Blockly-style project script with `lines` VisualNovelModule calls."""
+    rng = random.Random(seed)
+    body = []
+    for i in range(lines):
+        roll = rng.random()
+        if roll < 0.05:
+            body.append(f"vn.label('scene_{i}')")
+        elif roll < 0.85:
+            body.append(f"vn.say({rng.choice(['Cupa', 'Andr', ''])!r}, {f'Line {i}: ' + rng.choice(['Hello!', 'It’s fine…', 'Let us go.'])!r})")
+        elif roll < 0.95:
+            body.append(f"vn.setVar('counter', {i})")
+        else:
+            body.append("actions_list = [\n    vn.say('', 'inside', nested=True),\n  ]\n  vn.condSame('counter', 1, actions=actions_list)")
+    return (
+        "from src.modules import VisualNovelModule\n\n"
+        "def story():\n"
+        "  vn = VisualNovelModule()\n"
+        + "".join(f"  {line}\n" for line in body)
+        + "  vn.finish()\n"
+    )
+
+def bench_static(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        project = Path(tmp)
+        (project / "chapter.py").write_text(synthetic_source(args.lines), encoding="utf-8")
+        group = ScriptGroup(slug="chapter", name="Chapter", source_files=["chapter.py"])
+        print(f"collect_group_actions() on a {args.lines:,} call script")
+
+        def run(static, cold=False):
+            if cold:
+                bytecode_cache.entries.clear()
+                shutil.rmtree(project / ".cache", ignore_errors=True)
+            actions, _, _, _ = collect_group_actions(project, "bench", group, [], static=static)
+            return json.dumps(materialize(list(actions)))
+
+        # Both caches emptied first, so "cold" really compiles from source
+        cold_time, executed = timed(run, False, True, repeat=args.repeat)
+        warm_time, _ = timed(run, False, repeat=args.repeat)
+        static_time, lowered = timed(run, True, repeat=args.repeat)
+        assert executed == lowered, "static output differs from execution"
+
+    print(f"  exec (no bytecode cache): {cold_time:8.3f}s")
+    print(f"  exec (bytecode cached)  : {warm_time:8.3f}s  ({cold_time / warm_time:.1f}x)")
+    print(f"  static                  : {static_time:8.3f}s  ({cold_time / static_time:.1f}x)")
+
+
+# ==========================================
+# MEMORY
+# ==========================================
+
+def traced(fn, *args):
+    """(bytes still allocated by fn's result, peak bytes during the call, result)."""
+    tracemalloc.start()
+    try:
+        result = fn(*args)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current, peak, result
+
+def bench_memory(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        project = Path(tmp)
+        (project / "chapter.py").write_text(synthetic_source(args.lines), encoding="utf-8")
+        group = ScriptGroup(slug="chapter", name="Chapter", source_files=["chapter.py"])
+        print(f"dialogueDict of a {args.lines:,} call script")
+
+        def collect():
+            actions, _, _, _ = collect_group_actions(project, "bench", group, [])
+            # Not the origins, which are the same either way
+            actions.origins = None
+            return actions
+
+        # Compiled once up front, so the bytecode cache is not part of the measurement
+        collect()
+        records_bytes, records_peak, actions = traced(collect)
+        # What every call allocated before: one dict per action
+        dicts_bytes, _, dicts = traced(materialize, list(actions))
+        assert json.dumps(dicts) == json.dumps(materialize(list(actions)))
+
+    print(f"  dicts  : {dicts_bytes / 2**20:8.1f} MiB")
+    print(f"  records: {records_bytes / 2**20:8.1f} MiB  ({dicts_bytes / records_bytes:.1f}x less, peak {records_peak / 2**20:.1f} MiB)")
+
+
+# ==========================================
+# DIALOGUE IMPORT
+# ==========================================
+
+class DigestSink:
+    """A binary 'file' that only keeps the sha256 of what is written to it."""
+    def __init__(self):
+        self.hash = hashlib.sha256()
+
+    def write(self, data: bytes):
+        self.hash.update(data)
+
+def synthetic_rows(rows: int, seed: int = 0) -> list[tuple]:
+    """(label, speaker, text) rows of a spreadsheet-drafted scene."""
+    rng = random.Random(seed)
+    return [
+        (f"scene_{i}" if rng.random() < 0.05 else "", rng.choice(["Cupa", "Andr", ""]), f"Line {i}: " + rng.choice(["Hello!", "It’s fine…", "Let us go."]))
+        for i in range(rows)
+    ]
+
+def bench_dialogue(args):
+    rows = synthetic_rows(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        project = Path(tmp)
+        # The same scene written as vn calls, and as a CSV the group lists directly
+        body = "".join(
+            (f"  vn.label({label!r})\n" if label else "") + f"  vn.say({speaker!r}, {text!r})\n"
+            for label, speaker, text in rows
+        )
+        (project / "scene.py").write_text("from src.modules import VisualNovelModule\n\ndef story():\n  vn = VisualNovelModule()\n" + body, encoding="utf-8")
+        with open(project / "scene.csv", "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["label", "speaker", "text"])
+            writer.writerows(rows)
+        print(f"streamed compile of a {args.rows:,} row scene")
+
+        def compile_from(filename):
+            group = ScriptGroup(slug="scene", name="Scene", source_files=[filename])
+            actions, origins, _, _ = collect_group_actions(project, "bench", group, [])
+            sink = DigestSink()
+            stream_fsm(actions, [sink], "compact", origins, Validator())
+            return sink.hash.hexdigest()
+
+        # Compiled once up front, so the bytecode cache is not part of the measurement
+        compile_from("scene.py")
+        script_time, script_digest = timed(compile_from, "scene.py", repeat=args.repeat)
+        csv_time, csv_digest = timed(compile_from, "scene.csv", repeat=args.repeat)
+        assert script_digest == csv_digest, "the import compiles to something else than the script"
+        _, script_peak, _ = traced(compile_from, "scene.py")
+        _, csv_peak, _ = traced(compile_from, "scene.csv")
+
+    print(f"  script: {script_time:8.3f}s  peak {script_peak / 2**20:8.1f} MiB")
+    print(f"  csv   : {csv_time:8.3f}s  peak {csv_peak / 2**20:8.1f} MiB  ({script_time / csv_time:.1f}x faster)")
+
+
+# ==========================================
+# LOGGING
+# ==========================================
+
+def bench_logging(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        project = Path(tmp)
+        (project / "chapter.py").write_text(synthetic_source(args.lines), encoding="utf-8")
+        group = ScriptGroup(slug="chapter", name="Chapter", source_files=["chapter.py"])
+        print(f"collect_group_actions() on a {args.lines:,} call script")
+
+        sdk_log = logging.getLogger("src")
+        def run(level):
+            sdk_log.setLevel(level)
+            actions, _, _, _ = collect_group_actions(project, "bench", group, [])
+            return len(actions)
+
+        # Compiled once up front, so the bytecode cache is not part of the measurement
+        run(logging.WARNING)
+        # DEBUG is the line per action every compile used to print; written
+        # to os.devnull, so a real console would only make it slower
+        with open(os.devnull, "w", encoding="utf-8") as devnull:
+            handler = logging.StreamHandler(devnull)
+            sdk_log.addHandler(handler)
+            sdk_log.propagate = False
+            try:
+                verbose_time, _ = timed(run, logging.DEBUG, repeat=args.repeat)
+                quiet_time, _ = timed(run, logging.WARNING, repeat=args.repeat)
+            finally:
+                sdk_log.removeHandler(handler)
+                sdk_log.propagate = True
+                sdk_log.setLevel(logging.NOTSET)
+
+    print(f"  every action logged (DEBUG): {verbose_time:8.3f}s")
+    print(f"  quiet (default)            : {quiet_time:8.3f}s  ({verbose_time / quiet_time:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compiler micro-benchmarks.")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("sanitize", help="sanitize() against the old implementation")
+    p.add_argument("--lines", type=int, default=500_000)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_sanitize)
+
+    p = sub.add_parser("static", help="static (AST) compile against executing the script")
+    p.add_argument("--lines", type=int, default=20_000)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_static)
+
+    p = sub.add_parser("memory", help="memory held by the dialogueDict: records against dicts")
+    p.add_argument("--lines", type=int, default=200_000)
+    p.set_defaults(func=bench_memory)
+
+    p = sub.add_parser("dialogue", help="importing a CSV scene against the same scene as a script")
+    p.add_argument("--rows", type=int, default=200_000)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_dialogue)
+
+    p = sub.add_parser("logging", help="compile time with every action logged against the quiet default")
+    p.add_argument("--lines", type=int, default=200_000)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_logging)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
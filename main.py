@@ -1,4 +1,5 @@
 import uvicorn
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -6,8 +7,24 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, HTMLResponse
 
 from routes import project_route, library_route
+from src import workers
+from src.precompile import precompiler
+from src.jobs import job_manager
+from src.log import configure_logging
 
-app = FastAPI(title="MobTalker SDK")
+# Quiet unless HIKARIN_LOG_LEVEL says otherwise (see src/log.py)
+configure_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start the script workers up front so the first compile is not the slow one
+    workers.warm_up()
+    yield
+    job_manager.shutdown()
+    precompiler.shutdown()
+    workers.shutdown()
+
+app = FastAPI(title="MobTalker SDK", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
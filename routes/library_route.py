@@ -1,5 +1,6 @@
 import shutil
 import json
+import logging
 import os
 from pathlib import Path
 from typing import List, Dict, Literal
@@ -10,8 +11,11 @@ from dataclasses import asdict
 
 # Import Models
 from src.model import Character, AssetFile
+from src.character_cache import character_cache
+from src.precompile import precompiler
 
 router = APIRouter(prefix="/api/library", tags=["Library"])
+log = logging.getLogger(__name__)
 
 # CONFIG: Where the assets live
 LIBRARY_DIR = Path("library")
@@ -33,6 +37,7 @@ def get_all_characters():
     """
     Scans library/characters/{id}/data.json
     Returns a list of all defined characters.
+    Unchanged files come from the character cache (see src/character_cache.py).
     """
     chars = []
     for folder in CHAR_DIR.iterdir():
@@ -40,14 +45,21 @@ def get_all_characters():
             data_file = folder / "data.json"
             if data_file.exists():
                 try:
-                    with open(data_file, "r") as f:
-                        data = json.load(f)
-                        # Convert dict to Character dataclass to ensure validity
-                        chars.append(Character(**data))
+                    data = character_cache.load(data_file)
+                    # Convert dict to Character dataclass to ensure validity
+                    chars.append(Character(**data))
                 except Exception as e:
-                    print(f"Failed to load character in {folder}: {e}")
+                    log.error("Failed to load character in %s: %s", folder, e)
     return chars
 
+@router.get("/characters/cache-stats")
+def get_character_cache_stats():
+    """
+    Hits, misses and invalidations of the character cache in this server process
+    (hits and misses of the scripts it ran in worker processes included).
+    """
+    return character_cache.stats()
+
 @router.post("/characters")
 def save_character(character: Character):
     """
@@ -61,8 +73,11 @@ def save_character(character: Character):
     with open(file_path, "w") as f:
         # asdict converts the dataclass to a clean dictionary
         json.dump(asdict(character), f, indent=4)
-        
-    return {"status": "saved", "id": character.id}
+    character_cache.invalidate(file_path)
+    # Recompile the groups that use this character in the background
+    precompiling = precompiler.character_saved(character.id)
+
+    return {"status": "saved", "id": character.id, "precompiling": precompiling}
 
 @router.delete("/characters/{char_id}")
 def delete_character(char_id: str):
@@ -72,7 +87,9 @@ def delete_character(char_id: str):
         raise HTTPException(404, "Character not found")
     
     shutil.rmtree(folder)
-    return {"status": "deleted"}
+    character_cache.invalidate(folder / "data.json")
+    precompiling = precompiler.character_saved(char_id)
+    return {"status": "deleted", "precompiling": precompiling}
 
 # ==========================================
 # 2. CHARACTER ASSETS (Skins/Voice)
@@ -179,6 +196,8 @@ async def upload_character_profile_image(
         f.seek(0)
         json.dump(data, f, indent=2)
         f.truncate()
+    character_cache.invalidate(meta_file)
+    precompiler.character_saved(char_id)
 
     return {
         "status": "uploaded",
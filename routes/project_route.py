@@ -1,25 +1,32 @@
 import os
 import shutil
 import json
-import sys
-import importlib.util
-import traceback
+import logging
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional
 from dataclasses import asdict
-from fastapi import APIRouter, HTTPException, Body
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Body, Depends, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 
 # Import Models
-from src.modules import VisualNovelModule
 from src.minecraft_export import export_resource_pack
-from src.model import ProjectManifest, ScriptGroup
+from src.model import ProjectManifest
 
 # Import the Compiler Logic (The Processor)
-# Assuming src/compiler.py has the process_fsm function we discussed
-from src.compiler import process_fsm
+from src.build import CompileOptions, ensure_sdk_path, compile_groups
+from src.cache import CachedResult, CompileCache, group_digest, result_cache
+from src.compiler import ScriptValidationError, encode_json
+from src.instrument import compile_stats
+from src.precompile import build_preview, precompiler, preview_key
+from src.project_index import ManifestError, project_indexes
+from src.symbols import SYMBOLS_FILE, build_symbol_table, cross_group_diagnostics, external_labels, groups_from_table, load_symbol_table
+from src.jobs import Job, JobCancelled, JobFailed, JobQueueFull, job_manager
+from src.character_cache import character_cache
+from src.bytecode import bytecode_cache
+from src.dialogue_import import DIALOGUE_FORMATS
 
 router = APIRouter(prefix="/api/projects", tags=["Projects"])
+log = logging.getLogger(__name__)
 
 # CONFIG: Where projects live
 PROJECTS_DIR = Path("projects")
@@ -76,6 +83,7 @@ def create_project(manifest: ProjectManifest):
     with open(manifest_path, "w") as f:
         # Convert dataclass to dict (handles nested ScriptGroups automatically)
         json.dump(asdict(manifest), f, indent=4) # Use asdict import from dataclasses
+    project_indexes.invalidate(folder)
     
     # 3. Create Initial Script
 
@@ -106,6 +114,7 @@ def delete_project(slug: str):
     if not folder.exists():
         raise HTTPException(404, "Project not found")
     shutil.rmtree(folder)
+    project_indexes.forget(folder)
     return {"status": "deleted"}
 
 # ==========================================
@@ -114,13 +123,13 @@ def delete_project(slug: str):
 
 @router.get("/{slug}/files")
 def list_project_files(slug: str):
-    """Returns all .py and .json files in the project root."""
+    """Returns all .py, .json and dialogue (.csv, .tsv, .jsonl) files in the project root."""
     folder = PROJECTS_DIR / slug
     if not folder.exists(): raise HTTPException(404, "Project not found")
     
     files = []
     for f in folder.glob("*"):
-        if f.is_file() and f.suffix in ['.py', '.json']:
+        if f.is_file() and (f.suffix in ['.py', '.json'] or f.suffix in DIALOGUE_FORMATS):
             files.append(f.name)
     return files
 
@@ -137,8 +146,8 @@ def write_file(slug: str, filename: str, content: str = Body(..., embed=True)):
     path = folder / filename
     
     # Basic validation
-    if not (filename.endswith(".py") or filename.endswith(".json")):
-        raise HTTPException(400, "Only .py and .json allowed")
+    if not (filename.endswith(".py") or filename.endswith(".json") or Path(filename).suffix in DIALOGUE_FORMATS):
+        raise HTTPException(400, "Only .py, .json and dialogue files (.csv, .tsv, .jsonl) allowed")
     
     # If writing to manifest, validate JSON
     if filename == "manifest.json":
@@ -148,246 +157,478 @@ def write_file(slug: str, filename: str, content: str = Body(..., embed=True)):
             raise HTTPException(400, "Invalid JSON format")
 
     path.write_text(content, encoding="utf-8")
-    return {"status": "saved"}
+    if filename == "manifest.json":
+        project_indexes.invalidate(folder)
+    # Compile the affected groups in the background so the next Run is instant
+    precompiling = precompiler.file_saved(folder, slug, filename)
+    return {"status": "saved", "precompiling": precompiling}
+
+# ==========================================
+# RESPONSE HELPERS
+# ==========================================
+
+def accepts_gzip(request: Request) -> bool:
+    """True if the client's Accept-Encoding allows gzip (and does not set q=0)."""
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses the weak comparison: W/ prefixes are ignored."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+def cached_json_response(request: Request, entry: CachedResult, cache_status: str) -> Response:
+    """
+    Sends a ResultCache entry with its ETag, or a bodiless 304 if the client
+    already has it. The gzipped form gets its own ETag (same bytes, different
+    representation).
+    """
+    use_gzip = entry.gzipped is not None and accepts_gzip(request)
+    etag = entry.etag[:-1] + '-gzip"' if use_gzip else entry.etag
+    # no-cache: the client may keep it, but has to revalidate before reusing it
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Compile-Cache": cache_status}
+    if entry.gzipped is not None:
+        headers["Vary"] = "Accept-Encoding"
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=entry.gzipped, media_type="application/json", headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
 
 # ==========================================
 # 3. THE COMPILER (The Orchestrator)
 # ==========================================
 
+@router.get("/compile-stats")
+def get_compile_stats(project: Optional[str] = None):
+    """
+    Rolling percentiles (ms) of recent compiles in this server process:
+    total wall/CPU time, time per phase, and the slowest projects first.
+    Pass project=<slug> to only look at one project.
+    Also reports the compile_temp result cache (hits, misses, evictions, size),
+    the background precompiler, the character cache and the script bytecode cache.
+    """
+    return {
+        **compile_stats.summary(project),
+        "result_cache": result_cache.stats(),
+        "precompile": precompiler.stats(),
+        "character_cache": character_cache.stats(),
+        "bytecode_cache": bytecode_cache.stats(),
+    }
+
 @router.post("/{slug}/compile")
-def compile_project(slug: str):
+def compile_project(slug: str, force: bool = False, jobs: int = 1, options: CompileOptions = Depends()):
+    """
+    Compiles every script group into 'generated/{group}.json'.
+    Groups whose sources, SDK and characters are unchanged since the last
+    compile are skipped (pass force=true to rebuild everything).
+    With jobs > 1, up to that many groups are compiled in parallel worker processes (no more than one per CPU).
+    See CompileOptions for the other query parameters.
+    (POST /{slug}/jobs/compile does the same in the background.)
+    """
+    return run_compile(slug, force, jobs, options)
+
+def run_compile(slug: str, force: bool = False, jobs: int = 1, options: Optional[CompileOptions] = None, progress: Optional[Callable[..., None]] = None) -> dict:
+    """
+    The body of compile_project. progress, if given, is called as
+    progress("groups", done=n, total=n, group=slug) after every group.
+    Errors are raised as HTTPException.
+    """
+    options = options or CompileOptions()
     project_path = PROJECTS_DIR / slug
     if not project_path.exists():
         raise HTTPException(status_code=404, detail="Project not found")
 
-    manifest_path = project_path / "manifest.json"
     output_dir = project_path / "generated"
     output_dir.mkdir(exist_ok=True)
 
-    # 1. Load Manifest
+    # 1. Load Manifest (cached until manifest.json changes)
     try:
-        with open(manifest_path) as f:
-            data = json.load(f)
-            script_groups = [ScriptGroup(**g) for g in data.get("script_groups", [])]
-        if not script_groups: # Handle empty or missing script_groups
-             script_groups = [ScriptGroup(slug="behavior", name="Main", source_files=["main.py"])]
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to load or parse manifest.json: {e}")
+        index = project_indexes.get(project_path)
+    except ManifestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    script_groups = index.script_groups
 
     # Ensure SDK is in path
-    if str(Path.cwd()) not in sys.path:
-        sys.path.append(str(Path.cwd()))
+    ensure_sdk_path()
 
-    compilation_report = {}
-    logs = []
+    cache = CompileCache(project_path)
+    reports = {}
+    group_logs = {}
+    cache_hits = []
 
     # WRAP THE ENTIRE COMPILATION PROCESS IN A TRY/EXCEPT
     try:
-        # 2. LOOP THROUGH EACH SCRIPT GROUP
+        # 2. Labels each group's events name in other groups, worked out before anything
+        # compiles (the optimizer keeps them, the validator does not call them unreachable):
+        # unchanged groups' events come from the cache, the others' from their last compile
+        keys = {group.slug: group_digest(project_path, group, asdict(options)) for group in script_groups}
+        known = groups_from_table(load_symbol_table(output_dir) or {})
+        known.update(index.group_symbols)
+        known = {group.slug: cache.cached_symbols(group.slug, keys[group.slug]) or known.get(group.slug, {}) for group in script_groups}
+        external = {group.slug: external_labels(group.slug, known) for group in script_groups}
+
+        # 3. Skip groups that did not change since the last compile
+        stale_groups = []
         for group in script_groups:
-            logs.append(f"--- Compiling Group: {group.name} ({group.slug}.json) ---")
-            
-            VisualNovelModule.reset()
-
-            # 3. Execute all Python Files in this Group
-            for filename in group.source_files:
-                file_path = project_path / filename
-                if not file_path.exists():
-                    logs.append(f"  [Skip] {filename} not found")
-                    continue
-                
-                module_name = f"proj_{slug}_{group.slug}_{filename.replace('.', '_')}"
-
-                # Force reload of module to get code changes
-                if module_name in sys.modules:
-                    del sys.modules[module_name]
-
-                spec = importlib.util.spec_from_file_location(module_name, file_path)
-                if not (spec and spec.loader):
-                    raise Exception(f"Could not create module spec for {filename}")
-
-                user_module = importlib.util.module_from_spec(spec)
-                sys.modules[module_name] = user_module
-                spec.loader.exec_module(user_module)
-                
-                if hasattr(user_module, "story"):
-                    user_module.story()
-                    logs.append(f"  [OK] {filename}: Executed successfully")
-                else:
-                    logs.append(f"  [WARN] {filename}: No story() function")
-
-            # 4. Compile the Group to JSON
-            final_story_list = VisualNovelModule().to_list()
-
-            if final_story_list:
-                # This is where your custom check() function will raise a ValueError
-                final_fsm = process_fsm(final_story_list)
-                
-                output_file = output_dir / f"{group.slug}.json"
-                with open(output_file, "w", encoding='utf-8') as f:
-                    json.dump(final_fsm, f, indent=4)
-                
-                compilation_report[group.slug] = {"status": "success", "states": len(final_fsm)}
+            cached = None if force else cache.lookup(group, keys[group.slug], output_dir, external[group.slug])
+            if cached is not None:
+                group_logs[group.slug] = [f"--- Cached Group: {group.name} ({group.slug}.json) ---"]
+                reports[group.slug] = {**cached, "cached": True}
+                cache_hits.append(group.slug)
+                index.record_build(group.slug, cache.entries[group.slug]["characters"], cached.get("assets", []), cached.get("symbols"))
             else:
-                compilation_report[group.slug] = {"status": "empty"}
+                cache.forget(group.slug)
+                stale_groups.append(group)
+        done = len(cache_hits)
+        if progress:
+            progress("groups", force=True, done=done, total=len(script_groups), cached=done)
+
+        def record(group, report, logs, character_ids):
+            group_logs[group.slug] = logs
+            reports[group.slug] = {**report, "cached": False}
+            compile_stats.record(slug, group.slug, "compile", report["timings"])
+            index.record_build(group.slug, character_ids, report.get("assets", []), report.get("symbols"))
+            # Timings describe this run, not the cached outputs
+            cache.store(group, keys[group.slug], character_ids, {k: v for k, v in report.items() if k != "timings"}, external[group.slug])
+
+        # 4. Execute the Python files of every stale group and compile them to JSON
+        for group, report, logs, character_ids in compile_groups(project_path, slug, stale_groups, output_dir, jobs, options, external):
+            record(group, report, logs, character_ids)
+            done += 1
+            if progress:
+                progress("groups", done=done, total=len(script_groups), group=group.slug)
+
+        # 5. The events of the groups that just compiled may name other labels than last
+        # time; compile the groups whose external labels changed again (their own events
+        # did not change, so once is enough)
+        group_symbols = {g.slug: reports[g.slug]["symbols"] for g in script_groups if reports[g.slug].get("symbols")}
+        previous, external = external, {group.slug: external_labels(group.slug, group_symbols) for group in script_groups}
+        changed = [group for group in script_groups if external[group.slug] != previous[group.slug]]
+        if changed:
+            for group in changed:
+                cache_hits = [hit for hit in cache_hits if hit != group.slug]
+                cache.forget(group.slug)
+            for group, report, logs, character_ids in compile_groups(project_path, slug, changed, output_dir, jobs, options, external):
+                record(group, report, logs, character_ids)
+                if progress:
+                    progress("groups", done=done, total=len(script_groups), group=group.slug)
+
+        # 6. Resolve events across groups and ship the project symbol table
+        group_symbols = {g.slug: reports[g.slug]["symbols"] for g in script_groups if reports[g.slug].get("symbols")}
+        symbol_table = build_symbol_table(group_symbols)
+        cross_diagnostics = cross_group_diagnostics(group_symbols, symbol_table)
+        errors = [d for d in cross_diagnostics if d.severity == "error"]
+        if errors:
+            raise ScriptValidationError(cross_diagnostics, errors[0].group)
+        for d in cross_diagnostics:
+            reports[d.group]["diagnostics"] = reports[d.group]["diagnostics"] + [asdict(d)]
+        (output_dir / SYMBOLS_FILE).write_bytes(encode_json(symbol_table, options.profile))
+
+        # 7. Merge everything back in manifest order (the symbols are in symbols.json)
+        compilation_report = {g.slug: {k: v for k, v in reports[g.slug].items() if k != "symbols"} for g in script_groups}
+        logs = [line for g in script_groups for line in group_logs[g.slug]]
 
         # If we get here, everything was successful
         return {
             "message": "Project Compiled Successfully",
             "report": compilation_report,
+            "cache_hits": cache_hits,
             "logs": logs
         }
 
+    except JobCancelled:
+        raise
     # THIS IS THE KEY: CATCH THE SPECIFIC ERROR FROM YOUR COMPILER
+    except ScriptValidationError as e:
+        # Every problem check() found, with the file and line that caused it
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": f"Script Error: {str(e)}",
+                "group": e.group,
+                "diagnostics": [asdict(d) for d in e.diagnostics]
+            }
+        )
     except ValueError as e:
         # This will catch the "Label not found" or "Duplicate action" errors from check()
-        traceback.print_exc()
+        log.info("Script error compiling %s", slug, exc_info=True)
         raise HTTPException(
             status_code=400, # Bad Request, because the user's script is wrong
             detail=f"Script Error: {str(e)}"
         )
     # CATCH ANY OTHER UNEXPECTED ERRORS
     except Exception as e:
-        traceback.print_exc() # Log the full error to your server console for debugging
+        log.exception("Compiling %s failed", slug) # Log the full error to your server console for debugging
         # Return a generic but helpful error to the user
         raise HTTPException(
             status_code=500, # Internal Server Error
             detail=f"An unexpected compilation error occurred: {type(e).__name__} - {str(e)}"
         )
+    finally:
+        # Groups that compiled before an error are still valid cache entries
+        cache.save()
+
+@router.get("/{slug}/dependencies")
+def get_dependencies(slug: str):
+    """
+    The project's dependency index: which groups each file belongs to, and
+    the characters and assets each group used the last time it was compiled.
+    """
+    project_path = PROJECTS_DIR / slug
+    if not project_path.exists():
+        raise HTTPException(404, "Project not found")
+    try:
+        index = project_indexes.get(project_path)
+    except ManifestError as e:
+        raise HTTPException(400, str(e))
+    return {
+        "files": index.file_groups,
+        "groups": {
+            group.slug: {
+                "files": group.source_files,
+                "characters": sorted(index.group_characters.get(group.slug, ())),
+                "assets": sorted(index.group_assets.get(group.slug, ())),
+            }
+            for group in index.script_groups
+        },
+    }
 
 @router.get("/{slug}/export")
-def export_project(slug: str):
+def export_project(slug: str, binary: bool = False):
     """
     Triggers the Minecraft Resource Pack generation.
+    With binary=true, compiled '.hfsm' scripts are included too.
     Returns the ZIP file as a download.
+    (POST /{slug}/jobs/export does the same in the background.)
     """
+    zip_path = run_export(slug, binary)
+
+    # Return file for download
+    return FileResponse(
+        path=zip_path, 
+        filename=zip_path.name, 
+        media_type='application/zip'
+    )
+
+def run_export(slug: str, binary: bool = False, progress: Optional[Callable[..., None]] = None) -> Path:
+    """The body of export_project; see export_resource_pack for progress. Returns the zip's path."""
     project_path = PROJECTS_DIR / slug
-    manifest_path = project_path / "manifest.json"
     
     if not project_path.exists():
         raise HTTPException(404, "Project not found")
         
-    # Load Manifest
-    if manifest_path.exists():
-        with open(manifest_path) as f:
-            data = json.load(f)
-            # Strip keys that aren't part of ProjectManifest
-            # (e.g. 'path' injected by list_projects at runtime)
-            import dataclasses
-            valid_keys = {f.name for f in dataclasses.fields(ProjectManifest)}
-            clean_data = {k: v for k, v in data.items() if k in valid_keys}
-            manifest = ProjectManifest(**clean_data)
-    else:
-        # Fallback if manifest is missing
-        manifest = ProjectManifest(slug=slug, name=slug)
+    # Load Manifest (a missing one falls back to the defaults)
+    try:
+        manifest = project_indexes.get(project_path).manifest
+    except ManifestError as e:
+        raise HTTPException(400, str(e))
 
     try:
         # CALL THE BUILDER
-        zip_path_str = export_resource_pack(slug, manifest)
-        zip_path = Path(zip_path_str)
-        
-        # Return file for download
-        return FileResponse(
-            path=zip_path, 
-            filename=zip_path.name, 
-            media_type='application/zip'
-        )
-        
+        return Path(export_resource_pack(slug, manifest, include_binary=binary, progress=progress))
+    except JobCancelled:
+        raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        log.exception("Exporting %s failed", slug)
         raise HTTPException(500, f"Export failed: {str(e)}")
     
 
+@router.get("/{slug}/generated/{group_slug}")
+def get_generated(slug: str, group_slug: str, request: Request):
+    """
+    Returns a compiled group from the generated folder.
+    If the group was compiled with profile=compact, the precompressed
+    '.json.gz' is sent directly to clients that accept gzip.
+    """
+    output_dir = PROJECTS_DIR / slug / "generated"
+    json_path = output_dir / f"{group_slug}.json"
+    if not json_path.exists():
+        raise HTTPException(404, f"Group '{group_slug}' has not been compiled yet.")
+
+    gzip_path = output_dir / f"{group_slug}.json.gz"
+    if accepts_gzip(request) and gzip_path.exists() and gzip_path.stat().st_mtime >= json_path.stat().st_mtime:
+        return Response(
+            content=gzip_path.read_bytes(),
+            media_type="application/json",
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+        )
+    return FileResponse(path=json_path, media_type="application/json", headers={"Vary": "Accept-Encoding"})
+
 @router.post("/{slug}/compile_temp/{group_slug}")
-def compile_temp(slug: str, group_slug: str):
+def compile_temp(slug: str, group_slug: str, request: Request, options: CompileOptions = Depends()):
     """
     Compiles a specific script group in memory and returns the JSON structure directly.
     Does NOT save to the generated folder.
     Useful for previews or debugging specific sections.
+    With profile=compact the payload is minified and gzipped for clients that accept it.
+
+    Results are kept in an in-memory LRU keyed by the group's inputs (sources,
+    SDK, options, characters), so pressing Run again does not recompile.
+    Responses carry a strong ETag: send it back in If-None-Match to get a 304.
+    A cached response's timings are those of the compile that produced it.
     """
     project_path = PROJECTS_DIR / slug
     if not project_path.exists():
         raise HTTPException(404, "Project not found")
 
-    manifest_path = project_path / "manifest.json"
-    
-    # 1. Load Manifest to find the specific Group
-    target_group = None
-    
-    # Default fallback if manifest missing (legacy/single file mode)
-    if not manifest_path.exists() and group_slug == "behavior":
-        target_group = ScriptGroup(slug="behavior", name="Main", source_files=["main.py"])
-    elif manifest_path.exists():
-        try:
-            with open(manifest_path) as f:
-                data = json.load(f)
-                if "script_groups" in data:
-                    for g_data in data["script_groups"]:
-                        if g_data["slug"] == group_slug:
-                            target_group = ScriptGroup(**g_data)
-                            break
-        except Exception as e:
-            raise HTTPException(500, f"Error reading manifest: {e}")
+    # 1. Find the group in the project index (a missing manifest means the legacy 'behavior' group)
+    try:
+        target_group = project_indexes.get(project_path).group(group_slug)
+    except ManifestError as e:
+        raise HTTPException(500, str(e))
 
     if not target_group:
         raise HTTPException(404, f"Script Group '{group_slug}' not found in manifest.")
 
     # Ensure SDK is in path
-    if str(Path.cwd()) not in sys.path:
-        sys.path.append(str(Path.cwd()))
+    ensure_sdk_path()
 
-    try:
-        VisualNovelModule.reset()
-        
-        for filename in target_group.source_files:
-            file_path = project_path / filename
-            if not file_path.exists():
-                raise HTTPException(400, f"Source file '{filename}' missing.")
-
-            module_name = f"proj_{slug}_{group_slug}_{filename.replace('.', '_')}"
-            if module_name in sys.modules:
-                del sys.modules[module_name]
-
-            spec = importlib.util.spec_from_file_location(module_name, file_path)
-            if not (spec and spec.loader):
-                raise Exception("Could not create module spec")
-
-            user_module = importlib.util.module_from_spec(spec)
-            sys.modules[module_name] = user_module
-            spec.loader.exec_module(user_module)
-            
-            if hasattr(user_module, "story"):
-                user_module.story()
-
-        # Process into FSM (Compile Logic)
-        final_story_list = VisualNovelModule().to_list()
-        
-        if not final_story_list:
-            return {"status": "success", "data": [], "state_count": 0, "group": group_slug}
+    # Same inputs, same bytes: answer from the result cache.
+    # A save may already be compiling this group in the background; let it finish.
+    precompiler.remember_options(slug, group_slug, options)
+    precompiler.wait(slug, group_slug)
+    cache_key = preview_key(project_path, slug, target_group, options)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached_json_response(request, cached, "hit")
 
-        # Your custom compiler error will be raised here
-        final_fsm = process_fsm(final_story_list)
-        
-        # Return the JSON directly on success
-        return {
-            "status": "success",
-            "group": group_slug,
-            "state_count": len(final_fsm),
-            "data": final_fsm
-        }
+    try:
+        cached = result_cache.put(cache_key, build_preview(project_path, slug, target_group, options))
         
+    except FileNotFoundError as e:
+        raise HTTPException(400, str(e))
+    except ScriptValidationError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": f"Script Validation Error: {str(e)}",
+                "group": e.group,
+                "diagnostics": [asdict(d) for d in e.diagnostics]
+            }
+        )
     # CATCH THE USER'S SCRIPT ERROR
     except ValueError as e:
-        traceback.print_exc()
+        log.info("Script error compiling %s/%s", slug, group_slug, exc_info=True)
         raise HTTPException(
             status_code=400, # Bad script input
             detail=f"Script Validation Error: {str(e)}"
         )
     # CATCH ANY OTHER ERROR
     except Exception as e:
-        traceback.print_exc()
+        log.exception("Compiling %s/%s failed", slug, group_slug)
         raise HTTPException(
             status_code=500, # Something else went wrong on the server
             detail=f"Compilation Failed: {type(e).__name__} - {str(e)}"
-        )
\ No newline at end of file
+        )
+
+    return cached_json_response(request, cached, "miss")
+
+# ==========================================
+# 4. BACKGROUND JOBS (compile / export)
+# ==========================================
+
+def _as_job(run: Callable[..., Any], job: Job, *args) -> Any:
+    """Runs a run_* function for a job: HTTP errors fail the job with the same status and detail."""
+    try:
+        return run(*args, progress=job.progress)
+    except HTTPException as e:
+        raise JobFailed(e.status_code, e.detail)
+
+def _submit_job(kind: str, slug: str, work: Callable[[Job], dict]) -> dict:
+    if not (PROJECTS_DIR / slug).exists():
+        raise HTTPException(404, "Project not found")
+    try:
+        job = job_manager.submit(kind, slug, work)
+    except JobQueueFull as e:
+        raise HTTPException(429, f"Too many jobs: {e}")
+    return {"job_id": job.id, "status": job.status, "events": f"/api/projects/jobs/{job.id}/events"}
+
+def _get_job(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job
+
+@router.post("/{slug}/jobs/compile")
+def submit_compile_job(slug: str, force: bool = False, jobs: int = 1, options: CompileOptions = Depends()):
+    """
+    compile_project as a background job. Returns its id right away; follow it
+    with GET /jobs/{id} or the SSE stream at /jobs/{id}/events.
+    """
+    return _submit_job("compile", slug, lambda job: _as_job(run_compile, job, slug, force, jobs, options))
+
+@router.post("/{slug}/jobs/export")
+def submit_export_job(slug: str, binary: bool = False):
+    """export_project as a background job; the zip is then at /jobs/{id}/download."""
+    def work(job: Job) -> dict:
+        zip_path = _as_job(run_export, job, slug, binary)
+        return {"file": zip_path.name, "bytes": zip_path.stat().st_size, "download": f"/api/projects/jobs/{job.id}/download"}
+    return _submit_job("export", slug, work)
+
+@router.get("/jobs")
+def list_jobs(project: Optional[str] = None):
+    """Recent jobs (all projects, or one), oldest first."""
+    return [job.to_dict() for job in job_manager.list(project)]
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status, latest progress per stage, and the result or error once finished."""
+    return _get_job(job_id).to_dict()
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Cancels a queued or running job (a running one stops at its next progress report)."""
+    if job_manager.cancel(job_id) is None:
+        raise HTTPException(404, "Job not found")
+    return _get_job(job_id).to_dict()
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """
+    Server-Sent Events: one event per progress report ('groups', 'copy', 'zip')
+    and per status change ('status'), with the job's event number as the id.
+    Reconnecting clients resume after their Last-Event-ID. The stream ends
+    after the final status event.
+    """
+    job = _get_job(job_id)
+    try:
+        last_seq = int(request.headers.get("last-event-id", 0))
+    except ValueError:
+        last_seq = 0
+
+    # Async, so a stream (often an idle browser tab) holds no threadpool thread
+    async def stream():
+        seq = last_seq
+        while True:
+            events, finished = await job.wait_events(seq, timeout=15)
+            for event in events:
+                seq = event.seq
+                yield f"id: {event.seq}\nevent: {event.event}\ndata: {json.dumps(event.data)}\n\n"
+            if finished and seq >= len(job.events):
+                return
+            if not events:
+                # Keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.get("/jobs/{job_id}/download")
+def download_job_result(job_id: str):
+    """The zip written by a finished export job."""
+    job = _get_job(job_id)
+    if job.kind != "export" or job.status != "done":
+        raise HTTPException(409, f"Job is {job.status}, not a finished export")
+    zip_path = PROJECTS_DIR / job.project / "exports" / job.result["file"]
+    if not zip_path.exists():
+        raise HTTPException(410, "The exported file is gone (exported again since?)")
+    return FileResponse(path=zip_path, filename=zip_path.name, media_type="application/zip")
@@ -0,0 +1,373 @@
+import gzip
+import os
+import sys
+import importlib.util
+from collections import deque
+from contextlib import ExitStack
+from dataclasses import dataclass, field, asdict, replace
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Literal, Optional, Set, Tuple
+
+from src.modules import ActionList, VisualNovelModule
+from src.model import ScriptGroup, track_character_reads
+from src.compiler import Diagnostic, ScriptValidationError, Validator, build_fsm, build_jump_table, resolve_jumps, optimize_fsm, encode_json, stream_fsm
+from src import fsm_binary, workers
+from src.instrument import phase, profiling
+from src.static_compile import DynamicScript, run_static
+from src.bytecode import bytecode_cache
+from src.project_index import referenced_assets
+from src.dialogue_import import DIALOGUE_FORMATS
+
+# Builds a single ScriptGroup: runs its Python sources through the
+# VisualNovelModule and turns the collected actions into the FSM.
+# Used by the compile endpoints in routes/project_route.py
+
+
+# Extra files compile_group may write next to 'generated/{group}.json'
+ARTIFACT_SUFFIXES = [".labels.json", ".hfsm", ".json.gz"]
+
+@dataclass
+class CompileOptions:
+    """
+    Switches for what compile_group produces.
+    Every field is also a query parameter on the compile endpoints.
+    """
+    profile: Literal["pretty", "compact"] = "pretty"  # compact = minified JSON + a precompressed .json.gz
+    jump_table: bool = False    # also write 'generated/{group}.labels.json' (label -> state id)
+    inline_jumps: bool = False  # resolve every label reference to its target id inside the FSM
+    binary: bool = False        # also write 'generated/{group}.hfsm' (see src/fsm_binary.py)
+    optimize: bool = False      # run the optimizer passes (see optimize_fsm; keeps the group's entry_points)
+    static: bool = False        # lower scripts from their AST instead of executing them (see src/static_compile.py)
+
+    def needs_whole_fsm(self) -> bool:
+        """True if an option can only be produced from the complete FSM, so it cannot be streamed."""
+        return self.inline_jumps or self.binary or self.optimize
+
+def ensure_sdk_path():
+    """Makes 'src.*' importable for user scripts."""
+    if str(Path.cwd()) not in sys.path:
+        sys.path.append(str(Path.cwd()))
+
+def run_group_scripts(project_path: Path, slug: str, group: ScriptGroup, logs: List[str], skip_missing: bool = True, static: bool = False) -> Set[str]:
+    """
+    Executes every source file of the group in order, calling story() on each.
+    The actions end up in the active VisualNovelModule (see VisualNovelModule.session).
+    With static=True, files are compiled from their AST where possible and only
+    executed when they use something run_static does not understand.
+    Dialogue files (.csv, .tsv, .jsonl) are imported where they are listed,
+    as if a script called VisualNovelModule().import_dialogue() on them.
+    Returns the ids of the characters the scripts loaded.
+    """
+    with track_character_reads() as character_ids:
+        for filename in group.source_files:
+            file_path = project_path / filename
+            if not file_path.exists():
+                if not skip_missing:
+                    raise FileNotFoundError(f"Source file '{filename}' missing.")
+                logs.append(f"  [Skip] {filename} not found")
+                continue
+
+            if file_path.suffix.lower() in DIALOGUE_FORMATS:
+                vn = VisualNovelModule()
+                with phase("dialogue"):
+                    imported = vn.import_dialogue(filename)
+                # Diagnostics point at the file, not at this line
+                if isinstance(vn.dialogueDict, ActionList):
+                    vn.dialogueDict.origins[-1] = (str(file_path), 1)
+                logs.append(f"  [OK] {filename}: Imported {imported.rows} rows")
+                continue
+
+            if static:
+                try:
+                    with phase("static"):
+                        has_story = run_static(file_path)
+                except DynamicScript as e:
+                    logs.append(f"  [Static] {filename}: {e}; executing it instead")
+                else:
+                    logs.append(f"  [OK] {filename}: Compiled statically" if has_story else f"  [WARN] {filename}: No story() function")
+                    continue
+
+            module_name = f"proj_{slug}_{group.slug}_{filename.replace('.', '_')}"
+
+            # Force reload of module to get code changes
+            # (pop: a compile of the same group on another thread may get there first)
+            sys.modules.pop(module_name, None)
+
+            spec = importlib.util.spec_from_file_location(module_name, file_path)
+            if not (spec and spec.loader):
+                raise Exception(f"Could not create module spec for {filename}")
+
+            user_module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = user_module
+            # Unchanged files skip parsing and compiling (see src/bytecode.py)
+            with phase("compile"):
+                code = bytecode_cache.get_code(file_path, project_path / ".cache" / "bytecode")
+            with phase("import"):
+                exec(code, user_module.__dict__)
+
+            if hasattr(user_module, "story"):
+                with phase("story"):
+                    user_module.story()
+                logs.append(f"  [OK] {filename}: Executed successfully")
+            else:
+                logs.append(f"  [WARN] {filename}: No story() function")
+
+    return character_ids
+
+@dataclass
+class GroupBuild:
+    """What building one ScriptGroup produced."""
+    fsm: Optional[List[dict]]                 # None when the scripts produced nothing
+    character_ids: Set[str] = field(default_factory=set)
+    diagnostics: List[Diagnostic] = field(default_factory=list)
+    jump_table: Optional[dict] = None         # Only when options.jump_table or options.inline_jumps
+    optimizations: Dict[str, int] = field(default_factory=dict)  # pass -> states removed, only when options.optimize
+    assets: Set[str] = field(default_factory=set)                 # Asset paths the actions reference
+    symbols: Optional[dict] = None            # Validator.symbols() of the final FSM (see src/symbols.py)
+
+def collect_group_actions(project_path: Path, slug: str, group: ScriptGroup, logs: List[str], skip_missing: bool = True, static: bool = False) -> Tuple[list, Optional[list], Set[str], List[Diagnostic]]:
+    """
+    Runs the group's scripts on a clean VisualNovelModule of their own
+    (compiles on other threads have theirs).
+    Returns (raw actions, origin of each action, character_ids, warnings the scripts reported).
+    """
+    with VisualNovelModule.session(project_path):
+        character_ids = run_group_scripts(project_path, slug, group, logs, skip_missing, static)
+        vn = VisualNovelModule()
+        final_story_list, reported = vn.to_list(), vn.warnings
+
+    # Diagnostics only need the script's file name, not where the server keeps it
+    origins = final_story_list.resolved_origins() if isinstance(final_story_list, ActionList) else None
+    if origins is not None:
+        origins = [(Path(origin[0]).name, origin[1]) if origin else None for origin in origins]
+
+    # warn() only knows which action came next; that action's origin is the call's line
+    warnings = []
+    for index, code, message in reported:
+        origin = origins[index] if origins is not None and index < len(origins) else None
+        file, line = origin if origin else (None, None)
+        warnings.append(Diagnostic("warning", code, message, None, file, line))
+
+    return final_story_list, origins, character_ids, warnings
+
+def gather_group_actions(project_path: Path, slug: str, group: ScriptGroup, logs: List[str], skip_missing: bool = True, static: bool = False) -> Tuple[list, Optional[list], Set[str], List[Diagnostic]]:
+    """collect_group_actions, run in a warm worker process when the pool is on (see src/workers.py)."""
+    if workers.enabled():
+        return workers.collect_group_actions(project_path, slug, group, logs, skip_missing, static)
+    return collect_group_actions(project_path, slug, group, logs, skip_missing, static)
+
+def build_group(project_path: Path, slug: str, group: ScriptGroup, logs: List[str], skip_missing: bool = True, options: Optional[CompileOptions] = None, external_labels: Iterable[str] = ()) -> GroupBuild:
+    """
+    Runs the group's scripts and compiles the result into an in-memory FSM.
+    external_labels are the labels other groups' events name (src/symbols.py):
+    entry points the optimizer keeps, never reported as unreachable.
+    Raises ScriptValidationError (tagged with the group) if validation finds errors.
+    """
+    options = options or CompileOptions()
+    final_story_list, origins, character_ids, warnings = gather_group_actions(project_path, slug, group, logs, skip_missing, options.static)
+    if not final_story_list:
+        return GroupBuild(None, character_ids)
+
+    # Events naming other groups' labels are checked project-wide (src/symbols.py)
+    validator = Validator(cross_group=True, external_labels=external_labels)
+    try:
+        final_fsm, diagnostics = build_fsm(final_story_list, origins, validator)
+    except ScriptValidationError as e:
+        e.group = group.slug
+        raise
+
+    build = GroupBuild(final_fsm, character_ids, warnings + diagnostics, assets=referenced_assets(final_story_list), symbols=validator.symbols())
+    if options.optimize:
+        with phase("optimize") as sample:
+            unoptimized = build.fsm
+            build.fsm, build.optimizations = optimize_fsm(build.fsm, {*group.entry_points, *external_labels})
+            sample.states = len(build.fsm)
+        # Diagnostics point at states of the unoptimized FSM: follow each to its new
+        # id (compact_fsm renumbers the kept dicts in place), drop those whose state is gone
+        new_ids = {id(state): state["id"] for state in build.fsm}
+        moved = [new_ids.get(id(state)) for state in unoptimized]
+        build.diagnostics = [
+            diagnostic if diagnostic.state is None else replace(diagnostic, state=moved[diagnostic.state])
+            for diagnostic in build.diagnostics
+            if diagnostic.state is None or moved[diagnostic.state] is not None
+        ]
+    if options.jump_table or options.inline_jumps:
+        with phase("jump_table"):
+            build.jump_table = build_jump_table(build.fsm)
+            if options.inline_jumps:
+                resolve_jumps(build.fsm, build.jump_table)
+    if options.optimize:
+        # Removed states moved the labels
+        build.symbols["labels"] = build.jump_table if build.jump_table is not None else build_jump_table(build.fsm)
+    return build
+
+def _stream_group(final_story_list: list, origins: Optional[list], group: ScriptGroup, output_dir: Path, options: CompileOptions, validator: Validator) -> Tuple[int, List[Diagnostic], dict, List[str]]:
+    """
+    Streams the FSM into 'generated/{group}.json' (and its .json.gz) state by state.
+    Writes go to '.part' files that only replace the real ones once validation passed.
+    Returns (state count, warnings, jump table, written file names).
+    """
+    targets = [output_dir / f"{group.slug}.json"]
+    if options.profile == "compact":
+        targets.append(output_dir / f"{group.slug}.json.gz")
+    parts = [target.with_name(target.name + ".part") for target in targets]
+
+    try:
+        with phase("stream") as sample:
+            with ExitStack() as stack:
+                outputs = [stack.enter_context(open(parts[0], "wb"))]
+                if len(parts) > 1:
+                    raw = stack.enter_context(open(parts[1], "wb"))
+                    # filename="" keeps the temporary name out of the gzip header
+                    outputs.append(stack.enter_context(gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=9, mtime=0)))
+
+                count, diagnostics, jump_table = stream_fsm(final_story_list, outputs, options.profile, origins, validator)
+            sample.states = count
+            sample.bytes = sum(part.stat().st_size for part in parts)
+    except BaseException:
+        for part in parts:
+            part.unlink(missing_ok=True)
+        raise
+
+    for part, target in zip(parts, targets):
+        os.replace(part, target)
+    return count, diagnostics, jump_table, [target.name for target in targets]
+
+def compile_group(project_path: Path, slug: str, group: ScriptGroup, output_dir: Path, options: Optional[CompileOptions] = None, external_labels: Iterable[str] = ()) -> Tuple[dict, List[str], Set[str]]:
+    """
+    Builds the group and writes 'generated/{group}.json' (plus any extra
+    artifacts the options ask for). Artifacts from earlier compiles that
+    were not written this time are removed.
+
+    Unless an option needs the whole FSM at once, states are streamed to
+    disk as they are produced, so memory stays bounded for huge groups.
+    Returns (report entry, logs, character_ids); the report carries the
+    per-phase 'timings' (see src/instrument.py), the 'assets' the group uses
+    and its 'symbols' for the project symbol table (see src/symbols.py).
+    external_labels: see build_group.
+    """
+    with profiling() as profiler:
+        report, logs, character_ids = _compile_group(project_path, slug, group, output_dir, options, external_labels)
+    report["timings"] = profiler.report()
+    return report, logs, character_ids
+
+def _compile_group(project_path: Path, slug: str, group: ScriptGroup, output_dir: Path, options: Optional[CompileOptions], external_labels: Iterable[str]) -> Tuple[dict, List[str], Set[str]]:
+    options = options or CompileOptions()
+    logs = [f"--- Compiling Group: {group.name} ({group.slug}.json) ---"]
+    outputs = []
+    state_count = None
+
+    if options.needs_whole_fsm():
+        build = build_group(project_path, slug, group, logs, options=options, external_labels=external_labels)
+        character_ids = build.character_ids
+
+        if build.fsm is not None:
+            with phase("serialize") as sample:
+                output_file = output_dir / f"{group.slug}.json"
+                data = encode_json(build.fsm, options.profile)
+                output_file.write_bytes(data)
+                outputs.append(output_file.name)
+                sample.states, sample.bytes = len(build.fsm), len(data)
+
+                if options.profile == "compact":
+                    # Served as-is to clients that accept gzip (see routes/project_route.py)
+                    gzip_file = output_dir / f"{group.slug}.json.gz"
+                    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                    gzip_file.write_bytes(compressed)
+                    outputs.append(gzip_file.name)
+                    sample.bytes += len(compressed)
+
+            if options.binary:
+                with phase("binary") as sample:
+                    binary_file = output_dir / f"{group.slug}.hfsm"
+                    sample.bytes = fsm_binary.write_fsm(build.fsm, binary_file)
+                    outputs.append(binary_file.name)
+
+            state_count, diagnostics, jump_table = len(build.fsm), build.diagnostics, build.jump_table
+            optimizations, assets, symbols = build.optimizations, build.assets, build.symbols
+    else:
+        final_story_list, origins, character_ids, warnings = gather_group_actions(project_path, slug, group, logs, static=options.static)
+
+        if final_story_list:
+            validator = Validator(cross_group=True, external_labels=external_labels)
+            try:
+                state_count, diagnostics, jump_table, written = _stream_group(final_story_list, origins, group, output_dir, options, validator)
+            except ScriptValidationError as e:
+                e.group = group.slug
+                raise
+            diagnostics = warnings + diagnostics
+            outputs += written
+            assets, symbols = referenced_assets(final_story_list), validator.symbols()
+
+    if state_count is None:
+        report = {"status": "empty", "outputs": outputs}
+    else:
+        if options.jump_table:
+            with phase("serialize") as sample:
+                table_file = output_dir / f"{group.slug}.labels.json"
+                data = encode_json(jump_table, options.profile)
+                table_file.write_bytes(data)
+                outputs.append(table_file.name)
+                sample.bytes = len(data)
+
+        report = {
+            "status": "success",
+            "states": state_count,
+            "outputs": outputs,
+            "diagnostics": [asdict(d) for d in diagnostics],
+            "assets": sorted(assets),
+            "symbols": symbols,
+        }
+        if options.optimize:
+            report["optimizations"] = optimizations
+
+    for suffix in ARTIFACT_SUFFIXES:
+        stale = output_dir / f"{group.slug}{suffix}"
+        if stale.name not in outputs and stale.exists():
+            stale.unlink()
+
+    return report, logs, character_ids
+
+def compile_groups(project_path: Path, slug: str, groups: List[ScriptGroup], output_dir: Path, jobs: int = 1, options: Optional[CompileOptions] = None, external_labels: Optional[Dict[str, Set[str]]] = None) -> Iterator[Tuple[ScriptGroup, dict, List[str], Set[str]]]:
+    """
+    Runs compile_group for every group, yielding (group, report, logs, character_ids)
+    in the order the groups were given. external_labels maps a group slug to
+    the labels other groups' events name (see build_group).
+
+    With jobs > 1, up to that many groups at a time (and no more than there
+    are CPUs) are compiled entirely in worker processes, each in its own:
+    the warm pool's, or a pool of this compile's own when the warm pool is
+    off or smaller (see workers.batch).
+    """
+    external = external_labels or {}
+    jobs = min(jobs, len(groups), os.cpu_count() or 1)
+    if jobs <= 1 or workers.in_worker():
+        for group in groups:
+            yield (group, *compile_group(project_path, slug, group, output_dir, options, external.get(group.slug, ())))
+        return
+
+    remaining = iter(groups)
+    pending = deque()
+    with workers.batch(jobs) as submit:
+
+        def submit_next():
+            group = next(remaining, None)
+            if group is not None:
+                pending.append((group, submit(compile_group, project_path, slug, group, output_dir, options, external.get(group.slug, ()))))
+
+        for _ in range(jobs):
+            submit_next()
+        try:
+            while pending:
+                group, future = pending.popleft()
+                result = workers.result(future)
+                submit_next()
+                yield (group, *result)
+        finally:
+            # Stop queued groups once one fails (or the caller stops iterating)
+            for _, future in pending:
+                future.cancel()
+
+def group_outputs(group: ScriptGroup, output_dir: Path, report: dict) -> List[Path]:
+    """The files compile_group wrote for a given report entry."""
+    return [output_dir / name for name in report.get("outputs", [])]
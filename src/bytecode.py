@@ -0,0 +1,122 @@
+import hashlib
+import marshal
+import os
+import threading
+from collections import OrderedDict
+from importlib.util import MAGIC_NUMBER
+from pathlib import Path
+from types import CodeType
+from typing import Dict, Optional, Tuple
+
+# Code object cache for project scripts.
+#
+# Scripts are loaded under a fresh module name on every compile, so Python's
+# own __pycache__ never helps and each Run used to parse and compile every
+# file from scratch. Here a file's code object is kept:
+#   - in memory, keyed by (path, size, mtime) and checked against the content hash
+#   - on disk under 'projects/{slug}/.cache/bytecode/' (one file per script) so
+#     new worker processes start warm too
+# A disk entry is MAGIC_NUMBER + sha256 of the source + the marshalled code,
+# so a different Python version or any edit simply misses.
+#
+# HIKARIN_BYTECODE_CACHE=0 keeps the cache in memory only.
+
+WRITE_TO_DISK = os.environ.get("HIKARIN_BYTECODE_CACHE", "1") != "0"
+
+
+class BytecodeCache:
+    """path -> compiled code, valid for as long as the file's content is the same."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[int, int, bytes, CodeType]]" = OrderedDict()  # path -> (size, mtime_ns, digest, code)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_code(self, file_path: Path, cache_dir: Optional[Path] = None) -> CodeType:
+        """
+        The code object for file_path, compiled only if no cache has it.
+        cache_dir is where disk entries go (None = memory only).
+        """
+        key = str(file_path)
+        stat = os.stat(file_path)
+
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[3]
+
+        source = Path(file_path).read_bytes()
+        digest = hashlib.sha256(source).digest()
+
+        if entry and entry[2] == digest:
+            # Touched but not changed
+            code = entry[3]
+            self.hits += 1
+        else:
+            code = self._load(cache_dir, key, digest) if cache_dir else None
+            if code is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                # The same call SourceFileLoader makes
+                code = compile(source, key, "exec", dont_inherit=True)
+                if cache_dir and WRITE_TO_DISK:
+                    self._store(cache_dir, key, digest, code)
+
+        with self._lock:
+            self.entries[key] = (stat.st_size, stat.st_mtime_ns, digest, code)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return code
+
+    def counts(self) -> Dict[str, int]:
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+    def merge(self, counts: Dict[str, int]):
+        """Adds counts another process's cache collected (see src/workers.py)."""
+        with self._lock:
+            self.hits += counts.get("hits", 0)
+            self.disk_hits += counts.get("disk_hits", 0)
+            self.misses += counts.get("misses", 0)
+
+    def stats(self) -> dict:
+        """Entries in this process; hits and misses include those of scripts run in workers."""
+        return {"entries": len(self.entries), **self.counts()}
+
+    @staticmethod
+    def _disk_path(cache_dir: Path, key: str) -> Path:
+        return cache_dir / (hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + ".bin")
+
+    def _load(self, cache_dir: Path, key: str, digest: bytes) -> Optional[CodeType]:
+        try:
+            data = self._disk_path(cache_dir, key).read_bytes()
+        except OSError:
+            return None
+        header = MAGIC_NUMBER + digest
+        if not data.startswith(header):
+            return None
+        try:
+            code = marshal.loads(data[len(header):])
+        except (EOFError, ValueError, TypeError):
+            return None
+        return code if isinstance(code, CodeType) else None
+
+    def _store(self, cache_dir: Path, key: str, digest: bytes, code: CodeType):
+        path = self._disk_path(cache_dir, key)
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            temp.write_bytes(MAGIC_NUMBER + digest + marshal.dumps(code))
+            os.replace(temp, path)
+        except OSError:
+            # The disk cache is only an optimization
+            pass
+
+# One per process (the API server and every worker)
+bytecode_cache = BytecodeCache()
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from src.model import BASE_CHAR_PATH, ScriptGroup
+from src.build import group_outputs
+from src.dialogue_import import DIALOGUE_FORMATS
+
+# Bump this whenever the layout of the cache file changes.
+CACHE_VERSION = 4
+
+# Memory budget of the in-process result cache (compile_temp responses).
+RESULT_CACHE_BYTES = int(os.environ.get("HIKARIN_RESULT_CACHE_MB", "64")) * 1024 * 1024
+
+# SDK files whose content changes what a group compiles to.
+SDK_DIR = Path(__file__).parent
+SDK_FILES = ["modules.py", "compiler.py", "model.py", "build.py", "fsm_binary.py", "static_compile.py", "project_index.py", "records.py", "dialogue_import.py"]
+
+
+def file_digest(path: Path) -> str:
+    """sha256 of a file's bytes, or 'missing' if it does not exist."""
+    if not path.is_file():
+        return "missing"
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+def sdk_digest() -> str:
+    """A single hash covering every SDK file listed in SDK_FILES."""
+    h = hashlib.sha256()
+    for name in SDK_FILES:
+        h.update(name.encode())
+        h.update(file_digest(SDK_DIR / name).encode())
+    return h.hexdigest()
+
+def character_digests(character_ids: Iterable[str]) -> Dict[str, str]:
+    """Hashes of library/characters/{id}/data.json for each id."""
+    return {char_id: file_digest(BASE_CHAR_PATH / char_id / "data.json") for char_id in sorted(character_ids)}
+
+def group_digest(project_path: Path, group: ScriptGroup, options: Optional[dict] = None) -> str:
+    """
+    Hashes everything known about a group *before* running it:
+    its source files (in order), the SDK and the compile options.
+    Character data is only known after a run, so it is checked separately.
+    Dialogue files in the project folder count too, listed or not, since any
+    script may import them (VisualNovelModule.import_dialogue).
+    """
+    h = hashlib.sha256()
+    h.update(f"v{CACHE_VERSION}".encode())
+    h.update(sdk_digest().encode())
+    h.update(json.dumps(options or {}, sort_keys=True).encode())
+    h.update(json.dumps(group.entry_points).encode())
+    for filename in group.source_files:
+        h.update(filename.encode())
+        h.update(file_digest(project_path / filename).encode())
+    for path in sorted(project_path.glob("*")):
+        if path.suffix.lower() in DIALOGUE_FORMATS and path.name not in group.source_files:
+            h.update(path.name.encode())
+            h.update(file_digest(path).encode())
+    return h.hexdigest()
+
+
+# Serializes CompileCache.save() across the server's threads
+_save_lock = threading.Lock()
+
+
+class CompileCache:
+    """
+    Remembers what each script group of a project was last compiled from.
+    Saved as 'projects/{slug}/.cache/compile_cache.json'.
+    """
+
+    def __init__(self, project_path: Path):
+        self.project_path = project_path
+        self.path = project_path / ".cache" / "compile_cache.json"
+        self.entries: Dict[str, dict] = {}
+
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == CACHE_VERSION:
+                    self.entries = data.get("groups", {})
+            except (OSError, json.JSONDecodeError):
+                # A broken cache is just an empty cache
+                self.entries = {}
+
+    def lookup(self, group: ScriptGroup, key: str, output_dir: Path, external_labels: Iterable[str] = ()) -> Optional[dict]:
+        """
+        Returns the cached report for the group if nothing it depends on changed
+        (the labels other groups' events name included, see src/symbols.py)
+        and its generated files are still on disk. Otherwise None.
+        """
+        entry = self.entries.get(group.slug)
+        if not entry or entry.get("key") != key:
+            return None
+        if entry.get("external_labels") != sorted(external_labels):
+            return None
+        if character_digests(entry.get("characters", {})) != entry.get("characters", {}):
+            return None
+        if any(not p.exists() for p in group_outputs(group, output_dir, entry["report"])):
+            return None
+        return entry["report"]
+
+    def store(self, group: ScriptGroup, key: str, character_ids: Iterable[str], report: dict, external_labels: Iterable[str] = ()):
+        self.entries[group.slug] = {
+            "key": key,
+            "characters": character_digests(character_ids),
+            "external_labels": sorted(external_labels),
+            "report": report,
+        }
+
+    def cached_symbols(self, group_slug: str, key: str) -> Optional[dict]:
+        """The symbols of the group's last compile, if its sources have not changed since."""
+        entry = self.entries.get(group_slug)
+        if not entry or entry.get("key") != key:
+            return None
+        return entry["report"].get("symbols")
+
+    def forget(self, group_slug: str):
+        self.entries.pop(group_slug, None)
+
+    def save(self):
+        """
+        Writes the cache file atomically: compiles of the same project may run
+        at once (each saves what it saw; the last one wins), and a reader must
+        never find a half-written file.
+        """
+        self.path.parent.mkdir(exist_ok=True)
+        temp = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with _save_lock:
+            try:
+                with open(temp, "w", encoding="utf-8") as f:
+                    json.dump({"version": CACHE_VERSION, "groups": self.entries}, f, indent=4)
+                os.replace(temp, self.path)
+            except BaseException:
+                temp.unlink(missing_ok=True)
+                raise
+
+
+# ==========================================
+# RESULT CACHE (compile_temp)
+# ==========================================
+
+@dataclass
+class CachedResult:
+    """One encoded compile_temp response."""
+    etag: str                      # Strong ETag of `body`, quotes included
+    body: bytes
+    gzipped: Optional[bytes]       # Precompressed body, for the compact profile
+    characters: Dict[str, str]     # Character data it was compiled against (id -> digest)
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.gzipped or b"")
+
+
+def body_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class ResultCache:
+    """
+    In-memory LRU of compile_temp responses, keyed by the group's input digest
+    (see group_digest). Least recently used entries are dropped once the
+    encoded bodies take more than max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, CachedResult]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        """The cached response, unless it is missing or a character it used has changed."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+
+        if entry is not None and character_digests(entry.characters) != entry.characters:
+            with self._lock:
+                if self.entries.get(key) is entry:
+                    self._remove(key)
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: CachedResult) -> CachedResult:
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            # Too big to ever fit: hand it back without caching it
+            if entry.size > self.max_bytes:
+                return entry
+            self.entries[key] = entry
+            self.total_bytes += entry.size
+            while self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+        return entry
+
+    def discard_prefix(self, prefix: str) -> int:
+        """Drops every entry whose key starts with prefix. Returns how many there were."""
+        with self._lock:
+            keys = [key for key in self.entries if key.startswith(prefix)]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key: str):
+        self.total_bytes -= self.entries.pop(key).size
+
+# One per server process
+result_cache = ResultCache()
@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+# Character data cache.
+#
+# Character.from_id used to open and parse 'library/characters/{id}/data.json'
+# on every call, and the library API re-read every character file on every
+# listing. Here each file's parsed JSON is kept, keyed by its absolute path,
+# and read again only when its (mtime_ns, size) changes or the library routes
+# that write it call invalidate().
+#
+# Callers always get their own copy of the data, so a script that edits a
+# character's tags or custom_data never changes what the next caller sees.
+
+Stamp = Tuple[int, int]  # (mtime_ns, size)
+
+
+def _copy_json(value: Any) -> Any:
+    """A deep copy of parsed JSON (much cheaper than copy.deepcopy)."""
+    kind = type(value)
+    if kind is dict:
+        return {key: _copy_json(item) for key, item in value.items()}
+    if kind is list:
+        return [_copy_json(item) for item in value]
+    return value
+
+
+class CharacterCache:
+    """data.json path -> its parsed contents, valid while the file's stamp is the same."""
+
+    def __init__(self):
+        self.entries: Dict[str, Tuple[Stamp, dict]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def load(self, file_path: Path) -> dict:
+        """
+        A fresh copy of the file's JSON. Raises FileNotFoundError if it is missing
+        and ValueError (json.JSONDecodeError) if it does not parse, like reading it would.
+        """
+        key = os.path.abspath(file_path)
+        stat = os.stat(key)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self.hits += 1
+                return _copy_json(entry[1])
+            self.misses += 1
+
+        # Stamped before reading: a write in between only makes the next load re-read
+        with open(key, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        with self._lock:
+            self.entries[key] = (stamp, data)
+        return _copy_json(data)
+
+    def invalidate(self, file_path: Path):
+        """Forgets the file (it was just written or deleted)."""
+        with self._lock:
+            if self.entries.pop(os.path.abspath(file_path), None) is not None:
+                self.invalidations += 1
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def merge(self, counts: Dict[str, int]):
+        """Adds counts another process's cache collected (see src/workers.py)."""
+        with self._lock:
+            self.hits += counts.get("hits", 0)
+            self.misses += counts.get("misses", 0)
+
+    def stats(self) -> dict:
+        """Entries in this process; hits and misses include those of scripts run in workers."""
+        with self._lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses, "invalidations": self.invalidations}
+
+# One per process (the API server and every worker)
+character_cache = CharacterCache()
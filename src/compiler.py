@@ -1,5 +1,15 @@
 import json
+import logging
 import unicodedata
+from collections.abc import Mapping
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, Optional
+
+from src.dialogue_import import DialogueImport
+from src.instrument import phase
+
+log = logging.getLogger(__name__)
 
 
 def compileVN(script):
@@ -12,115 +22,643 @@ def compileVN(script):
     check(flat)
     return flat
 
+# Known problematic characters and their replacements
+SANITIZE_REPLACEMENTS = {
+    '\u201c': '"',  # Left double quote
+    '\u201d': '"',  # Right double quote
+    '\u2018': "'",  # Left single quote
+    '\u2019': "'",  # Right single quote
+    '\u2013': '-',  # En dash
+    '\u2014': '-',  # Em dash
+    '\u2026': '...',  # Ellipsis
+    '\u00a0': ' ',  # Non-breaking space
+}
+
+class _SanitizeTable(dict):
+    """
+    str.translate() table for sanitize_text().
+    Holds the replacements up front; any other code point is classified with
+    unicodedata the first time it is seen and remembered from then on.
+    """
+    def __missing__(self, codepoint: int):
+        # Replace other invisible/control characters
+        value = "?" if unicodedata.category(chr(codepoint))[0] == "C" else codepoint
+        self[codepoint] = value
+        return value
+
+_SANITIZE_TABLE = _SanitizeTable({ord(old): new for old, new in SANITIZE_REPLACEMENTS.items()})
+
+@lru_cache(maxsize=8192)
+def sanitize_text(text: str) -> str:
+    """
+    Swaps typographic characters for plain ones and control characters for '?'.
+    Repeated strings (speaker names, sprite paths...) come straight from the cache.
+    """
+    # Printable ASCII has nothing to replace
+    if text.isascii() and text.isprintable():
+        return text
+    return text.translate(_SANITIZE_TABLE)
+
+def _sanitize_value(value):
+    kind = type(value)
+    if kind is str:
+        return sanitize_text(value)
+    if kind is dict:
+        return {k: sanitize_text(v) if type(v) is str else _sanitize_value(v) for k, v in value.items()}
+    if kind is list:
+        return [_sanitize_value(v) for v in value]
+    # Subclasses (str enums like Status, custom lists...) take the slow path
+    if isinstance(value, str):
+        return sanitize_text(str.__str__(value))
+    # Dict subclasses, and records (src/records.py) nested in a hand-built dict
+    if isinstance(value, Mapping):
+        return {k: _sanitize_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_sanitize_value(v) for v in value]
+    return value
+
 def sanitize(data_list):
-    # Known problematic characters and their replacements
-    replacements = {
-        '\u201c': '"',  # Left double quote
-        '\u201d': '"',  # Right double quote
-        '\u2018': "'",  # Left single quote
-        '\u2019': "'",  # Right single quote
-        '\u2013': '-',  # En dash
-        '\u2014': '-',  # Em dash
-        '\u2026': '...',  # Ellipsis
-        '\u00a0': ' ',  # Non-breaking space
-    }
-
-    def sanitize_string(text):
-        if not isinstance(text, str):
-            return text
-
-        # Replace known problematic characters
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-
-        # Remove other invisible/control characters
-        sanitized = "".join(
-            char if unicodedata.category(char)[0] != "C" else "?"  # Replace control chars
-            for char in text
-        )
-        return sanitized
-
-    def sanitize_dict(d):
-        return {k: sanitize_string(v) if isinstance(v, str) else v for k, v in d.items()}
-
-    return [sanitize_dict(d) for d in data_list]
-
-def check(actions: list[dict]):
-    print("Checking Starts Now...")
-    existing_label = []
-    existing_jump = []
-    existing_id = {}
+    """
+    Returns a sanitized copy of every state, including nested values
+    such as choice[].display and a conditional's actions[].
+    """
+    return [_sanitize_value(d) for d in data_list]
 
-    for action in actions:
-            if action["type"] == "label":
-                existing_label.append(action["label"])
-            elif action["type"] == "transition":
-                existing_jump.append(action["label"])
-            elif action["type"] == "unlock_dialogues":
-                existing_jump+=action["events"]
-            elif action["type"] == "choice":
-                # Collect jump labels inside choice
-                for choice in action["choice"]:
-                    existing_jump.append(choice["label"])
-            elif action["type"] == "next":
-                existing_jump.append(action["label"])
+@dataclass
+class Diagnostic:
+    """
+    One problem found while validating a compiled script.
+    'state' is the index of the offending state in the FSM,
+    'file'/'line' point at the script call that created it (when known).
+    """
+    severity: str   # "error" or "warning"
+    code: str       # "missing_label", "duplicate_id", "duplicate_label", "unreachable_label", "nesting_too_deep", "nested_import",
+                    # from the project-wide check (src/symbols.py): "unresolved_event", "ambiguous_event",
+                    # and whatever scripts report through VisualNovelModule.warn (e.g. "suspicious_say")
+    message: str
+    state: Optional[int] = None
+    file: Optional[str] = None
+    line: Optional[int] = None
+    group: Optional[str] = None   # Only set by the project-wide check
+
+class ScriptValidationError(ValueError):
+    """
+    Raised when validation finds at least one error.
+    Carries every diagnostic (warnings included), not just the first problem.
+    """
+    def __init__(self, diagnostics: list[Diagnostic], group: Optional[str] = None):
+        self.diagnostics = diagnostics
+        self.group = group
+        errors = [d.message for d in diagnostics if d.severity == "error"]
+        super().__init__("; ".join(errors))
+
+    def __reduce__(self):
+        # Keep the diagnostics when the error crosses a process boundary
+        return (self.__class__, (self.diagnostics, self.group))
+
+class Validator:
+    """
+    Single-pass validator for a flattened FSM.
+    Feed it states in order, then finish() returns every diagnostic at once.
+    Each state costs O(1) and only what a diagnostic may need is kept:
+    labels and jumps in dicts (with their origin), ids in a bitmap.
+
+    With cross_group, unlock_dialogues events that name no label of this
+    script are not errors here: they may live in another script group, and
+    the project-wide symbol table (src/symbols.py) resolves them instead.
+    external_labels are the labels other groups' events name; they are
+    never reported as unreachable.
+    symbols() describes what the script defines and what it needs from others.
+    """
+    # Types whose label(s) must exist in the same script
+    JUMP_TYPES = {"transition", "next", "choice", "unlock_dialogues"}
+    # Types that are exempt from the duplicate id check
+    NO_ID_CHECK = JUMP_TYPES | {"label"}
+
+    def __init__(self, cross_group: bool = False, external_labels: Iterable[str] = ()):
+        self.cross_group = cross_group
+        self.labels: dict[str, tuple] = {}         # label -> (index, origin) of its first label state
+        self.jumps: dict[str, list[tuple]] = {}    # label -> (index, origin) of states that need it
+        self.referenced: set[str] = set(external_labels)   # every label something points at
+        self.seen_ids = bytearray()                # bit per non-negative int id
+        self.other_ids: set = set()                # any id that does not fit the bitmap
+        self.duplicate_ids: dict[Any, list[tuple]] = {}
+        self.diagnostics: list[Diagnostic] = []
+        self.first_label: Optional[str] = None
+        self.count = 0
+        # For symbols()
+        self.events: list[tuple] = []              # (label, type, origin) of every unlock/random event
+        self.variables: set[str] = set()
+        self.globals: set[str] = set()
+
+    def _diagnose(self, severity: str, code: str, message: str, index: Optional[int], origin: Optional[tuple]):
+        file, line = origin if origin else (None, None)
+        self.diagnostics.append(Diagnostic(severity, code, message, index, file, line))
+
+    def _jump(self, label: str, index: int, origin: Optional[tuple], required: bool = True):
+        self.referenced.add(label)
+        if required and label not in self.labels:
+            # Jumps to labels already seen can never be missing
+            self.jumps.setdefault(label, []).append((index, origin))
+
+    def _seen_before(self, action_id) -> bool:
+        if type(action_id) is int and action_id >= 0:
+            byte, bit = divmod(action_id, 8)
+            if byte >= len(self.seen_ids):
+                self.seen_ids.extend(bytes(byte - len(self.seen_ids) + 1))
+            if self.seen_ids[byte] & (1 << bit):
+                return True
+            self.seen_ids[byte] |= 1 << bit
+            return False
+        if action_id in self.other_ids:
+            return True
+        self.other_ids.add(action_id)
+        return False
+
+    def feed(self, action: dict, origin: Optional[tuple] = None):
+        index = self.count
+        self.count += 1
+
+        action_type = action["type"]
+        if action_type == "label":
+            label = action["label"]
+            if label in self.labels:
+                self._diagnose("warning", "duplicate_label", f"Label defined more than once: {label}", index, origin)
             else:
-                action_id = action["id"]
-                if action_id in existing_id:
-                    existing_id[action_id].append(action)
-                else:
-                    existing_id[action_id] = [action]
-        
+                self.labels[label] = (index, origin)
+            if self.first_label is None:
+                self.first_label = label
+        elif action_type in ("transition", "next"):
+            self._jump(action["label"], index, origin)
+        elif action_type == "unlock_dialogues":
+            for event in action["events"]:
+                self._jump(event, index, origin, required=not self.cross_group)
+                self.events.append((event, action_type, origin))
+        elif action_type == "random_dialogue":
+            for event in action["events"]:
+                self._jump(event, index, origin, required=False)
+                self.events.append((event, action_type, origin))
+        elif action_type == "meta":
+            if action.get("action") == "create_var":
+                self.variables.add(action["var"])
+            elif action.get("action") == "create_global":
+                self.globals.add(action["var"])
+        elif action_type in ("choice", "night_choice"):
+            # Collect jump labels inside choice
+            for choice in action["choice"]:
+                self._jump(choice["label"], index, origin, required=action_type == "choice")
+
+        if action_type not in self.NO_ID_CHECK and self._seen_before(action["id"]):
+            self.duplicate_ids.setdefault(action["id"], []).append((index, origin))
+
+    def jump_table(self) -> dict[str, int]:
+        """label -> index of its state (the same as build_jump_table for a valid FSM)."""
+        return {label: index for label, (index, _) in self.labels.items()}
+
+    def symbols(self) -> dict:
+        """
+        What this script contributes to the project symbol table: its labels
+        (label -> state index), the variables and globals it creates, and the
+        events it names that are not one of its own labels.
+        """
+        external = []
+        seen = set()
+        for label, action_type, origin in self.events:
+            if label in self.labels or (label, action_type) in seen:
+                continue
+            seen.add((label, action_type))
+            file, line = origin if origin else (None, None)
+            external.append({"label": label, "type": action_type, "file": file, "line": line})
+        return {
+            "labels": self.jump_table(),
+            "variables": sorted(self.variables),
+            "globals": sorted(self.globals),
+            "events": external,
+        }
+
+    def finish(self) -> list[Diagnostic]:
         # Check if any jump points to a non-existing label
-    print("Checking Existing Label:")
-    print(existing_label)
-    print("Checking Existing Jump:")
-    print(existing_jump)
-    for jump in existing_jump:
-        
-        print("Checking for:")
-        print(jump)
-        if jump not in existing_label:
-            raise ValueError(f"Label not found: {jump}")
-    
-    # Check for duplicate IDs and provide detailed error messages
-    for action_id, actions_with_id in existing_id.items():
-        if len(actions_with_id) > 1:
-            action_details = "\n".join(str(action) for action in actions_with_id)
-            raise ValueError(f"Duplicate action found:\n{action_details}")
+        for label, refs in self.jumps.items():
+            if label not in self.labels:
+                for index, origin in refs:
+                    self._diagnose("error", "missing_label", f"Label not found: {label}", index, origin)
+
+        # The same action object added twice shows up as two states sharing an id
+        for action_id, refs in self.duplicate_ids.items():
+            index, origin = refs[-1]
+            self._diagnose(
+                "error", "duplicate_id",
+                f"Duplicate action found: id {action_id} is used by {len(refs) + 1} states "
+                f"(was an action added both directly and inside a condition? use nested=True)",
+                index, origin,
+            )
+
+        # Labels nothing jumps to (the script's first label is its entry point)
+        for label, (index, origin) in self.labels.items():
+            if label not in self.referenced and label != self.first_label:
+                self._diagnose("warning", "unreachable_label", f"Label is never jumped to: {label}", index, origin)
+
+        return self.diagnostics
+
+def validate(actions: list[dict], origins: Optional[list[Optional[tuple]]] = None, validator: Optional[Validator] = None) -> list[Diagnostic]:
+    """
+    Validates a flattened FSM and returns all diagnostics (errors and warnings).
+    origins, if given, holds a (file, line) pair per state.
+    Pass a validator to configure it or read its symbols() afterwards.
+    """
+    validator = validator or Validator()
+    if origins is None or len(origins) != len(actions):
+        origins = [None] * len(actions)
+    for action, origin in zip(actions, origins):
+        validator.feed(action, origin)
+    return validator.finish()
 
+def check(actions: list[dict], origins: Optional[list[Optional[tuple]]] = None, validator: Optional[Validator] = None) -> list[Diagnostic]:
+    """
+    Validates the FSM. Raises ScriptValidationError listing every error found,
+    otherwise returns the warnings.
+    """
+    diagnostics = validate(actions, origins, validator)
+    if any(d.severity == "error" for d in diagnostics):
+        raise ScriptValidationError(diagnostics)
+    return diagnostics
 
+def expand_origins(actions: list[dict], origins: Optional[list[Optional[tuple]]]) -> Optional[list[Optional[tuple]]]:
+    """
+    Turns one origin per top-level action into one origin per flattened state.
+    States lifted out of a conditional share the conditional's origin;
+    states of an imported dialogue file point at their row.
+    """
+    if origins is None or len(origins) != len(actions):
+        return None
+    expanded = []
+    for action, origin in zip(actions, origins):
+        if type(action) is DialogueImport:
+            expanded += action.origins()
+            continue
+        expanded += [origin] * _subtree_size(action)
+    return expanded
 
 
 
 # Flatten Conditional Statement
 # To make the FSM as simple and lightweight as possible, we use custom Integer Id Indexing
 # (TODO: Figure out if we can skip manual int indexing and use array indexing)
+#
+# Conditionals can nest to any depth. Every state gets its position as 'id', and every
+# conditional gets 'end': the position right after its whole (nested) body, which is
+# where the FSM continues when the condition is false.
+# The caller's actions are never modified; each state is a shallow copy (a new dict for a record).
+# An imported dialogue file (src/dialogue_import.py) is a top-level entry that flattens
+# to all of its rows' states, read from the file as they are written.
+CONDITIONAL_TYPES = ("conditional", "conditional_global")
+
+def _subtree_size(action: dict) -> int:
+    """How many states an action flattens to (itself plus everything nested in it)."""
+    if type(action) is DialogueImport:
+        return action.state_count
+    size = 0
+    stack = [action]
+    while stack:
+        node = stack.pop()
+        size += 1
+        if node["type"] in CONDITIONAL_TYPES:
+            stack.extend(node["actions"])
+    return size
+
+_END = object()  # Stack marker: the body of the conditional below it is done
+
+def _flatten_into(out: list, offset: int, position: int, action: dict, seen: dict) -> int:
+    """
+    Writes the states of one top-level action into out[offset:], in order, without recursion.
+    'position' is the FSM position of the first state. Returns the next free position.
+    'seen' maps id(dict) -> state id, so an action object added twice keeps one id
+    (check() then reports it as a duplicate, like before).
+    """
+    if type(action) is DialogueImport:
+        for _, record in action.iter_states():
+            state = record.to_dict()
+            state["id"] = position
+            out[offset] = state
+            offset += 1
+            position += 1
+        return position
+
+    stack = [(action, None)]
+    while stack:
+        node, parent = stack.pop()
+        if node is _END:
+            parent["end"] = position
+            continue
+
+        # Records (src/records.py) become plain dicts here. A conditional's body is
+        # flattened below, so it must not be materialized (that walks the whole subtree)
+        if type(node) is dict:
+            state = {**node}
+        elif node["type"] in CONDITIONAL_TYPES:
+            state = node.shallow_dict()
+        else:
+            state = node.to_dict()
+        state["id"] = seen.setdefault(id(node), position)
+        out[offset] = state
+        offset += 1
+        position += 1
+        if parent is not None:
+            parent["actions"].append(state)
+
+        if state["type"] in CONDITIONAL_TYPES:
+            state["actions"] = []
+            stack.append((_END, state))
+            stack.extend((child, state) for child in reversed(node["actions"]))
+    return position
+
+def iter_flatten(actions: list[dict]) -> Iterator[tuple[dict, int, Optional[int]]]:
+    """
+    Yields (state, index of the top-level action it came from, line), one state at a time.
+    line is the row of an imported dialogue file the state came from, else None.
+    Only one top-level action's states are held at once (one row's, for an import).
+    """
+    seen = {}
+    position = 0 # First state in the FSM
+    for top, action in enumerate(actions):
+        if type(action) is DialogueImport:
+            for line, record in action.iter_states():
+                state = record.to_dict()
+                state["id"] = position
+                position += 1
+                yield state, top, line
+            continue
+        states = [None] * _subtree_size(action)
+        position = _flatten_into(states, 0, position, action, seen)
+        for state in states:
+            yield state, top, None
+
 def flattenVN(actions: list[dict]) -> list[dict]:
-    updated_actions = []
-    actionIndex = 0 # First state in the FSM
+    """Flattens the whole script in one pass into a preallocated list."""
+    flat = [None] * sum(_subtree_size(action) for action in actions)
+    seen = {}
+    position = 0
     for action in actions:
-        action["id"] = actionIndex # Put the state 0 or current number as 'id'
-        if action["type"] == "conditional" or action["type"] == "conditional_global": # Conditionals are special
-            subactions = []
-            # There is no easy way to explain this
-            # But basically... We want to...
-            # Yeah, no I'm not explaining this, figure it out yourself future me.
-            for subaction in action["actions"]:
-                actionIndex += 1
-                subaction["id"] = actionIndex
-                subactions.append(subaction)
-                
-            action["end"] = actionIndex+1
-            updated_actions.append(action)
-            updated_actions+=subactions
-            actionIndex +=1
-            
-        else:
-            updated_actions.append(action)
-            actionIndex +=1
-            
-    return updated_actions
+        position = _flatten_into(flat, position, position, action, seen)
+    return flat
+
+# Nesting limit
+# A conditional state keeps its body's states in 'actions', and each nested
+# conditional keeps its own body, so the output holds every state once per
+# level above it: a script nested n levels deep compiles to O(n^2) JSON, and
+# sanitize, the JSON encoder and the game's parser all recurse once per level.
+# flattenVN itself handles any depth; a compile stops past MAX_NESTING_DEPTH
+# with a "nesting_too_deep" error instead of a RecursionError (or a huge file).
+MAX_NESTING_DEPTH = 100
+
+def check_nesting(actions: list[dict], origins: Optional[list[Optional[tuple]]] = None, limit: int = MAX_NESTING_DEPTH):
+    """
+    Raises ScriptValidationError if a conditional is nested more than 'limit'
+    levels deep, or holds a dialogue import (those only expand at the top level).
+    """
+    if origins is not None and len(origins) != len(actions):
+        origins = None
+
+    def error(top: int, code: str, message: str) -> ScriptValidationError:
+        file, line = origins[top] if origins and origins[top] else (None, None)
+        return ScriptValidationError([Diagnostic("error", code, message, None, file, line)])
+
+    for top, action in enumerate(actions):
+        if type(action) is DialogueImport:
+            continue
+        stack = [(action, 1)]
+        while stack:
+            node, depth = stack.pop()
+            if type(node) is DialogueImport:
+                raise error(top, "nested_import", f"{node.path.name}: dialogue files can only be imported at the top level of a story, not inside a condition")
+            if node["type"] not in CONDITIONAL_TYPES:
+                continue
+            if depth > limit:
+                raise error(top, "nesting_too_deep", f"Conditions are nested more than {limit} levels deep")
+            stack.extend((child, depth + 1) for child in node["actions"])
+
+# Jump Table
+# Labels are what scripts jump to, but looking one up means scanning the FSM.
+# The table maps each label to the id of its label state, so consumers can jump in O(1).
+def build_jump_table(fsm: list[dict]) -> dict[str, int]:
+    """label -> id of the (first) state defining it."""
+    table = {}
+    for state in fsm:
+        if state["type"] == "label" and state["label"] not in table:
+            table[state["label"]] = state["id"]
+    return table
+
+def resolve_jumps(fsm: list[dict], table: dict[str, int]) -> list[dict]:
+    """
+    Writes the target state id next to every label reference:
+    'target' on transition/next and on each choice entry,
+    'targets' (one per event) on unlock_dialogues/random_dialogue.
+    Labels that are not in the table (e.g. defined in another group) resolve to None.
+    Works in place and returns the same list.
+    """
+    for state in fsm:
+        state_type = state["type"]
+        if state_type in ("transition", "next"):
+            state["target"] = table.get(state["label"])
+        elif state_type in ("choice", "night_choice"):
+            for choice in state["choice"]:
+                choice["target"] = table.get(choice["label"])
+        elif state_type in ("unlock_dialogues", "random_dialogue"):
+            state["targets"] = [table.get(event) for event in state["events"]]
+        elif state_type in ("conditional", "conditional_global"):
+            # The conditional keeps its own copy of the lifted states
+            resolve_jumps(state["actions"], table)
+    return fsm
+
+# Dead State Elimination
+# Optional pass over a validated FSM: follows every way the FSM can move from state to state
+# (fall through, jumps, choices, a conditional's body or its 'end') and drops what can never run.
+# The mod can also enter a script through labels given to unlock_dialogues/random_dialogue/next,
+# or listed as the group's entry points, so those always stay. Events of other groups count
+# too: build_group adds the labels they name (src/symbols.py, external_labels) to the entry points.
+NO_FALLTHROUGH = {"transition", "finish_dialogue", "choice"}
+
+def reachable_states(fsm: list[dict], entry_points: Iterable[str] = ()) -> bytearray:
+    """One byte per state: 1 if the state can run, 0 if it is dead."""
+    labels = build_jump_table(fsm)
+    roots = {0} if fsm else set()
+    entries = set(entry_points)
+    for state in fsm:
+        if state["type"] in ("unlock_dialogues", "random_dialogue"):
+            entries.update(state["events"])
+        elif state["type"] == "next":
+            entries.add(state["label"])
+    roots.update(labels[label] for label in entries if label in labels)
+
+    keep = bytearray(len(fsm))
+    stack = list(roots)
+    while stack:
+        index = stack.pop()
+        if index is None or index >= len(fsm) or keep[index]:
+            continue
+        keep[index] = 1
+
+        state = fsm[index]
+        state_type = state["type"]
+        if state_type == "transition":
+            stack.append(labels.get(state["label"]))
+        elif state_type in ("choice", "night_choice"):
+            stack.extend(labels.get(choice["label"]) for choice in state["choice"])
+        elif state_type in CONDITIONAL_TYPES:
+            # False: skip the body
+            stack.append(state["end"])
+
+        if state_type not in NO_FALLTHROUGH:
+            stack.append(index + 1)
+    return keep
+
+def compact_fsm(fsm: list[dict], keep: bytearray) -> list[dict]:
+    """
+    Drops every state whose keep byte is 0 and renumbers what is left.
+    A pointer ('end') to a dropped state moves on to the next kept one.
+    Each conditional's 'actions' is rebuilt from its kept states.
+    The kept state dicts are updated in place.
+    """
+    new_ids = [0] * (len(fsm) + 1)
+    count = 0
+    for index, kept in enumerate(keep):
+        new_ids[index] = count
+        count += kept
+    new_ids[len(fsm)] = count
+
+    compacted = [state for state, kept in zip(fsm, keep) if kept]
+    # Rebuild bodies first, while every id still is the state's old position
+    for state in compacted:
+        if state["type"] in CONDITIONAL_TYPES:
+            state["actions"] = [fsm[child["id"]] for child in state["actions"] if keep[child["id"]]]
+    for state in compacted:
+        state["id"] = new_ids[state["id"]]
+        if state["type"] in CONDITIONAL_TYPES:
+            state["end"] = new_ids[state["end"]]
+    return compacted
+
+def eliminate_dead_states(fsm: list[dict], entry_points: Iterable[str] = ()) -> tuple[list[dict], int]:
+    """
+    Removes unreachable states (and the labels nobody can reach) from a validated FSM.
+    Returns (new fsm, number of states removed).
+    """
+    keep = reachable_states(fsm, entry_points)
+    compacted = compact_fsm(fsm, keep)
+    return compacted, len(fsm) - len(compacted)
+
+# Peephole Optimizer
+# Editors (Blockly especially) emit runs of states that undo each other. Each pass looks at
+# a validated FSM and returns a keep byte per state (like reachable_states); optimize_fsm()
+# compacts after every pass. Passes run in the order they are registered.
+OPTIMIZATION_PASSES: dict[str, Callable[[list[dict], set[str]], bytearray]] = {}
+
+def optimization_pass(name: str):
+    """Registers fn(fsm, entry_points) -> keep bytes as an optimization pass."""
+    def register(fn):
+        OPTIMIZATION_PASSES[name] = fn
+        return fn
+    return register
+
+def _drop_overwritten(fsm: list[dict], overwrites: Callable[[dict, dict], bool]) -> bytearray:
+    """
+    Drops every state that the very next state overwrites.
+    Safe wherever the first one falls through: whatever runs it always runs the next one too.
+    """
+    keep = bytearray(b"\x01") * len(fsm)
+    for index in range(len(fsm) - 1):
+        if overwrites(fsm[index], fsm[index + 1]):
+            keep[index] = 0
+    return keep
+
+@optimization_pass("coalesce_backgrounds")
+def _coalesce_backgrounds(fsm: list[dict], entry_points: set[str]) -> bytearray:
+    # Back-to-back backgrounds: only the last one is ever seen
+    return _drop_overwritten(fsm, lambda a, b: a["type"] == "modify_background" == b["type"])
+
+@optimization_pass("overwritten_sprites")
+def _overwritten_sprites(fsm: list[dict], entry_points: set[str]) -> bytearray:
+    # A sprite shown and immediately shown again
+    return _drop_overwritten(fsm, lambda a, b: a["type"] == "show_sprite" == b["type"] and a["sprite"] == b["sprite"])
+
+@optimization_pass("overwritten_music")
+def _overwritten_music(fsm: list[dict], entry_points: set[str]) -> bytearray:
+    # A track started and immediately replaced by another one (not by stop_music:
+    # a jump to the stop would then no longer hear the track it expects to stop)
+    return _drop_overwritten(fsm, lambda a, b: a["type"] == "play_music" == b["type"] and a.get("action") == "play_music" == b.get("action"))
+
+@optimization_pass("thread_jumps")
+def _thread_jumps(fsm: list[dict], entry_points: set[str]) -> bytearray:
+    """
+    Points every transition and choice straight at the end of its jump chain
+    (a label whose first real state is another transition), then drops
+    transitions that only jump to where they would fall through anyway.
+    """
+    labels = build_jump_table(fsm)
+
+    def landing(index: int) -> int:
+        # Label states do nothing at runtime; the first state after them is where a jump lands
+        while index < len(fsm) and fsm[index]["type"] == "label":
+            index += 1
+        return index
+
+    def final_label(label: str) -> str:
+        seen = set()
+        while label in labels and label not in seen:
+            seen.add(label)
+            index = landing(labels[label])
+            if index < len(fsm) and fsm[index]["type"] == "transition" and fsm[index]["label"] in labels:
+                label = fsm[index]["label"]
+            else:
+                break
+        return label
+
+    keep = bytearray(b"\x01") * len(fsm)
+    for index, state in enumerate(fsm):
+        state_type = state["type"]
+        if state_type == "transition":
+            state["label"] = final_label(state["label"])
+            if state["label"] in labels and landing(labels[state["label"]]) == landing(index + 1):
+                keep[index] = 0
+        elif state_type in ("choice", "night_choice"):
+            for choice in state["choice"]:
+                choice["label"] = final_label(choice["label"])
+    return keep
+
+# Runs last: threading leaves labels and chains nothing jumps to any more
+@optimization_pass("dead_states")
+def _dead_states(fsm: list[dict], entry_points: set[str]) -> bytearray:
+    return reachable_states(fsm, entry_points)
+
+def optimize_fsm(fsm: list[dict], entry_points: Iterable[str] = (), passes: Optional[Iterable[str]] = None) -> tuple[list[dict], dict[str, int]]:
+    """
+    Runs the registered optimization passes (all of them, or only the named ones) on a validated FSM.
+    Each pass is repeated until it removes nothing more (dropping a jump can make the one before it redundant).
+    Returns (new fsm, pass name -> number of states it removed).
+    """
+    entry_points = set(entry_points)
+    removed = {}
+    for name, optimization in OPTIMIZATION_PASSES.items():
+        if passes is not None and name not in passes:
+            continue
+        before = len(fsm)
+        while True:
+            count = len(fsm)
+            fsm = compact_fsm(fsm, optimization(fsm, entry_points))
+            if len(fsm) == count:
+                break
+        removed[name] = before - len(fsm)
+    return fsm, removed
+
+# Output Profiles
+# 'pretty' is for reading the FSM while debugging, 'compact' is for shipping it.
+OUTPUT_PROFILES = {
+    "pretty": {"indent": 4},
+    "compact": {"separators": (",", ":")},
+}
+
+def encode_json(data, profile: str = "pretty") -> bytes:
+    """Serializes data with the given output profile, as utf-8 bytes."""
+    return json.dumps(data, **OUTPUT_PROFILES[profile]).encode("utf-8")
 
 def save_to_json_file(data: list[dict], file_path: str):
     with open(file_path, 'w') as file:
@@ -128,7 +666,7 @@ def save_to_json_file(data: list[dict], file_path: str):
 
 
 def compile(storyname,script):
-    print("Compiling VN script to FSM...")
+    log.info("Compiling VN script to FSM...")
     fsm =compileVN(script)
     save_to_json_file(fsm,"mediafile/scripts/"+storyname+".json")
 
@@ -142,18 +680,79 @@ def compile_sound(sounds: list[dict]) -> dict:
         combined_dict.update(sound_dict)
     return combined_dict
 
+def iter_fsm(raw_script_data: list[dict], validator: Validator, origins: Optional[list[Optional[tuple]]] = None) -> Iterator[dict]:
+    """
+    The streaming form of flatten -> sanitize -> check: yields each finished
+    state as soon as it is produced and feeds it to the validator.
+    Only one sanitized state is alive at a time.
+    """
+    if origins is not None and len(origins) != len(raw_script_data):
+        origins = None
+    check_nesting(raw_script_data, origins)
+    for state, top, line in iter_flatten(raw_script_data):
+        clean = _sanitize_value(state)
+        if line is not None:
+            origin = (raw_script_data[top].path.name, line)
+        else:
+            origin = origins[top] if origins else None
+        validator.feed(clean, origin)
+        yield clean
+
+def stream_fsm(raw_script_data: list[dict], outputs: list[BinaryIO], profile: str = "pretty", origins: Optional[list[Optional[tuple]]] = None, validator: Optional[Validator] = None) -> tuple[int, list[Diagnostic], dict[str, int]]:
+    """
+    Compiles the raw dialogueDict straight into every file in 'outputs', state by state.
+    The bytes written are identical to encode_json(process_fsm(...), profile).
+    Returns (state count, warnings, jump table).
+
+    Validation can only finish once every state is written, so this still raises
+    ScriptValidationError at the end; callers should write to temporary files.
+    """
+    validator = validator or Validator()
+
+    def write(chunk: str):
+        data = chunk.encode("utf-8")
+        for out in outputs:
+            out.write(data)
+
+    count = 0
+    for state in iter_fsm(raw_script_data, validator, origins):
+        if profile == "pretty":
+            # Same layout as json.dump(list, indent=4): every line of the state indented once more
+            write(("[\n    " if count == 0 else ",\n    ") + json.dumps(state, indent=4).replace("\n", "\n    "))
+        else:
+            write(("[" if count == 0 else ",") + json.dumps(state, **OUTPUT_PROFILES[profile]))
+        count += 1
+    write("[]" if count == 0 else ("\n]" if profile == "pretty" else "]"))
+
+    diagnostics = validator.finish()
+    if any(d.severity == "error" for d in diagnostics):
+        raise ScriptValidationError(diagnostics)
+    return count, diagnostics, validator.jump_table()
+
+def build_fsm(raw_script_data: list[dict], origins: Optional[list[Optional[tuple]]] = None, validator: Optional[Validator] = None) -> tuple[list[dict], list[Diagnostic]]:
+    """
+    Flattens, sanitizes and validates the raw dialogueDict.
+    origins, if given, holds the (file, line) of each raw action.
+    Returns (fsm, warnings). Raises ScriptValidationError on errors.
+    """
+    # 1. Flatten
+    with phase("flatten") as sample:
+        check_nesting(raw_script_data, origins)
+        flat = flattenVN(raw_script_data)
+        sample.states = len(flat)
+    # 2. Sanitize
+    with phase("sanitize"):
+        flat = sanitize(flat)
+    # 3. Validate
+    with phase("check"):
+        diagnostics = check(flat, expand_origins(raw_script_data, origins), validator)
+
+    return flat, diagnostics
+
 def process_fsm(raw_script_data: list[dict]) -> list[dict]:
     """
     Takes the raw dialogueDict from the VN Module, 
     cleans it, flattens it, and validates it.
     Returns the Pure Data (List of Dicts).
     """
-    # 1. Flatten
-    flat = flattenVN(raw_script_data)
-    # 2. Sanitize
-    flat = sanitize(flat)
-    # 3. Validate
-    print("Double Checking Script")
-    check(flat)
-    
-    return flat
\ No newline at end of file
+    return build_fsm(raw_script_data)[0]
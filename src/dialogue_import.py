@@ -0,0 +1,162 @@
+import csv
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from src import records
+from src.model import BASE_CHAR_PATH, Character
+
+# Bulk dialogue import.
+#
+# Writers draft long scenes in spreadsheets. Instead of turning every row into
+# a vn.say() line, a CSV / TSV / JSONL file can be compiled as it is: imported
+# from a script with vn.import_dialogue("scene.csv") (at the top level of the
+# story: not in a condition's actions), or listed in a script group's
+# source_files like a .py file. Columns (any order, header names are
+# case-insensitive, other columns are ignored):
+#   label    a label state before the row's line
+#   speaker  a character id from the library (its name is shown and its sprites
+#            are used), or else any name to show as is
+#   sprite   shows that sprite of the speaker (a library character) first
+#   text     what is said
+#   voice    the line's voice sound (as speak() does)
+# A row becomes, in this order: label, show, say; empty cells add nothing.
+#
+# Nothing is loaded up front. Importing reads the file once to check every row
+# and count its states, and adds a single DialogueImport to the dialogueDict.
+# The compiler reads the rows again while it flattens and turns each one into
+# action records on the spot, without any VisualNovelModule call or print per
+# row. Only what the output needs anyway (speakers, asset paths) is kept, so a
+# streamed compile of a file with millions of rows runs in constant memory.
+
+DIALOGUE_FORMATS = {".csv": "csv", ".tsv": "tsv", ".jsonl": "jsonl"}
+COLUMNS = ("label", "speaker", "sprite", "text", "voice")
+
+Speaker = Tuple[str, Optional[str], str, str]  # (shown name, character id or None, sprite folder, dyn sprite folder)
+
+
+class DialogueImportError(ValueError):
+    """The file (or one of its rows) cannot be imported. The message names the file and line."""
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    return (value if isinstance(value, str) else str(value)).strip()
+
+def read_rows(path: Path, fmt: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Streams (line number, {column: stripped value}) for every non-empty row."""
+    if fmt == "jsonl":
+        with open(path, "r", encoding="utf-8-sig") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError as e:
+                    raise DialogueImportError(f"{path.name}:{line_no}: invalid JSON ({e})")
+                if not isinstance(data, dict):
+                    raise DialogueImportError(f"{path.name}:{line_no}: expected a JSON object")
+                row = {column: _cell(data.get(column)) for column in COLUMNS}
+                if any(row.values()):
+                    yield line_no, row
+        return
+
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f, delimiter="\t" if fmt == "tsv" else ",")
+        header = next(reader, None)
+        if header is None:
+            return
+        names = [name.strip().lower() for name in header]
+        positions = {column: names.index(column) for column in COLUMNS if column in names}
+        if not positions.keys() & {"label", "sprite", "text"}:
+            raise DialogueImportError(f"{path.name}:1: the header has none of the columns label, sprite, text")
+        for cells in reader:
+            row = {column: _cell(cells[i]) if i < len(cells) else "" for column, i in positions.items()}
+            if any(row.values()):
+                yield reader.line_num, row
+
+
+class DialogueImport:
+    """
+    One imported dialogue file, as a single entry of the dialogueDict.
+    The compiler expands it into its states (see iter_states) while flattening.
+    """
+
+    def __init__(self, path: Path, fmt: Optional[str] = None):
+        self.path = Path(path)
+        self.format = fmt or DIALOGUE_FORMATS.get(self.path.suffix.lower())
+        if self.format not in DIALOGUE_FORMATS.values():
+            raise DialogueImportError(f"{self.path.name}: unknown dialogue format (use one of {', '.join(DIALOGUE_FORMATS)})")
+        if not self.path.is_file():
+            raise FileNotFoundError(f"Dialogue file not found: {self.path}")
+
+        self.speakers: Dict[str, Speaker] = {}
+        self.assets: Set[str] = set()    # Sprite and voice paths (see project_index.referenced_assets)
+        self.rows = 0
+        self.state_count = 0
+        self._stamp = self._file_stamp()
+        self._scan()
+
+    def _file_stamp(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _speaker(self, speaker: str) -> Speaker:
+        """Resolves a speaker cell once: a library character (recorded as read) or a plain name."""
+        resolved = self.speakers.get(speaker)
+        if resolved is None:
+            if speaker and "/" not in speaker and (BASE_CHAR_PATH / speaker / "data.json").is_file():
+                character = Character.from_id(speaker)
+                resolved = (
+                    character.name,
+                    character.id,
+                    f"characters/{character.id}/{character.outfit}/",
+                    f"characters/{character.id}/{character.dyn_outfit}/",
+                )
+            else:
+                resolved = (speaker, None, "", "")
+            self.speakers[speaker] = resolved
+        return resolved
+
+    def _scan(self):
+        """Checks every row, counts the states and collects speakers and assets."""
+        for line_no, row in read_rows(self.path, self.format):
+            name, char_id, folder, dyn_folder = self._speaker(row.get("speaker", ""))
+            self.rows += 1
+            if row.get("label"):
+                self.state_count += 1
+            if row.get("sprite"):
+                if char_id is None:
+                    raise DialogueImportError(f"{self.path.name}:{line_no}: a sprite needs a speaker that is a library character id, not {name!r}")
+                self.assets.update((folder + row["sprite"], dyn_folder + row["sprite"]))
+                self.state_count += 1
+            if row.get("text"):
+                if row.get("voice"):
+                    self.assets.add(row["voice"])
+                self.state_count += 1
+
+    def iter_states(self) -> Iterator[Tuple[int, records.ActionRecord]]:
+        """(line, action) for each of the file's states, read from disk again one row at a time."""
+        if self._file_stamp() != self._stamp:
+            raise DialogueImportError(f"{self.path.name}: changed while compiling; compile again")
+        for line_no, row in read_rows(self.path, self.format):
+            name, char_id, folder, dyn_folder = self.speakers[row.get("speaker", "")]
+            if row.get("label"):
+                yield line_no, records.Label(row["label"])
+            if row.get("sprite"):
+                yield line_no, records.ShowCenter(char_id, folder + row["sprite"], dyn_folder + row["sprite"])
+            if row.get("text"):
+                if row.get("voice"):
+                    yield line_no, records.Speak(name, row["text"], row["voice"])
+                else:
+                    yield line_no, records.Say(name, row["text"])
+
+    def origins(self) -> Iterator[Tuple[str, int]]:
+        """(file name, line) of each state, for diagnostics."""
+        for line_no, _ in self.iter_states():
+            yield (self.path.name, line_no)
+
+    def __repr__(self) -> str:
+        return f"DialogueImport({self.path.name!r}, rows={self.rows}, states={self.state_count})"
@@ -0,0 +1,224 @@
+import json
+import struct
+from collections import Counter
+from pathlib import Path
+from typing import Any, List
+
+# Compact binary form of a compiled FSM ('generated/{group}.hfsm').
+#
+# Layout (all integers are unsigned LEB128 varints unless noted):
+#   magic     b"HFSM" + 1 byte format version
+#   strings   count, then per string: byte length + utf-8 bytes
+#             (most frequent first, so common keys and labels get 1-byte indexes)
+#   states    count, then per state:
+#               opcode     index in OPCODES + 1, or 0 followed by the type's string index
+#               fields     count, then per field: key string index + value
+#
+# Values start with one tag byte:
+#   NONE / FALSE / TRUE   no payload
+#   INT                   zigzag varint
+#   FLOAT                 8 byte little-endian double
+#   STR                   string index
+#   LIST                  count + values
+#   DICT                  count + (key string index, value) pairs
+#
+# The "type" key is carried by the opcode; every other key keeps its order.
+
+MAGIC = b"HFSM"
+VERSION = 1
+
+# One opcode per known state type. Only ever append to this list.
+OPCODES = [
+    "label", "dialogue", "show_sprite", "remove_sprite", "modify_background",
+    "play_sound", "play_music", "transition", "choice", "night_choice",
+    "finish_dialogue", "meta", "modify_variable", "modify_global", "conditional",
+    "conditional_global", "next", "idle_chat", "unlock_dialogues", "random_dialogue",
+    "command", "give_player", "game_action",
+]
+_OPCODE_OF = {name: i + 1 for i, name in enumerate(OPCODES)}
+
+TAG_NONE, TAG_FALSE, TAG_TRUE, TAG_INT, TAG_FLOAT, TAG_STR, TAG_LIST, TAG_DICT = range(8)
+
+
+# ==========================================
+# WRITER
+# ==========================================
+
+def _key(key: Any) -> str:
+    """A dict key as the JSON output has it: numbers, booleans and None become strings."""
+    if isinstance(key, str):
+        return key
+    if key is None or isinstance(key, (int, float)):
+        return json.dumps(key)
+    raise TypeError(f"Cannot encode a {type(key).__name__} dict key in a binary FSM")
+
+def _count_strings(value: Any, counts: Counter):
+    if isinstance(value, str):
+        counts[value] += 1
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            counts[_key(k)] += 1
+            _count_strings(v, counts)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            _count_strings(v, counts)
+
+def _varint(out: bytearray, n: int):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _value(out: bytearray, value: Any, index: dict):
+    if value is None:
+        out.append(TAG_NONE)
+    elif value is True:
+        out.append(TAG_TRUE)
+    elif value is False:
+        out.append(TAG_FALSE)
+    elif isinstance(value, int):
+        out.append(TAG_INT)
+        _varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+    elif isinstance(value, float):
+        out.append(TAG_FLOAT)
+        out += struct.pack("<d", value)
+    elif isinstance(value, str):
+        out.append(TAG_STR)
+        _varint(out, index[value])
+    elif isinstance(value, (list, tuple)):
+        out.append(TAG_LIST)
+        _varint(out, len(value))
+        for v in value:
+            _value(out, v, index)
+    elif isinstance(value, dict):
+        out.append(TAG_DICT)
+        _varint(out, len(value))
+        for k, v in value.items():
+            _varint(out, index[_key(k)])
+            _value(out, v, index)
+    else:
+        raise TypeError(f"Cannot encode {type(value).__name__} in a binary FSM")
+
+def dumps(fsm: List[dict]) -> bytes:
+    """Encodes a compiled FSM (the list process_fsm returns)."""
+    counts = Counter()
+    for state in fsm:
+        for k, v in state.items():
+            if k == "type":
+                if v not in _OPCODE_OF:
+                    counts[v] += 1
+                continue
+            counts[_key(k)] += 1
+            _count_strings(v, counts)
+    strings = [s for s, _ in counts.most_common()]
+    index = {s: i for i, s in enumerate(strings)}
+
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+
+    # 1. String table
+    _varint(out, len(strings))
+    for s in strings:
+        encoded = s.encode("utf-8")
+        _varint(out, len(encoded))
+        out += encoded
+
+    # 2. States
+    _varint(out, len(fsm))
+    for state in fsm:
+        state_type = state["type"]
+        opcode = _OPCODE_OF.get(state_type, 0)
+        _varint(out, opcode)
+        if opcode == 0:
+            _varint(out, index[state_type])
+
+        _varint(out, len(state) - 1)
+        for k, v in state.items():
+            if k == "type":
+                continue
+            _varint(out, index[_key(k)])
+            _value(out, v, index)
+
+    return bytes(out)
+
+def write_fsm(fsm: List[dict], file_path: Path) -> int:
+    """Writes the binary FSM to file_path. Returns the number of bytes written."""
+    data = dumps(fsm)
+    with open(file_path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+# ==========================================
+# READER
+# ==========================================
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.pos = 0
+        self.strings: List[str] = []
+
+    def varint(self) -> int:
+        result = 0
+        shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def value(self) -> Any:
+        tag = self.data[self.pos]
+        self.pos += 1
+        if tag == TAG_STR:
+            return self.strings[self.varint()]
+        if tag == TAG_INT:
+            n = self.varint()
+            return n >> 1 if not n & 1 else -((n + 1) >> 1)
+        if tag == TAG_NONE:
+            return None
+        if tag == TAG_TRUE:
+            return True
+        if tag == TAG_FALSE:
+            return False
+        if tag == TAG_FLOAT:
+            (result,) = struct.unpack_from("<d", self.data, self.pos)
+            self.pos += 8
+            return result
+        if tag == TAG_LIST:
+            return [self.value() for _ in range(self.varint())]
+        if tag == TAG_DICT:
+            return {self.strings[self.varint()]: self.value() for _ in range(self.varint())}
+        raise ValueError(f"Corrupt binary FSM: unknown value tag {tag} at byte {self.pos - 1}")
+
+def loads(data: bytes) -> List[dict]:
+    """Decodes bytes produced by dumps() back into the FSM."""
+    if data[:4] != MAGIC:
+        raise ValueError("Not a binary FSM (bad magic)")
+    if data[4] != VERSION:
+        raise ValueError(f"Unsupported binary FSM version {data[4]}")
+
+    reader = _Reader(data)
+    reader.pos = 5
+
+    for _ in range(reader.varint()):
+        length = reader.varint()
+        reader.strings.append(str(reader.data[reader.pos:reader.pos + length], "utf-8"))
+        reader.pos += length
+
+    fsm = []
+    for _ in range(reader.varint()):
+        opcode = reader.varint()
+        state = {"type": OPCODES[opcode - 1] if opcode else reader.strings[reader.varint()]}
+        for _ in range(reader.varint()):
+            key = reader.strings[reader.varint()]
+            state[key] = reader.value()
+        fsm.append(state)
+    return fsm
+
+def read_fsm(file_path: Path) -> List[dict]:
+    with open(file_path, "rb") as f:
+        return loads(f.read())
@@ -0,0 +1,181 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
+
+# Where compiles spend their time.
+#
+# A compile runs inside profiling(); every step wraps itself in phase("name").
+# Outside of profiling() phase() only costs a ContextVar lookup, so the SDK
+# functions can be used on their own without any of this.
+#
+# Phases recorded by the SDK (times are summed when a phase runs more than once):
+#   compile     getting each source file's code object (src/bytecode.py)
+#   import      running each source file's module body
+#   story       the script's story() call
+#   static      compiling a file from its AST (CompileOptions.static)
+#   dialogue    checking a dialogue file listed in source_files (src/dialogue_import.py)
+#   flatten / sanitize / check
+#   optimize    optimize_fsm, when options.optimize
+#   jump_table  build_jump_table / resolve_jumps
+#   serialize   writing the JSON (and .json.gz / .labels.json) files
+#   binary      writing the .hfsm file
+#   stream      flatten + sanitize + check + serialize when the group is streamed to disk
+
+_current_profiler: ContextVar[Optional["Profiler"]] = ContextVar("current_profiler", default=None)
+
+
+@dataclass
+class PhaseSample:
+    """Handed to the body of a phase() so it can report what it processed."""
+    states: Optional[int] = None
+    bytes: Optional[int] = None
+
+
+class Profiler:
+    """Wall and CPU time (plus states/bytes) per phase of one group compile."""
+
+    def __init__(self):
+        self.phases: Dict[str, dict] = {}
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+
+    def add(self, name: str, wall: float, cpu: float, sample: PhaseSample):
+        entry = self.phases.setdefault(name, {"wall_ms": 0.0, "cpu_ms": 0.0, "calls": 0})
+        entry["wall_ms"] += wall * 1000
+        entry["cpu_ms"] += cpu * 1000
+        entry["calls"] += 1
+        if sample.states is not None:
+            entry["states"] = sample.states
+        if sample.bytes is not None:
+            entry["bytes"] = entry.get("bytes", 0) + sample.bytes
+
+    def report(self) -> dict:
+        """JSON-ready timings: totals so far, then each phase in the order it first ran."""
+        phases = {
+            name: {**entry, "wall_ms": round(entry["wall_ms"], 3), "cpu_ms": round(entry["cpu_ms"], 3)}
+            for name, entry in self.phases.items()
+        }
+        return {
+            "wall_ms": round((time.perf_counter() - self._wall_start) * 1000, 3),
+            "cpu_ms": round((time.thread_time() - self._cpu_start) * 1000, 3),
+            "phases": phases,
+        }
+
+
+@contextmanager
+def profiling():
+    """Collects every phase() run inside the block into a new Profiler."""
+    profiler = Profiler()
+    token = _current_profiler.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _current_profiler.reset(token)
+
+
+def merge_phases(phases: Dict[str, dict]):
+    """Adds phases recorded by another process's Profiler (its .phases) to the current run."""
+    profiler = _current_profiler.get()
+    if profiler is None:
+        return
+    for name, other in phases.items():
+        entry = profiler.phases.setdefault(name, {"wall_ms": 0.0, "cpu_ms": 0.0, "calls": 0})
+        for key, value in other.items():
+            entry[key] = entry.get(key, 0) + value if key != "states" else value
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Times the block as one phase of the current profiling() run.
+    Set .states / .bytes on the yielded sample to record counts.
+    """
+    sample = PhaseSample()
+    profiler = _current_profiler.get()
+    if profiler is None:
+        yield sample
+        return
+
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield sample
+    finally:
+        profiler.add(name, time.perf_counter() - wall_start, time.thread_time() - cpu_start, sample)
+
+
+# ==========================================
+# ROLLING STATS (for the compile-stats endpoint)
+# ==========================================
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values), math.ceil(p / 100 * len(sorted_values))) - 1)
+    return sorted_values[rank]
+
+def _summarize(values: List[float]) -> dict:
+    values = sorted(values)
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p90": round(percentile(values, 90), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(values[-1], 3) if values else 0.0,
+    }
+
+
+class CompileStats:
+    """The timings of the last `size` group compiles, for rolling percentiles."""
+
+    def __init__(self, size: int = 500):
+        self.samples: Deque[dict] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, project: str, group: str, endpoint: str, timings: dict):
+        with self._lock:
+            self.samples.append({
+                "project": project,
+                "group": group,
+                "endpoint": endpoint,
+                "at": time.time(),
+                "timings": timings,
+            })
+
+    def summary(self, project: Optional[str] = None) -> dict:
+        """
+        Percentiles (ms) of total wall time and of every phase, over all recent
+        samples (or one project's), plus the per-project p90 to spot slow projects.
+        """
+        with self._lock:
+            samples = [s for s in self.samples if project is None or s["project"] == project]
+
+        phase_walls: Dict[str, List[float]] = {}
+        for sample in samples:
+            for name, entry in sample["timings"]["phases"].items():
+                phase_walls.setdefault(name, []).append(entry["wall_ms"])
+
+        project_walls: Dict[str, List[float]] = {}
+        for sample in samples:
+            project_walls.setdefault(sample["project"], []).append(sample["timings"]["wall_ms"])
+
+        slowest = sorted(
+            ({"project": name, "compiles": len(walls), **_summarize(walls)} for name, walls in project_walls.items()),
+            key=lambda entry: entry["p90"],
+            reverse=True,
+        )
+        return {
+            "samples": len(samples),
+            "wall_ms": _summarize([s["timings"]["wall_ms"] for s in samples]),
+            "cpu_ms": _summarize([s["timings"]["cpu_ms"] for s in samples]),
+            "phases": {name: _summarize(walls) for name, walls in phase_walls.items()},
+            "projects": slowest,
+        }
+
+# One per server process; the compile endpoints record into it
+compile_stats = CompileStats()
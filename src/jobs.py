@@ -0,0 +1,240 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# Background jobs (project compiles and exports).
+#
+# A job runs on a small thread pool, so at most MAX_RUNNING_JOBS build at
+# once and at most MAX_QUEUED_JOBS wait behind them. The work function gets
+# the Job and reports through job.progress(stage, **counts); every report
+# becomes an event that status polls and the SSE stream pick up.
+#
+# The SSE stream waits for events on the event loop (Job.wait_events), so an
+# open stream does not hold a threadpool thread.
+#
+# Cancelling a queued job drops it. A running job stops at its next
+# progress() call, which raises JobCancelled inside the work function.
+#
+# HIKARIN_JOBS sets MAX_RUNNING_JOBS.
+
+MAX_RUNNING_JOBS = max(1, int(os.environ.get("HIKARIN_JOBS", "2")))
+MAX_QUEUED_JOBS = 32
+# Finished jobs kept around for status / download
+MAX_FINISHED_JOBS = 100
+# The same stage reports at most this often (the last report always gets through)
+PROGRESS_INTERVAL = 0.1
+
+FINISHED = ("done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised by Job.progress() once the job has been cancelled."""
+
+class JobQueueFull(Exception):
+    """Too many jobs are already waiting."""
+
+
+class JobFailed(Exception):
+    """
+    Raised by a work function to fail its job with a specific (JSON-ready)
+    error and the HTTP status the synchronous endpoint would have answered with.
+    """
+    def __init__(self, status_code: int, detail: Any):
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(str(detail))
+
+
+@dataclass
+class JobEvent:
+    seq: int
+    event: str      # "status" or a progress stage
+    data: dict
+
+
+class Job:
+    """One submitted compile or export."""
+
+    def __init__(self, kind: str, project: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.project = project
+        self.status = "queued"
+        self.progress_state: Dict[str, dict] = {}   # stage -> latest counts
+        self.result: Optional[dict] = None
+        self.error: Optional[dict] = None          # {"status_code", "detail"}
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.events: List[JobEvent] = []
+        self.future: Optional[Future] = None
+        self._cancelled = threading.Event()
+        self._last_report: Dict[str, float] = {}
+        self._unreported: Set[str] = set()           # Stages whose latest counts were throttled
+        self._lock = threading.Lock()
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()   # See wait_events
+
+    # ---- called by the work function ----
+
+    def progress(self, stage: str, force: bool = False, **counts):
+        """Reports progress. Raises JobCancelled if the job was cancelled meanwhile."""
+        if self._cancelled.is_set():
+            raise JobCancelled()
+        now = time.monotonic()
+        with self._lock:
+            self.progress_state[stage] = counts
+            if not force and now - self._last_report.get(stage, 0) < PROGRESS_INTERVAL:
+                self._unreported.add(stage)
+                return
+            self._last_report[stage] = now
+            self._unreported.discard(stage)
+            self._emit(stage, counts)
+
+    # ---- state ----
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def set_status(self, status: str):
+        with self._lock:
+            self.status = status
+            if status == "running":
+                self.started_at = time.time()
+            elif status in FINISHED:
+                self.finished_at = time.time()
+                # The final counts of every stage, even if they were throttled
+                for stage in sorted(self._unreported):
+                    self._emit(stage, self.progress_state[stage])
+                self._unreported.clear()
+            data = {"status": status}
+            if self.error is not None:
+                data["error"] = self.error
+            if self.result is not None:
+                data["result"] = self.result
+            self._emit("status", data)
+
+    def _emit(self, event: str, data: dict):
+        # Caller holds self._lock
+        self.events.append(JobEvent(len(self.events) + 1, event, data))
+        for loop, waiter in self._waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(waiter.set)
+
+    async def wait_events(self, seq: int, timeout: float) -> Tuple[List[JobEvent], bool]:
+        """Events newer than seq (waiting up to timeout for one), and whether the job is over."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            if len(self.events) > seq or self.finished:
+                return self.events[seq:], self.finished
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+        with self._lock:
+            return self.events[seq:], self.finished
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "project": self.project,
+                "status": self.status,
+                "progress": dict(self.progress_state),
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """Runs jobs on a bounded pool and remembers recent ones."""
+
+    def __init__(self, max_running: int = MAX_RUNNING_JOBS, max_queued: int = MAX_QUEUED_JOBS):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, project: str, work: Callable[[Job], dict]) -> Job:
+        """Queues work(job); its return value becomes job.result. Raises JobQueueFull."""
+        job = Job(kind, project)
+        with self._lock:
+            waiting = sum(1 for j in self.jobs.values() if j.status == "queued")
+            if waiting >= self.max_queued:
+                raise JobQueueFull(f"{waiting} jobs are already waiting")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_running, thread_name_prefix="job")
+            self.jobs[job.id] = job
+            self._trim()
+            job.future = self._executor.submit(self._run, job, work)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self, project: Optional[str] = None) -> List[Job]:
+        with self._lock:
+            return [job for job in self.jobs.values() if project is None or job.project == project]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancels the job (no-op if it already finished). Returns it, or None if unknown."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job._cancelled.set()
+        if job.future is not None and job.future.cancel():
+            # Never started
+            job.set_status("cancelled")
+        return job
+
+    def shutdown(self):
+        with self._lock:
+            for job in self.jobs.values():
+                if not job.finished:
+                    job._cancelled.set()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _run(self, job: Job, work: Callable[[Job], dict]):
+        if job._cancelled.is_set():
+            job.set_status("cancelled")
+            return
+        job.set_status("running")
+        try:
+            job.result = work(job)
+        except JobCancelled:
+            job.set_status("cancelled")
+        except JobFailed as e:
+            job.error = {"status_code": e.status_code, "detail": e.detail}
+            job.set_status("failed")
+        except Exception as e:
+            job.error = {"status_code": 500, "detail": f"{type(e).__name__}: {e}"}
+            job.set_status("failed")
+        else:
+            job.set_status("done")
+
+    def _trim(self):
+        # Caller holds self._lock; forget the oldest finished jobs
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+# One per server process
+job_manager = JobManager()
@@ -0,0 +1,35 @@
+import logging
+import os
+
+# Compile logging.
+#
+# The SDK used to print() a line for every VisualNovelModule call. On big
+# stories that was a real share of the compile time, and it buried everything
+# else on the server console. Output now goes through standard loggers, one
+# per module (logging.getLogger(__name__), so "src.modules", "src.compiler"...):
+#   DEBUG    every compiled action ("Compiling: ..."), module instances
+#   INFO     script errors (the API response has them anyway), failed precompiles
+#   WARNING  something a script author should look at (see VisualNovelModule.warn,
+#            which also puts it into the compile's diagnostics)
+#   ERROR    unexpected compile / export failures, unreadable character files
+#
+# Quiet by default: only warnings and errors are shown.
+# HIKARIN_LOG_LEVEL=DEBUG brings back the old per-action output.
+
+LOG_LEVEL = os.environ.get("HIKARIN_LOG_LEVEL", "WARNING").upper()
+
+# Top-level packages whose loggers configure_logging() sets up
+LOGGERS = ("src", "routes")
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """Sets the level of the SDK's loggers and gives them a console handler (once per process)."""
+    for name in LOGGERS:
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("[%(levelname)s] %(name)s: %(message)s"))
+            logger.addHandler(handler)
+            # uvicorn may give the root logger a handler too; print once
+            logger.propagate = False
@@ -1,17 +1,33 @@
 import os
 import shutil
 import json
+import zipfile
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 # Import models to know what we are exporting
 from src.model import ProjectManifest
 
-def export_resource_pack(slug: str, manifest: ProjectManifest) -> str:
+# Zip writes happen in chunks this big, so progress (and cancelling) never waits on one huge file
+ZIP_CHUNK = 1024 * 1024
+
+def export_resource_pack(slug: str, manifest: ProjectManifest, include_binary: bool = False, progress: Optional[Callable[..., None]] = None) -> str:
     """
     Builds the Minecraft Resource Pack.
+    With include_binary, the compact '.hfsm' scripts are shipped next to the JSON ones.
+    progress, if given, is called as progress("copy", files=n) for every file
+    copied into the pack and progress("zip", bytes=n, total=n, files=n) while
+    zipping. An exception raised by it aborts the export (nothing is left behind).
     Returns the absolute path to the generated .zip file.
     """
+    copied = 0
+
+    def copy(src: Path, dst: Path):
+        nonlocal copied
+        shutil.copy2(src, dst)
+        copied += 1
+        if progress:
+            progress("copy", files=copied)
     
     # 1. CONFIGURATION & PATHS
     # ------------------------
@@ -68,9 +84,9 @@ def export_resource_pack(slug: str, manifest: ProjectManifest) -> str:
         lib_icon = LIBRARY_DIR / "pack.png"
         
         if proj_icon.exists():
-            shutil.copy2(proj_icon, BUILD_DIR / "pack.png")
+            copy(proj_icon, BUILD_DIR / "pack.png")
         elif lib_icon.exists():
-            shutil.copy2(lib_icon, BUILD_DIR / "pack.png")
+            copy(lib_icon, BUILD_DIR / "pack.png")
 
         # 4. MERGE ASSETS (Library + Project)
         # -----------------------------------
@@ -79,23 +95,23 @@ def export_resource_pack(slug: str, manifest: ProjectManifest) -> str:
         # Copy Library Images -> textures/
         lib_imgs = LIBRARY_DIR / "images"
         if lib_imgs.exists():
-            _copy_tree_contents(lib_imgs, TEXTURES_DIR)
+            _copy_tree_contents(lib_imgs, TEXTURES_DIR, copy)
             
         # Copy Project Images -> textures/ (Overwrites Library)
         proj_imgs = PROJECT_DIR / "assets" / "images"
         if proj_imgs.exists():
-            _copy_tree_contents(proj_imgs, TEXTURES_DIR)
+            _copy_tree_contents(proj_imgs, TEXTURES_DIR, copy)
 
         # --- B. GLOBAL AUDIO ---
         # Copy Library Audio -> sounds/
         lib_audio = LIBRARY_DIR / "audio"
         if lib_audio.exists():
-            _copy_tree_contents(lib_audio, SOUNDS_DIR)
+            _copy_tree_contents(lib_audio, SOUNDS_DIR, copy)
             
         # Copy Project Audio -> sounds/ (Overwrites Library)
         proj_audio = PROJECT_DIR / "assets" / "audio"
         if proj_audio.exists():
-            _copy_tree_contents(proj_audio, SOUNDS_DIR)
+            _copy_tree_contents(proj_audio, SOUNDS_DIR, copy)
 
         # --- C. CHARACTERS (Special Handling) ---
         # We need to copy 'library/characters/{id}/*.png' to 'textures/characters/{id}/'
@@ -110,40 +126,84 @@ def export_resource_pack(slug: str, manifest: ProjectManifest) -> str:
                     for item in char_folder.iterdir():
                         if item.is_file() and item.suffix.lower() in ['.png', '.jpg']:
                             # Profile images sit directly in char folder
-                            shutil.copy2(item, target_char_dir / item.name)
+                            copy(item, target_char_dir / item.name)
                         elif item.is_dir():
                             # Variant subfolders (default/, angry/, etc.)
                             target_variant_dir = target_char_dir / item.name
                             target_variant_dir.mkdir(exist_ok=True)
                             for file in item.iterdir():
                                 if file.is_file() and file.suffix.lower() in ['.png', '.jpg']:
-                                    shutil.copy2(file, target_variant_dir / file.name)
+                                    copy(file, target_variant_dir / file.name)
         # 5. COPY GENERATED SCRIPTS (FSM JSON)
         # ------------------------------------
         # These go directly into assets/mobtalkerredux/
         generated_dir = PROJECT_DIR / "generated"
         if generated_dir.exists():
             for f in generated_dir.glob("*.json"):
-                shutil.copy2(f, ASSETS_ROOT / f.name)
+                copy(f, ASSETS_ROOT / f.name)
+            if include_binary:
+                for f in generated_dir.glob("*.hfsm"):
+                    copy(f, ASSETS_ROOT / f.name)
 
         # 6. ZIP IT UP
         # ------------
-        archive_path = shutil.make_archive(str(ZIP_PATH), 'zip', BUILD_DIR)
-        return archive_path
+        archive_path = Path(str(ZIP_PATH) + ".zip")
+        _zip_dir(BUILD_DIR, archive_path, progress)
+        return str(archive_path.absolute())
 
     finally:
         # 7. CLEANUP
         if BUILD_DIR.exists():
             shutil.rmtree(BUILD_DIR)
 
-def _copy_tree_contents(src: Path, dst: Path):
+def _copy_tree_contents(src: Path, dst: Path, copy: Callable[[Path, Path], None] = shutil.copy2):
     """Helper to copy files from src to dst, merging folders."""
     for item in src.iterdir():
         if item.is_dir():
             # If directory, recurse
             target_subdir = dst / item.name
             target_subdir.mkdir(exist_ok=True)
-            _copy_tree_contents(item, target_subdir)
+            _copy_tree_contents(item, target_subdir, copy)
         else:
             # If file, copy
-            shutil.copy2(item, dst / item.name)
\ No newline at end of file
+            copy(item, dst / item.name)
+
+def _zip_dir(root: Path, archive_path: Path, progress: Optional[Callable[..., None]] = None):
+    """
+    Zips everything under root (the same layout shutil.make_archive writes),
+    reporting the bytes written so far. The archive only replaces archive_path
+    once it is complete.
+    """
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in dirnames:
+            entries.append(Path(dirpath) / name)
+        for name in sorted(filenames):
+            entries.append(Path(dirpath) / name)
+    total = sum(entry.stat().st_size for entry in entries if entry.is_file())
+
+    part = archive_path.with_name(archive_path.name + ".part")
+    done = files = 0
+    try:
+        with zipfile.ZipFile(part, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for entry in entries:
+                arcname = entry.relative_to(root).as_posix()
+                if entry.is_dir():
+                    zf.write(entry, arcname)
+                    continue
+                info = zipfile.ZipInfo.from_file(entry, arcname)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with open(entry, "rb") as src, zf.open(info, "w") as dst:
+                    while chunk := src.read(ZIP_CHUNK):
+                        dst.write(chunk)
+                        done += len(chunk)
+                        if progress:
+                            progress("zip", bytes=done, total=total, files=files)
+                files += 1
+                if progress:
+                    progress("zip", bytes=done, total=total, files=files)
+        os.replace(part, archive_path)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
\ No newline at end of file
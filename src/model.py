@@ -1,12 +1,31 @@
 from dataclasses import dataclass, field
-import json
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
 from enum import Enum
 
+from src.character_cache import character_cache
+
 
 
 BASE_CHAR_PATH = Path("library/characters")
+
+# Character ids loaded through Character.from_id while a compile is running.
+# The build cache uses this to know which data.json files a group depends on.
+_character_reads: ContextVar[Optional[Set[str]]] = ContextVar("character_reads", default=None)
+
+@contextmanager
+def track_character_reads():
+    """
+    Collects every character id passed to Character.from_id inside the block.
+    """
+    reads: Set[str] = set()
+    token = _character_reads.set(reads)
+    try:
+        yield reads
+    finally:
+        _character_reads.reset(token)
 # ==========================================
 # ENUMS (For Script Logic / Constants)
 # ==========================================
@@ -53,17 +72,22 @@ class Character:
         """
         A factory method to create a Character instance by loading
         its data from 'library/characters/{character_id}/data.json'.
+        The parsed file is cached until it changes (see src/character_cache.py);
+        every call still returns a new Character.
         """
+        reads = _character_reads.get()
+        if reads is not None:
+            reads.add(character_id)
+
         # 1. Construct the full path to the data file
         file_path = BASE_CHAR_PATH / character_id / "data.json"
         
-        # 2. Check if the file exists and raise a clear error if not
-        if not file_path.exists():
-            raise FileNotFoundError(f"Could not find character data at: {file_path}")
-            
-        # 3. Open, read, and parse the JSON file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # 2. Read and parse the JSON file (or take it from the cache),
+        # raising a clear error if it does not exist
+        try:
+            data = character_cache.load(file_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Could not find character data at: {file_path}") from None
             
         # 4. Create and return an instance of the class using the loaded data.
         # The **data syntax automatically maps dictionary keys to the
@@ -83,6 +107,7 @@ class ScriptGroup:
     slug: str                  # The output filename (without .json)
     name: str                  # Display name in UI (e.g. "Main Story Chapter")
     source_files: List[str]    # The inputs: ["intro.py", "ch1.py", "ch2.py"]
+    entry_points: List[str] = field(default_factory=list)  # Labels the mod may start this group from (kept by the optimizer)
 
 @dataclass
 class ProjectManifest:
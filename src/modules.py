@@ -4,52 +4,163 @@
 # Adding new class unfortunately still doesn't work, (Yet), I'm working on it
 # Feel free to customize it to your system~
 from src.model import Character
+from src import records
+from src.dialogue_import import DialogueImport
+from bisect import bisect_right
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from types import CodeType
+from typing import Optional
+import logging
 import re
+import sys
+
+log = logging.getLogger(__name__)
+
+class ActionList(list):
+    """
+    The dialogueDict. A plain list that also remembers, for every action
+    appended, where in the script the call that added it was.
+    The compiler uses this to point its diagnostics at the right line.
+    """
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.origins = [None] * len(self)
+
+    def append(self, action):
+        # Frame 0 is this method, 1 is the VisualNovelModule method, 2 is the script.
+        # Only (code, instruction offset) is kept here: frame.f_lineno scans the
+        # line table from the start, which is quadratic over a 20k-line story().
+        frame = sys._getframe(2)
+        self.origins.append((frame.f_code, frame.f_lasti))
+        super().append(action)
+
+    def resolved_origins(self) -> list:
+        """(file, line) per action, with every code object's line table read only once."""
+        tables = {}
+        resolved = []
+        for origin in self.origins:
+            if origin is None or not isinstance(origin[0], CodeType):
+                resolved.append(origin)
+                continue
+            code, offset = origin
+            # Keyed by id(): hashing a code object hashes all of its bytecode
+            table = tables.get(id(code))
+            if table is None:
+                starts, lines = [], []
+                for start, _, line in code.co_lines():
+                    starts.append(start)
+                    lines.append(line)
+                table = tables[id(code)] = (starts, lines)
+            index = bisect_right(table[0], offset) - 1
+            line = table[1][index] if index >= 0 else None
+            resolved.append((code.co_filename, line if line is not None else code.co_firstlineno))
+        return resolved
+
+    def extend(self, actions):
+        before = len(self)
+        super().extend(actions)
+        self.origins += [None] * (len(self) - before)
+
+    def __iadd__(self, actions):
+        self.extend(actions)
+        return self
+
+    def insert(self, index, action):
+        super().insert(index, action)
+        self.origins.insert(index, None)
+
+# The VisualNovelModule that VisualNovelModule() returns. Context-local, so
+# compiles running at the same time on different threads (or asyncio tasks)
+# each build their own dialogueDict. See VisualNovelModule.session().
+_active_module: ContextVar[Optional["VisualNovelModule"]] = ContextVar("active_module", default=None)
+# The folder of the project being compiled; import_dialogue() paths are relative to it
+_project_dir: ContextVar[Optional[Path]] = ContextVar("project_dir", default=None)
+
 class VisualNovelModule:
-    # A class-level attribute to hold the single instance
-    _instance = None
 
     def __new__(cls, *args, **kwargs):
         """
         This special method controls the object creation process.
+        Scripts call VisualNovelModule() as often as they like and always
+        get the one instance of the current compile.
         """
-        # If the single instance does not exist yet...
-        if cls._instance is None:
-            # ...create it and store it in the class attribute.
-            print("--- Creating new VisualNovelModule instance ---")
-            cls._instance = super(VisualNovelModule, cls).__new__(cls)
+        instance = _active_module.get()
+        # If the current compile has no instance yet...
+        if instance is None:
+            # ...create it and make it the active one.
+            log.debug("Creating new VisualNovelModule instance")
+            instance = super(VisualNovelModule, cls).__new__(cls)
             # You can also initialize its state here
-            cls._instance.dialogueDict = [] 
+            instance.dialogueDict = ActionList()
+            # (index of the next action, code, message) per warn()
+            instance.warnings = []
             # Add any other initializations you need
-        
-        # Always return the stored instance
-        return cls._instance
+            _active_module.set(instance)
+
+        # Always return the active instance
+        return instance
+
+    @classmethod
+    @contextmanager
+    def session(cls, project_path: Optional[Path] = None):
+        """
+        Runs one compile: inside the block VisualNovelModule() starts from a clean
+        slate, and whatever instance was active before is back afterwards.
+        Sessions on other threads never see each other's instance.
+        project_path is the folder relative paths given to import_dialogue() start from.
+
+            with VisualNovelModule.session(project_path):
+                run_scripts()
+                actions = VisualNovelModule().to_list()
+        """
+        token = _active_module.set(None)
+        dir_token = _project_dir.set(project_path)
+        try:
+            yield
+        finally:
+            _project_dir.reset(dir_token)
+            _active_module.reset(token)
+
+    @classmethod
+    def active(cls) -> Optional["VisualNovelModule"]:
+        """The current compile's instance, or None if no script has created it yet."""
+        return _active_module.get()
 
     @classmethod
     def reset(cls):
         """
         A crucial helper method to clear the instance between compilations.
         This ensures compiling a new script group starts with a clean slate.
+        Only affects the current context; prefer session(), which also restores.
         """
-        print("--- Resetting VisualNovelModule instance ---")
-        cls._instance = None
+        log.debug("Resetting VisualNovelModule instance")
+        _active_module.set(None)
+
+    @classmethod
+    def _restore(cls, instance: Optional["VisualNovelModule"]):
+        """Makes `instance` (from active()) the current compile's instance again."""
+        _active_module.set(instance)
+
+    def warn(self, code: str, message: str):
+        """
+        Reports something the script author should look at. It is logged, and the
+        compile's diagnostics get it too, pointing at the script call that adds
+        the next action.
+        """
+        log.warning(message)
+        self.warnings.append((len(self.dialogueDict), code, message))
 
     def to_list(self):
         # This logic is a bit tricky now, see note below
         return self.dialogueDict
 
     def initialize(self,scriptName):
-        self.dialogueDict.append({
-            "type":"meta",
-            "action":"initialize",
-            "scriptName": scriptName
-        })
+        self.dialogueDict.append(records.Initialize(scriptName))
     
     def start(self):
-        result = {
-            "type":"meta",
-            "action":"start"
-        }
+        result = records.Start()
         self.dialogueDict.append(result)
         return result
 
@@ -61,18 +172,13 @@ class VisualNovelModule:
             name = ""
         else:
             name = character
-        print("Compiling: " + content)
+        log.debug("Compiling: %s", content)
         contains_uppercase = any(char.isupper() for char in content)
 
         # Check if content has no whitespace and is uppercase
         # if not contains_uppercase and not any(char in content for char in [' ', '.', ',', '!', '?', '#','@','$','*','`',':']):
         #     raise ValueError("Look suspiciously like a 'show' statement because it contains no whitespace or a capital letter. If this is a mistake, use 'say_special' instead of say to bypass this check. But seriously, do double check it, okay??? You probably want to do a `show(c,\""+content+"\")` rather than `say(c,"+content+")`. This check will make your life easier, I swear, it's better if you caught on to this error in the SDK than in Minecraft. At least you don't have to wait to boot up minecraft to check all these errors. Ya hear??? But if  you really don't like it, then you can disable this check permanently by going to modules.py and disable the raise value  stuff in the say method. Don't say I didn't warn you.")
-        result = {
-            "type": "dialogue",
-            "action": "say",
-            "label": name,
-            "content": content
-        }
+        result = records.Say(name, content)
         if not nested:
             self.dialogueDict.append(result)
         return result
@@ -85,19 +191,13 @@ class VisualNovelModule:
             name = ""
         else:
             name = character
-        print("Compiling: " + content)
+        log.debug("Compiling: %s", content)
         contains_uppercase = any(char.isupper() for char in content)
 
         # Check if content has no whitespace and is uppercase
         if not contains_uppercase and not any(char in content for char in [' ', '.', ',', '!', '?', '#','@','$','*','`',':']):
-            print("Look suspiciously like a 'show' statement because it contains no whitespace or a capital letter.")
-        result = {
-            "type": "dialogue",
-            "action": "say",
-            "label": name,
-            "content": content,
-            "voice":voice
-        }
+            self.warn("suspicious_say", f"Look suspiciously like a 'show' statement because it contains no whitespace or a capital letter: {content!r}")
+        result = records.Speak(name, content, voice)
         if not nested:
             self.dialogueDict.append(result)
         return result
@@ -110,58 +210,35 @@ class VisualNovelModule:
             name = ""
         else:
             name = character
-        print("Compiling: " + content)
+        log.debug("Compiling: %s", content)
 
-        result = {
-            "type": "dialogue",
-            "action": "say",
-            "label": name,
-            "content": content
-        }
+        result = records.Say(name, content)
         if not nested:
             self.dialogueDict.append(result)
         return result
     
     def background(self,background):
-        result = {
-            "type":"modify_background",
-            "background":"images/"+background
-        }
+        result = records.Background("images/"+background)
         self.dialogueDict.append(result)
         return result
     
     def voice_effect(self, sound):
-        result = {
-            "type":"play_sound",
-            "action":"sound_effect",
-            "sound":sound
-        }
+        result = records.SoundEffect(sound)
         self.dialogueDict.append(result)
         return result
 
     def game_action(self, actions):
-        result = {
-            "type": "game_action",
-            "actions": actions,
-        }
+        result = records.GameAction(actions)
         self.dialogueDict.append(result)
         return result
     
     def play_music(self, music):
-        result = {
-            "type":"play_music",
-            "action":"play_music",
-            "music":music
-        }
+        result = records.PlayMusic(music)
         self.dialogueDict.append(result)
         return result
     
     def stop_music(self):
-        result = {
-            "type":"play_music",
-            "action":"stop_music",
-            "music":None
-        }
+        result = records.StopMusic()
         self.dialogueDict.append(result)
         return result
     def show(self, character, sprite, nested=False):
@@ -170,22 +247,9 @@ class VisualNovelModule:
             
             location = "characters/" + character.id + "/" + character.outfit + "/" + sprite
             dyn_location = "characters/" + character.id + "/" + character.dyn_outfit + "/" + sprite
-            print("Compiling: " + sprite)
-
-            result = {
-                "type": "show_sprite",
-                "action": "show",
-                "sprite": character.id,
-                "location": location,
-                "dyn_location":dyn_location,
-                "position": "CENTER",
-                "wRatio": 16,
-                "hRatio": 9,
-                "wFrameRatio": 4,
-                "hFrameRatio": 8,
-                "column": 7,
-                "row": 1
-            }
+            log.debug("Compiling: %s", sprite)
+
+            result = records.ShowCenter(character.id, location, dyn_location)
             if not nested:
                 self.dialogueDict.append(result)
             return result
@@ -196,40 +260,15 @@ class VisualNovelModule:
         if isinstance(character, Character): 
             location = "characters/" + character.id + "/" + character.outfit + "/" + sprite
             dyn_location = "characters/" + character.id + "/" + character.dyn_outfit + "/" + sprite
-            print("Compiling: "+sprite)
-            result = {
-                "type":"show_sprite",
-                "action":"show",
-                "sprite":character.id,
-                "location":location,
-                "dyn_location" : dyn_location,
-                "position":"CUSTOM",
-                "wRatio": wRatio,
-                "hRatio": hRatio,
-                "wFrameRatio":wFrameRatio,
-                "hFrameRatio":hFrameRatio,
-                "column":colPos,
-                "row":rowPos
-            }
+            log.debug("Compiling: %s", sprite)
+            result = records.ShowCustom(character.id, location, dyn_location, wRatio, hRatio, wFrameRatio, hFrameRatio, colPos, rowPos)
             if(nested==False):
                 self.dialogueDict.append(result)
             return result
         elif isinstance(character,str):
             location = character+"/"+sprite
-            print("Compiling: "+sprite)
-            result = {
-                "type":"show_sprite",
-                "action":"show",
-                "sprite":sprite,
-                "location":location,
-                "position":"CUSTOM",
-                "wRatio": wRatio,
-                "hRatio": hRatio,
-                "wFrameRatio":wFrameRatio,
-                "hFrameRatio":hFrameRatio,
-                "column":colPos,
-                "row":rowPos
-            }
+            log.debug("Compiling: %s", sprite)
+            result = records.ShowCustomPath(sprite, location, wRatio, hRatio, wFrameRatio, hFrameRatio, colPos, rowPos)
             if(nested==False):
                 self.dialogueDict.append(result)
             return result
@@ -241,21 +280,8 @@ class VisualNovelModule:
   
             location = "characters/" + character.id + "/" + character.outfit + "/" + sprite
             dyn_location = "characters/" + character.id + "/" + character.dyn_outfit + "/" + sprite
-            print("Compiling: "+sprite)
-            result = {
-                "type":"show_sprite",
-                "action":"show",
-                "sprite":character.id,
-                "location":location,
-                "dyn_location":dyn_location,
-                "position":"LEFT",
-                "wRatio": 16,
-                "hRatio": 9,
-                "wFrameRatio":4,
-                "hFrameRatio":8,
-                "column":3,
-                "row":1
-            }
+            log.debug("Compiling: %s", sprite)
+            result = records.ShowLeft(character.id, location, dyn_location)
             if(nested==False):
                 self.dialogueDict.append(result)
             return result
@@ -267,21 +293,8 @@ class VisualNovelModule:
   
             location = "characters/" + character.id + "/" + character.outfit + "/" + sprite
             dyn_location = "characters/" + character.id + "/" + character.dyn_outfit + "/" + sprite
-            print("Compiling: "+sprite)
-            result = {
-                "type":"show_sprite",
-                "action":"show",
-                "sprite":character.id,
-                "location":location,
-                "dyn_location":dyn_location,
-                "position":"LEFT",
-                "wRatio": 16,
-                "hRatio": 9,
-                "wFrameRatio":4,
-                "hFrameRatio":8,
-                "column":10,
-                "row":1
-            }
+            log.debug("Compiling: %s", sprite)
+            result = records.ShowRight(character.id, location, dyn_location)
             if(nested==False):
                 self.dialogueDict.append(result)
             return result
@@ -291,20 +304,8 @@ class VisualNovelModule:
     def show_full(self,character,sprite,nested=False):
         if isinstance(character,str):
             location = character+"/"+sprite
-            print("Compiling: "+sprite)
-            result = {
-                "type":"show_sprite",
-                "action":"show",
-                "sprite":sprite,
-                "location":location,
-                "position":"CUSTOM",
-                "wRatio": 16,
-                "hRatio": 9,
-                "wFrameRatio":16,
-                "hFrameRatio":9,
-                "column":1,
-                "row":1
-            }
+            log.debug("Compiling: %s", sprite)
+            result = records.ShowFull(sprite, location)
             if(nested==False):
                 self.dialogueDict.append(result)
             return result
@@ -313,22 +314,14 @@ class VisualNovelModule:
     
     def remove(self,character,sprite="",nested=False):
         if isinstance(character, Character): 
-            print("Compiling: "+sprite)
-            result = {
-                "type":"remove_sprite",
-                "action":"remove_character",
-                "sprite":character.id
-            }
+            log.debug("Compiling: %s", sprite)
+            result = records.RemoveCharacter(character.id)
             if(nested==False):
                 self.dialogueDict.append(result)
             return result
         elif isinstance(character,str):
-            print("Compiling: "+sprite)
-            result = {
-                "type":"remove_sprite",
-                "action":"remove",
-                "sprite":character,
-            }
+            log.debug("Compiling: %s", sprite)
+            result = records.Remove(character)
             if(nested==False):
                 self.dialogueDict.append(result)
             return result
@@ -337,56 +330,37 @@ class VisualNovelModule:
         
         
     def choice(self,choice: dict,nested=False):
-        print(choice)
-        result = {
-            "type":"choice",
-            "action":"choice",
-            "choice":[{"label": key, "display": value} for key, value in choice.items()]
-        }
+        log.debug("Compiling: %s", choice)
+        result = records.Choice([{"label": key, "display": value} for key, value in choice.items()])
         if(nested==False):
             self.dialogueDict.append(result)
         return result
         
 
     def label(self,labelName:str,nested=False):
-        print("Compiling: "+labelName)
-        result = {
-            "type":"label",
-            "action" : "label",
-            "label":labelName
-        }
+        log.debug("Compiling: %s", labelName)
+        result = records.Label(labelName)
         if(nested==False):
             self.dialogueDict.append(result)
         return result
 
     def jumpTo(self,labelName:str,nested=False):
-        print("Compiling:" + labelName)
-        result = {
-            "type":"transition",
-            "action":"jump",
-            "label": labelName
-        }
+        log.debug("Compiling: %s", labelName)
+        result = records.Jump(labelName)
         if(nested==False):
             self.dialogueDict.append(result)
         return result
     
     def jumpTo(self,labelName:str,nested=False):
-        print("Compiling:" + labelName)
-        result = {
-            "type":"transition",
-            "action":"jump",
-            "label": labelName
-        }
+        log.debug("Compiling: %s", labelName)
+        result = records.Jump(labelName)
         if(nested==False):
             self.dialogueDict.append(result)
         return result
 
     def finish(self,nested=False):
-        print("Compiling A Finish Line")
-        result = {
-            "type":"finish_dialogue",
-            "action": "finish_dialogue"
-        }
+        log.debug("Compiling A Finish Line")
+        result = records.Finish()
         if(nested==False):
             self.dialogueDict.append(result)
         return result
@@ -394,47 +368,27 @@ class VisualNovelModule:
     ## LOCAL VAR STUFF
 
     def setVar(self,varName:str,init:any):
-        print("Compiling: "+varName)
-        result = {
-            "type":"meta",
-            "action": "create_var", 
-            "var": varName,
-            "init":init
-        }
+        log.debug("Compiling: %s", varName)
+        result = records.CreateVar(varName, init)
         self.dialogueDict.append(result)
         return result
 
     # You can use (-) instead of subVar
     def addVar(self,varName:str, addAmount:int):
-        print("Compiling: "+varName)
-        result = {
-            "type":"modify_variable",
-            "action": "increment_var", 
-            "var": varName, 
-            "value": addAmount
-            }
+        log.debug("Compiling: %s", varName)
+        result = records.IncrementVar(varName, addAmount)
         self.dialogueDict.append (result)
         return result
 
     def subVar(self,varName:str, subAmount:int):
-        print("Compiling: "+varName)
-        result = {
-            "type":"modify_variable",
-            "action": "subtract_var", 
-            "var": varName, 
-            "value": subAmount
-        }
+        log.debug("Compiling: %s", varName)
+        result = records.SubtractVar(varName, subAmount)
         self.dialogueDict.append(result)
         return result
 
     def modVar(self,varName:str, value:any):
-        print("Compiling: "+varName)
-        result = {
-            "type":"modify_variable",
-            "action": "modify_var", 
-            "var": varName, 
-            "value": value
-        }
+        log.debug("Compiling: %s", varName)
+        result = records.ModifyVar(varName, value)
         self.dialogueDict.append(result)
         return result
 
@@ -442,175 +396,94 @@ class VisualNovelModule:
     ## GLOBAL VAR STUFF
 
     def setGlobal(self,varName:str,init:any):
-        print("Compiling: "+varName)
-        result = {
-            "type":"meta",
-            "action": "create_global", 
-            "var": varName,
-            "init":init
-        }
+        log.debug("Compiling: %s", varName)
+        result = records.CreateGlobal(varName, init)
         self.dialogueDict.append(result)
         return result
 
     # You can use (-) instead of subVar
     def addVarGlobal(self,varName:str, addAmount:int):
-        print("Compiling: "+varName)
-        result = {
-            "type":"modify_global",
-            "action": "increment_var", 
-            "var": varName, 
-            "value": addAmount
-            }
+        log.debug("Compiling: %s", varName)
+        result = records.IncrementGlobal(varName, addAmount)
         self.dialogueDict.append (result)
         return result
 
     def subVarGlobal(self,varName:str, subAmount:int):
-        print("Compiling: "+varName)
-        result = {
-            "type":"modify_global",
-            "action": "subtract_var", 
-            "var": varName, 
-            "value": subAmount
-        }
+        log.debug("Compiling: %s", varName)
+        result = records.SubtractGlobal(varName, subAmount)
         self.dialogueDict.append(result)
         return result
 
     def modVarGlobal(self,varName:str, value:any):
-        print("Compiling: "+varName)
-        result = {
-            "type":"modify_global",
-            "action": "modify_var", 
-            "var": varName, 
-            "value": value
-        }
+        log.debug("Compiling: %s", varName)
+        result = records.ModifyGlobal(varName, value)
         self.dialogueDict.append(result)
         return result
 
     def next(self,label):
-        result = {
-            "type":"next",
-            "action":"next",
-            "label":label
-        }
+        result = records.Next(label)
         self.dialogueDict.append(result)
         return result
     
     def night_choice(self,choice: dict,nested=False):
-        print(choice)
-        result = {
-            "type":"night_choice",
-            "action":"choice",
-            "choice":[{"label": key, "display": value} for key, value in choice.items()]
-        }
+        log.debug("Compiling: %s", choice)
+        result = records.NightChoice([{"label": key, "display": value} for key, value in choice.items()])
         if(nested==False):
             self.dialogueDict.append(result)
         return result
     
     def idle_chats(self,nested = False):
-        result = {
-            "type":"idle_chat",
-            "action":"idle_chat"
-        }
+        result = records.IdleChat()
         if(nested==False):
             self.dialogueDict.append(result)
         return result
     
     def unlock_dialogue(self,events:list,nested = False):
-        result = {
-            "type":"unlock_dialogues",
-            "action":"unlock_dialogues",
-            "events":events # list[str] containing labels
-        }
+        result = records.UnlockDialogues(events) # list[str] containing labels
         if(nested==False):
             self.dialogueDict.append(result)
         return result
     
     def random_dialogue(self,events:list,nested = False):
-        result = {
-            "type":"random_dialogue",
-            "action":"random_dialogue",
-            "events":events # list[str] containing labels
-        }
+        result = records.RandomDialogue(events) # list[str] containing labels
         if(nested==False):
             self.dialogueDict.append(result)
         return result
     
     def condNight(self,actions):
-        print("Compiling: Night Condition")
-        result = {
-            "type":"conditional",
-            "action":"conditional",
-            "var": "isNight",
-            "condition": "equal",
-            "value":True,
-            "actions":actions
-        }
+        log.debug("Compiling: Night Condition")
+        result = records.CondNight(actions)
         self.dialogueDict.append(result)
         return result
     
     def condDay(self,actions):
-        print("Compiling: Day Condition")
-        result = {
-            "type":"conditional",
-            "action":"conditional",
-            "var": "isDay",
-            "condition": "equal",
-            "value":True,
-            "actions":actions
-        }
+        log.debug("Compiling: Day Condition")
+        result = records.CondDay(actions)
         self.dialogueDict.append(result)
         return result
 
 
     def condSame(self,varName: str, equalValue, actions):
-        print("Compiling: "+varName)
-        result = {
-            "type":"conditional",
-            "action":"conditional",
-            "condition": "equal",
-            "var": varName,
-            "value": equalValue,
-            "actions":actions
-        }
+        log.debug("Compiling: %s", varName)
+        result = records.CondEqual(varName, equalValue, actions)
         self.dialogueDict.append(result)
         return result
 
     def condNotSame(self,varName: str, equalValue, actions: list):
-        print("Compiling: "+varName)
-        result = {
-            "type":"conditional",
-            "action":"conditional",
-            "condition": "not_equal",
-            "var": varName,
-            "value": equalValue,
-            "actions": actions
-        }
+        log.debug("Compiling: %s", varName)
+        result = records.CondNotEqual(varName, equalValue, actions)
         self.dialogueDict.append(result)
         return result
 
     def condLessThan(self,varName:str, lessThanValue, actions: list):
-        print("Compiling: "+varName)
-        result = {
-            "type":"conditional",
-            "action":"conditional",
-            "condition": "less_than",
-            "var": varName,
-            "value": lessThanValue,
-            "actions": actions
-        }
+        log.debug("Compiling: %s", varName)
+        result = records.CondLessThan(varName, lessThanValue, actions)
         self.dialogueDict.append(result)
         return result
 
     def condMoreThan(self,varName:str, moreThanValue, actions: list):  
-        print("Compiling: "+varName)
-        result = {
-            "type":"conditional",
-            "action":"conditional",
-            "condition": "greater_than",
-            "var": varName,
-            "value": moreThanValue,
-            "actions": actions
-        }
+        log.debug("Compiling: %s", varName)
+        result = records.CondGreaterThan(varName, moreThanValue, actions)
         self.dialogueDict.append(result)
         return result
     
@@ -621,54 +494,26 @@ class VisualNovelModule:
     ### Global Condition
 
     def condSameGlobal(self,varName: str, equalValue, actions):
-        print("Compiling: "+varName)
-        result = {
-            "type":"conditional_global",
-            "action":"conditional",
-            "condition": "equal",
-            "var": varName,
-            "value": equalValue,
-            "actions":actions
-        }
+        log.debug("Compiling: %s", varName)
+        result = records.CondEqualGlobal(varName, equalValue, actions)
         self.dialogueDict.append(result)
         return result
 
     def condNotSameGlobal(self,varName: str, equalValue, actions: list):
-        print("Compiling: "+varName)
-        result = {
-            "type":"conditional_global",
-            "action":"conditional",
-            "condition": "not_equal",
-            "var": varName,
-            "value": equalValue,
-            "actions": actions
-        }
+        log.debug("Compiling: %s", varName)
+        result = records.CondNotEqualGlobal(varName, equalValue, actions)
         self.dialogueDict.append(result)
         return result
 
     def condLessThanGlobal(self,varName:str, lessThanValue, actions: list):
-        print("Compiling: "+varName)
-        result = {
-            "type":"conditional_global",
-            "action":"conditional",
-            "condition": "less_than",
-            "var": varName,
-            "value": lessThanValue,
-            "actions": actions
-        }
+        log.debug("Compiling: %s", varName)
+        result = records.CondLessThanGlobal(varName, lessThanValue, actions)
         self.dialogueDict.append(result)
         return result
 
     def condMoreThanGlobal(self,varName:str, moreThanValue, actions: list):  
-        print("Compiling: "+varName)
-        result = {
-            "type":"conditional_global",
-            "action":"conditional",
-            "condition": "greater_than",
-            "var": varName,
-            "value": moreThanValue,
-            "actions": actions
-        }
+        log.debug("Compiling: %s", varName)
+        result = records.CondGreaterThanGlobal(varName, moreThanValue, actions)
         self.dialogueDict.append(result)
         return result
 
@@ -677,31 +522,36 @@ class VisualNovelModule:
 
     
     def getGamemode(self,nested = True):
-        result = {
-            "type":"command",
-            "action":"get_gamemode"
-        }
+        result = records.GetGamemode()
         if(nested==False):
             self.dialogueDict.append(result)
         
         return result
 
     def customCommand(self,minecraftCommand:str):
-        result = {
-            "type":"command",
-            "action":"custom_command",
-            "command":minecraftCommand
-        }
+        result = records.CustomCommand(minecraftCommand)
         self.dialogueDict.append(result)
         return result
     
+    def import_dialogue(self, path, format: str = None):
+        """
+        Adds a whole CSV / TSV / JSONL dialogue file (label, speaker, sprite,
+        text and voice columns; see src/dialogue_import.py) at this point of the story.
+        It cannot go in a condition's actions (the compile reports "nested_import").
+        Relative paths start at the project folder. The rows are read again while
+        compiling, so only the returned DialogueImport stays in memory.
+        Scripts should import files from the project folder: the compile cache only
+        notices edits to those.
+        """
+        path = Path(path)
+        if not path.is_absolute():
+            path = (_project_dir.get() or Path.cwd()) / path
+        result = DialogueImport(path, format)
+        self.dialogueDict.append(result)
+        return result
+
     def givePlayer(self,itemId:str,amount:int):
-        result = {
-            "type":"give_player",
-            "action":"give_player",
-            "item_id":itemId,
-            "amount":amount
-        }
+        result = records.GivePlayer(itemId, amount)
         self.dialogueDict.append(result)
         return result
     
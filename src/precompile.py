@@ -0,0 +1,263 @@
+import gzip
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.build import CompileOptions, build_group
+from src.cache import CachedResult, body_etag, character_digests, group_digest, result_cache
+from src.compiler import ScriptValidationError, encode_json
+from src.instrument import compile_stats, profiling
+from src.model import ScriptGroup
+from src.project_index import ManifestError, project_indexes
+from src.symbols import check_group_events, external_labels, groups_from_table, load_symbol_table
+
+# Background precompile.
+#
+# Saving a file schedules a compile of every script group that lists it in
+# source_files (every group, for manifest.json; see src/project_index.py). The compile waits for the
+# saves to settle (DELAY seconds without another save to the same group), runs
+# on one background thread, and puts its response into the result cache, so
+# pressing Run is a cache hit instead of a compile.
+#
+# Saving a character does the same for the groups whose last compile read it
+# (ProjectIndex.groups_for_character), after dropping their cached responses.
+#
+# Every save bumps the group's generation. A job whose generation is no longer
+# current, because another save came in while it waited or ran, is dropped
+# without touching the cache.
+#
+# HIKARIN_PRECOMPILE=0 turns it off, HIKARIN_PRECOMPILE_DELAY sets the debounce.
+
+ENABLED = os.environ.get("HIKARIN_PRECOMPILE", "1") != "0"
+DELAY = float(os.environ.get("HIKARIN_PRECOMPILE_DELAY", "0.5"))
+
+# What GameRunner asks for; used until compile_temp has seen the group
+DEFAULT_OPTIONS = CompileOptions(profile="compact")
+
+GroupKey = Tuple[str, str]  # (project slug, group slug)
+
+log = logging.getLogger(__name__)
+
+
+# ==========================================
+# PREVIEW RESULTS (shared with compile_temp)
+# ==========================================
+
+def preview_prefix(slug: str, group: ScriptGroup) -> str:
+    """What the result cache keys of every compile_temp response of the group start with."""
+    return f"{slug}/{group.slug}:"
+
+def preview_key(project_path: Path, slug: str, group: ScriptGroup, options: CompileOptions) -> str:
+    """The result cache key of a compile_temp response."""
+    return preview_prefix(slug, group) + group_digest(project_path, group, asdict(options))
+
+def build_preview(project_path: Path, slug: str, group: ScriptGroup, options: CompileOptions, endpoint: str = "compile_temp") -> CachedResult:
+    """
+    Compiles one group in memory into an encoded compile_temp response (not
+    cached yet). Errors propagate exactly as build_group raises them.
+    """
+    # What is known of the other groups: the last project compile (symbols.json)
+    # and whatever has been compiled since
+    index = project_indexes.get(project_path)
+    known = groups_from_table(load_symbol_table(project_path / "generated") or {})
+    known.update(index.group_symbols)
+    known.pop(group.slug, None)
+
+    logs = []
+    with profiling() as profiler:
+        build = build_group(project_path, slug, group, logs, skip_missing=False, options=options, external_labels=external_labels(group.slug, known))
+    timings = profiler.report()
+    compile_stats.record(slug, group.slug, endpoint, timings)
+
+    if build.symbols is not None:
+        # Events naming other groups: check them against the same
+        cross_diagnostics = check_group_events(group.slug, build.symbols, known)
+        if any(d.severity == "error" for d in cross_diagnostics):
+            raise ScriptValidationError(build.diagnostics + cross_diagnostics, group.slug)
+        build.diagnostics += cross_diagnostics
+    index.record_build(group.slug, build.character_ids, build.assets, build.symbols)
+
+    if build.fsm is None:
+        result = {"status": "success", "data": [], "state_count": 0, "group": group.slug, "diagnostics": [], "timings": timings}
+    else:
+        result = {
+            "status": "success",
+            "group": group.slug,
+            "state_count": len(build.fsm),
+            "diagnostics": [asdict(d) for d in build.diagnostics],
+            "timings": timings,
+            "data": build.fsm
+        }
+        if build.jump_table is not None:
+            result["labels"] = build.jump_table
+        if options.optimize:
+            result["optimizations"] = build.optimizations
+
+    # Encoded once here; cache hits and 304s reuse these bytes
+    if options.profile == "compact":
+        body = encode_json(result, "compact")
+        gzipped = gzip.compress(body, compresslevel=6)
+    else:
+        # Byte for byte what FastAPI sends for a returned dict
+        body = json.dumps(result, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+        gzipped = None
+    return CachedResult(body_etag(body), body, gzipped, character_digests(build.character_ids))
+
+
+# ==========================================
+# SCHEDULER
+# ==========================================
+
+class PrecompileScheduler:
+    """Debounces saves into background compiles, one group at a time."""
+
+    def __init__(self, delay: float = DELAY):
+        self.delay = delay
+        self.generations: Dict[GroupKey, int] = {}
+        self.timers: Dict[GroupKey, threading.Timer] = {}
+        self.running: Dict[GroupKey, Tuple[int, Future]] = {}
+        self.options: Dict[GroupKey, CompileOptions] = {}   # Last options compile_temp used per group
+        self.completed = 0
+        self.skipped = 0       # Already in the result cache
+        self.superseded = 0
+        self.failed = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def file_saved(self, project_path: Path, slug: str, filename: str) -> List[str]:
+        """Schedules the groups affected by a save. Returns their slugs."""
+        if not ENABLED:
+            return []
+        try:
+            groups = project_indexes.get(project_path).groups_for_file(filename)
+        except ManifestError:
+            return []
+        for group in groups:
+            self.schedule(project_path, slug, group)
+        return [g.slug for g in groups]
+
+    def character_saved(self, char_id: str) -> List[str]:
+        """
+        Drops the cached responses of every group whose last compile read the
+        character and schedules those groups. Returns them as 'project/group'.
+        """
+        affected = []
+        for index, groups in project_indexes.character_users(char_id):
+            slug = index.project_path.name
+            for group in groups:
+                result_cache.discard_prefix(preview_prefix(slug, group))
+                if ENABLED:
+                    self.schedule(index.project_path, slug, group)
+                affected.append(f"{slug}/{group.slug}")
+        return affected
+
+    def schedule(self, project_path: Path, slug: str, group: ScriptGroup):
+        """(Re)starts the group's debounce timer; any older job for it becomes stale."""
+        key = (slug, group.slug)
+        with self._lock:
+            generation = self.generations.get(key, 0) + 1
+            self.generations[key] = generation
+            previous = self.timers.pop(key, None)
+            if previous is not None:
+                previous.cancel()
+                self.superseded += 1
+            timer = threading.Timer(self.delay, self._submit, (project_path, slug, group, generation))
+            timer.daemon = True
+            self.timers[key] = timer
+        timer.start()
+
+    def remember_options(self, slug: str, group_slug: str, options: CompileOptions):
+        """Later precompiles of the group use these options, so they land on the key Run asks for."""
+        with self._lock:
+            self.options[(slug, group_slug)] = options
+
+    def wait(self, slug: str, group_slug: str, timeout: Optional[float] = None):
+        """Blocks while a precompile of the group is running (not while it is still debouncing)."""
+        with self._lock:
+            job = self.running.get((slug, group_slug))
+        if job is not None:
+            try:
+                job[1].result(timeout)
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": ENABLED,
+                "pending": len(self.timers),
+                "running": len(self.running),
+                "completed": self.completed,
+                "skipped": self.skipped,
+                "superseded": self.superseded,
+                "failed": self.failed,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            for timer in self.timers.values():
+                timer.cancel()
+            self.timers.clear()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    # ---- internals ----
+
+    def _is_current(self, key: GroupKey, generation: int) -> bool:
+        return self.generations.get(key) == generation
+
+    def _submit(self, project_path: Path, slug: str, group: ScriptGroup, generation: int):
+        key = (slug, group.slug)
+        with self._lock:
+            if not self._is_current(key, generation):
+                return
+            self.timers.pop(key, None)
+            if self._executor is None:
+                # One thread: background compiles never compete with each other
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="precompile")
+            self.running[key] = (generation, self._executor.submit(self._run, project_path, slug, group, generation))
+
+    def _run(self, project_path: Path, slug: str, group: ScriptGroup, generation: int):
+        key = (slug, group.slug)
+        try:
+            with self._lock:
+                if not self._is_current(key, generation):
+                    self.superseded += 1
+                    return
+                options = self.options.get(key, DEFAULT_OPTIONS)
+
+            cache_key = preview_key(project_path, slug, group, options)
+            if cache_key in result_cache.entries:
+                # Run got there first
+                with self._lock:
+                    self.skipped += 1
+                return
+
+            entry = build_preview(project_path, slug, group, options, endpoint="precompile")
+
+            with self._lock:
+                # Saved again while compiling: this result may mix old and new sources
+                if not self._is_current(key, generation):
+                    self.superseded += 1
+                    return
+                self.completed += 1
+            result_cache.put(cache_key, entry)
+        except Exception as e:
+            # The user sees the real error when they press Run
+            with self._lock:
+                self.failed += 1
+            log.info("%s/%s failed: %s: %s", slug, group.slug, type(e).__name__, e)
+        finally:
+            with self._lock:
+                job = self.running.get(key)
+                if job is not None and job[0] == generation:
+                    del self.running[key]
+
+# One per server process
+precompiler = PrecompileScheduler()
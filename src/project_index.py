@@ -0,0 +1,212 @@
+import dataclasses
+import json
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.dialogue_import import DialogueImport
+from src.model import ProjectManifest, ScriptGroup
+from src.records import ActionRecord, fields_among
+
+# Project dependency index.
+#
+# Everything the server needs to know about how a project's files relate,
+# built once from manifest.json and kept until the manifest changes:
+#   file      -> groups that list it in source_files
+#   group     -> its source files
+#   group     -> characters and assets its last compile used, and its symbols
+#   character -> groups whose last compile used it
+# so "what does this save / this character edit affect" is a dict lookup
+# instead of a rescan of the project.
+#
+# The manifest-derived part is rebuilt when manifest.json is written (see
+# ProjectIndexes.invalidate) or changes on disk; the compile-derived part is
+# carried over for every group whose source files did not change.
+
+# Action fields that point at a file in the library or the project's assets
+ASSET_KEYS = ("location", "dyn_location", "background", "sound", "music", "voice")
+
+ManifestStamp = Optional[Tuple[int, int]]  # (mtime_ns, size) of manifest.json, None if missing
+
+
+class ManifestError(ValueError):
+    """manifest.json exists but cannot be read as a ProjectManifest."""
+
+
+def referenced_assets(actions: Iterable[dict]) -> Set[str]:
+    """Every asset path used by the actions, including nested (conditional) ones."""
+    assets = set()
+    stack = list(actions)
+    while stack:
+        action = stack.pop()
+        if type(action) is dict:
+            keys = ASSET_KEYS + ("actions",)
+        elif isinstance(action, ActionRecord) and action._extra is None:
+            # A record's constants are never paths; only its fields need a look
+            keys = fields_among(type(action), ASSET_KEYS + ("actions",))
+        elif isinstance(action, Mapping):
+            keys = ASSET_KEYS + ("actions",)
+        elif type(action) is DialogueImport:
+            # Collected while importing, without reading the file again
+            assets |= action.assets
+            continue
+        else:
+            continue
+        for key in keys:
+            value = action.get(key)
+            if isinstance(value, str) and value:
+                assets.add(value)
+            elif isinstance(value, list) and key == "actions":
+                stack.extend(value)
+    return assets
+
+
+def load_manifest(project_path: Path) -> ProjectManifest:
+    """
+    Reads 'manifest.json' into a ProjectManifest with real ScriptGroups.
+    A missing manifest (legacy single file projects) or one without groups
+    gets the default 'behavior' group built from main.py.
+    """
+    slug = project_path.name
+    manifest_path = project_path / "manifest.json"
+    if not manifest_path.exists():
+        return ProjectManifest(slug=slug, name=slug)
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # Drop keys that aren't part of ProjectManifest
+        # (e.g. 'path' injected by list_projects at runtime)
+        valid_keys = {f.name for f in dataclasses.fields(ProjectManifest)}
+        clean_data = {k: v for k, v in data.items() if k in valid_keys}
+        clean_data.setdefault("slug", slug)
+        clean_data.setdefault("name", slug)
+        groups = [g if isinstance(g, ScriptGroup) else ScriptGroup(**g) for g in clean_data.pop("script_groups", None) or []]
+        manifest = ProjectManifest(**clean_data)
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        raise ManifestError(f"Failed to load or parse manifest.json: {e}") from e
+
+    if groups:
+        manifest.script_groups = groups
+    return manifest
+
+
+class ProjectIndex:
+    """The dependency index of one project."""
+
+    def __init__(self, project_path: Path, manifest: ProjectManifest, stamp: ManifestStamp = None):
+        self.project_path = project_path
+        self.manifest = manifest
+        self.stamp = stamp
+        self.stale = False   # Set by ProjectIndexes.invalidate
+        self.groups: Dict[str, ScriptGroup] = {g.slug: g for g in manifest.script_groups}
+        self.file_groups: Dict[str, List[str]] = {}
+        for group in manifest.script_groups:
+            for filename in group.source_files:
+                slugs = self.file_groups.setdefault(filename, [])
+                if group.slug not in slugs:
+                    slugs.append(group.slug)
+        # Filled in by record_build
+        self.group_characters: Dict[str, Set[str]] = {}
+        self.group_assets: Dict[str, Set[str]] = {}
+        self.group_symbols: Dict[str, dict] = {}   # Validator.symbols() (see src/symbols.py)
+        self.character_groups: Dict[str, Set[str]] = {}
+
+    @property
+    def script_groups(self) -> List[ScriptGroup]:
+        """All groups, in manifest order."""
+        return self.manifest.script_groups
+
+    def group(self, group_slug: str) -> Optional[ScriptGroup]:
+        return self.groups.get(group_slug)
+
+    def groups_for_file(self, filename: str) -> List[ScriptGroup]:
+        """The groups a save of `filename` can change (all of them for manifest.json)."""
+        if filename == "manifest.json":
+            return list(self.script_groups)
+        return [self.groups[slug] for slug in self.file_groups.get(filename, [])]
+
+    def groups_for_character(self, char_id: str) -> List[ScriptGroup]:
+        """Groups whose last compile read this character."""
+        return [self.groups[slug] for slug in self.character_groups.get(char_id, ()) if slug in self.groups]
+
+    def record_build(self, group_slug: str, character_ids: Iterable[str], assets: Iterable[str], symbols: Optional[dict] = None):
+        """Remembers what a compile of the group just used (and defined)."""
+        for char_id in self.group_characters.get(group_slug, ()):
+            self.character_groups.get(char_id, set()).discard(group_slug)
+        characters = set(character_ids)
+        self.group_characters[group_slug] = characters
+        self.group_assets[group_slug] = set(assets)
+        if symbols is not None:
+            self.group_symbols[group_slug] = symbols
+        else:
+            self.group_symbols.pop(group_slug, None)
+        for char_id in characters:
+            self.character_groups.setdefault(char_id, set()).add(group_slug)
+
+    def carry_over(self, previous: "ProjectIndex"):
+        """Keeps the compile data of groups whose source files are unchanged."""
+        for slug, group in self.groups.items():
+            old = previous.groups.get(slug)
+            if old is not None and old.source_files == group.source_files and slug in previous.group_characters:
+                self.record_build(slug, previous.group_characters[slug], previous.group_assets.get(slug, ()), previous.group_symbols.get(slug))
+
+
+class ProjectIndexes:
+    """project folder -> its ProjectIndex, rebuilt only when the manifest changes."""
+
+    def __init__(self):
+        self._indexes: Dict[str, ProjectIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(self, project_path: Path) -> ProjectIndex:
+        """The project's index. Raises ManifestError if its manifest is broken."""
+        key = str(project_path.resolve())
+        stamp = self._stamp(project_path)
+        with self._lock:
+            index = self._indexes.get(key)
+        if index is not None and not index.stale and index.stamp == stamp:
+            return index
+
+        fresh = ProjectIndex(project_path, load_manifest(project_path), stamp)
+        with self._lock:
+            previous = self._indexes.get(key) or index
+            if previous is not None:
+                fresh.carry_over(previous)
+            self._indexes[key] = fresh
+        return fresh
+
+    def invalidate(self, project_path: Path):
+        """Called whenever manifest.json is written; the next get() re-reads it."""
+        with self._lock:
+            index = self._indexes.get(str(project_path.resolve()))
+            if index is not None:
+                index.stale = True
+
+    def character_users(self, char_id: str) -> List[Tuple[ProjectIndex, List[ScriptGroup]]]:
+        """Every loaded project with groups whose last compile read this character, and those groups."""
+        with self._lock:
+            indexes = list(self._indexes.values())
+        users = []
+        for index in indexes:
+            groups = index.groups_for_character(char_id)
+            if groups:
+                users.append((index, groups))
+        return users
+
+    def forget(self, project_path: Path):
+        """Drops the project entirely (it was deleted)."""
+        with self._lock:
+            self._indexes.pop(str(project_path.resolve()), None)
+
+    @staticmethod
+    def _stamp(project_path: Path) -> ManifestStamp:
+        try:
+            stat = (project_path / "manifest.json").stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+# One per process
+project_indexes = ProjectIndexes()
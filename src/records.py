@@ -0,0 +1,249 @@
+import keyword
+from collections.abc import MutableMapping
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Tuple
+
+# Compact action records.
+#
+# Every VisualNovelModule call used to build a dict, and the dialogueDict kept
+# all of them until the compile ended. Most of each dict is the same keys and
+# constants over and over ("type", "action", wRatio 16, hRatio 9...), which for
+# stories with hundreds of thousands of lines is most of the compile's memory.
+#
+# An action is now a record: a __slots__ object holding only the values that
+# vary per call, while the keys and the constant values live once on its class
+# (see record_type). Records act like the dicts they replace (indexing, get,
+# items, ==, assignment), so scripts that look at or edit what a call returned
+# keep working. Flattening turns every record into a real dict (to_dict), so the
+# FSM and the JSON written from it are exactly what they were.
+#
+# Setting a key a record has no slot for (a constant, or a new key) is allowed
+# too: the record then keeps a plain dict of itself in _extra and uses that.
+
+FIELD = object()  # record_type(): the value of this key is given per action
+
+_SCALARS = frozenset((str, int, float, bool, type(None)))
+
+
+def materialize(value: Any) -> Any:
+    """value with every record in it (also inside lists and dicts) turned into a plain dict."""
+    kind = type(value)
+    if kind in _SCALARS:
+        return value
+    if isinstance(value, ActionRecord):
+        return value.to_dict()
+    if kind is list:
+        return [materialize(item) for item in value]
+    if kind is dict:
+        return {key: materialize(item) for key, item in value.items()}
+    return value
+
+
+@lru_cache(maxsize=None)
+def fields_among(record: type, keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    """The keys (out of `keys`, in that order) a record type stores per action."""
+    return tuple(key for key in keys if key in record.FIELDS)
+
+
+class ActionRecord(MutableMapping):
+    """Base class of the types made by record_type()."""
+    __slots__ = ("_extra",)
+
+    KEYS: Tuple[str, ...] = ()           # Every key, in the order the dict had them
+    FIELDS: Tuple[str, ...] = ()         # The keys stored per action (the slots)
+    CONSTANTS: Dict[str, Any] = {}       # The others, with their value
+
+    def to_dict(self) -> dict:
+        """The action as a plain dict (nested records included). Generated per type."""
+        return {key: materialize(value) for key, value in self._extra.items()}
+
+    def shallow_dict(self) -> dict:
+        """
+        The action as a plain dict, its values as they are (nested records stay
+        records). For the flattener, which rebuilds a conditional's body itself.
+        Generated per type.
+        """
+        return dict(self._extra)
+
+    def __getitem__(self, key):
+        if self._extra is not None:
+            return self._extra[key]
+        if key in self.FIELDS:
+            return getattr(self, key)
+        return self.CONSTANTS[key]
+
+    def get(self, key, default=None):
+        # Mapping.get would go through a KeyError for every missing key
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        if key in self.FIELDS:
+            return getattr(self, key)
+        return self.CONSTANTS.get(key, default)
+
+    def __setitem__(self, key, value):
+        if self._extra is None:
+            if key in self.FIELDS:
+                setattr(self, key, value)
+                return
+            self._extra = dict(self.items())
+        self._extra[key] = value
+
+    def __delitem__(self, key):
+        if self._extra is None:
+            self._extra = dict(self.items())
+        del self._extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS if self._extra is None else self._extra)
+
+    def __len__(self) -> int:
+        return len(self.KEYS if self._extra is None else self._extra)
+
+    def __contains__(self, key) -> bool:
+        return key in (self.KEYS if self._extra is None else self._extra)
+
+    def copy(self) -> dict:
+        """A shallow copy, as a dict (like dict.copy)."""
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+
+def record_type(name: str, **keys: Any) -> type:
+    """
+    A record class for one kind of action. Keys are given in dict order, each
+    with its constant value or FIELD; the FIELD ones become the constructor's
+    arguments, in the same order:
+
+        Say = record_type("Say", type="dialogue", action="say", label=FIELD, content=FIELD)
+        Say("Cupa", "Hello!").to_dict()
+        # {'type': 'dialogue', 'action': 'say', 'label': 'Cupa', 'content': 'Hello!'}
+    """
+    fields = tuple(key for key, value in keys.items() if value is FIELD)
+    constants = {key: value for key, value in keys.items() if value is not FIELD}
+    for key in fields:
+        if not key.isidentifier() or keyword.iskeyword(key) or key.startswith("_"):
+            raise ValueError(f"{name}: {key!r} cannot be a field")
+    for key, value in constants.items():
+        if type(value) not in _SCALARS:
+            raise ValueError(f"{name}: constant {key!r} must be a str, number, bool or None")
+
+    # Straight-line __init__, to_dict and shallow_dict (as namedtuple does): they run once per action
+    init_lines = [f"def __init__(self{''.join(', ' + key for key in fields)}):"]
+    init_lines += [f"    self.{key} = {key}" for key in fields]
+    init_lines.append("    self._extra = None")
+    items = ", ".join(
+        f"{key!r}: materialize(self.{key})" if value is FIELD else f"{key!r}: {value!r}"
+        for key, value in keys.items()
+    )
+    shallow_items = ", ".join(
+        f"{key!r}: self.{key}" if value is FIELD else f"{key!r}: {value!r}"
+        for key, value in keys.items()
+    )
+    dict_lines = [
+        "def to_dict(self):",
+        "    if self._extra is not None:",
+        "        return ActionRecord.to_dict(self)",
+        f"    return {{{items}}}",
+        "def shallow_dict(self):",
+        "    if self._extra is not None:",
+        "        return ActionRecord.shallow_dict(self)",
+        f"    return {{{shallow_items}}}",
+    ]
+    namespace: Dict[str, Any] = {}
+    exec("\n".join(init_lines + dict_lines), {"materialize": materialize, "ActionRecord": ActionRecord}, namespace)
+
+    return type(name, (ActionRecord,), {
+        "__slots__": fields,
+        "__module__": __name__,
+        "__qualname__": name,
+        "KEYS": tuple(keys),
+        "FIELDS": fields,
+        "CONSTANTS": constants,
+        "__init__": namespace["__init__"],
+        "to_dict": namespace["to_dict"],
+        "shallow_dict": namespace["shallow_dict"],
+    })
+
+
+# ==========================================
+# THE ACTIONS OF VisualNovelModule
+# ==========================================
+# One type per dict shape a VisualNovelModule method builds. Key order matters:
+# it is the order of the keys in the JSON.
+
+_SPRITE_FRAME = ("wRatio", "hRatio", "wFrameRatio", "hFrameRatio", "column", "row")
+
+def _show(name: str, position: str, dyn_location: bool, frame: tuple) -> type:
+    """A show_sprite record; frame holds wRatio..row (FIELD or a constant each)."""
+    keys = {"type": "show_sprite", "action": "show", "sprite": FIELD, "location": FIELD}
+    if dyn_location:
+        keys["dyn_location"] = FIELD
+    keys["position"] = position
+    keys.update(zip(_SPRITE_FRAME, frame))
+    return record_type(name, **keys)
+
+def _conditional(name: str, kind: str, condition: str) -> type:
+    return record_type(name, type=kind, action="conditional", condition=condition, var=FIELD, value=FIELD, actions=FIELD)
+
+# ---- Meta / flow ----
+Initialize = record_type("Initialize", type="meta", action="initialize", scriptName=FIELD)
+Start = record_type("Start", type="meta", action="start")
+Label = record_type("Label", type="label", action="label", label=FIELD)
+Jump = record_type("Jump", type="transition", action="jump", label=FIELD)
+Next = record_type("Next", type="next", action="next", label=FIELD)
+Finish = record_type("Finish", type="finish_dialogue", action="finish_dialogue")
+Choice = record_type("Choice", type="choice", action="choice", choice=FIELD)
+NightChoice = record_type("NightChoice", type="night_choice", action="choice", choice=FIELD)
+IdleChat = record_type("IdleChat", type="idle_chat", action="idle_chat")
+UnlockDialogues = record_type("UnlockDialogues", type="unlock_dialogues", action="unlock_dialogues", events=FIELD)
+RandomDialogue = record_type("RandomDialogue", type="random_dialogue", action="random_dialogue", events=FIELD)
+
+# ---- Dialogue ----
+Say = record_type("Say", type="dialogue", action="say", label=FIELD, content=FIELD)
+Speak = record_type("Speak", type="dialogue", action="say", label=FIELD, content=FIELD, voice=FIELD)
+
+# ---- Sprites / scene ----
+ShowCenter = _show("ShowCenter", "CENTER", True, (16, 9, 4, 8, 7, 1))
+ShowLeft = _show("ShowLeft", "LEFT", True, (16, 9, 4, 8, 3, 1))
+ShowRight = _show("ShowRight", "LEFT", True, (16, 9, 4, 8, 10, 1))
+ShowCustom = _show("ShowCustom", "CUSTOM", True, (FIELD,) * 6)
+ShowCustomPath = _show("ShowCustomPath", "CUSTOM", False, (FIELD,) * 6)
+ShowFull = _show("ShowFull", "CUSTOM", False, (16, 9, 16, 9, 1, 1))
+RemoveCharacter = record_type("RemoveCharacter", type="remove_sprite", action="remove_character", sprite=FIELD)
+Remove = record_type("Remove", type="remove_sprite", action="remove", sprite=FIELD)
+Background = record_type("Background", type="modify_background", background=FIELD)
+
+# ---- Sound ----
+SoundEffect = record_type("SoundEffect", type="play_sound", action="sound_effect", sound=FIELD)
+PlayMusic = record_type("PlayMusic", type="play_music", action="play_music", music=FIELD)
+StopMusic = record_type("StopMusic", type="play_music", action="stop_music", music=None)
+
+# ---- Variables ----
+CreateVar = record_type("CreateVar", type="meta", action="create_var", var=FIELD, init=FIELD)
+IncrementVar = record_type("IncrementVar", type="modify_variable", action="increment_var", var=FIELD, value=FIELD)
+SubtractVar = record_type("SubtractVar", type="modify_variable", action="subtract_var", var=FIELD, value=FIELD)
+ModifyVar = record_type("ModifyVar", type="modify_variable", action="modify_var", var=FIELD, value=FIELD)
+CreateGlobal = record_type("CreateGlobal", type="meta", action="create_global", var=FIELD, init=FIELD)
+IncrementGlobal = record_type("IncrementGlobal", type="modify_global", action="increment_var", var=FIELD, value=FIELD)
+SubtractGlobal = record_type("SubtractGlobal", type="modify_global", action="subtract_var", var=FIELD, value=FIELD)
+ModifyGlobal = record_type("ModifyGlobal", type="modify_global", action="modify_var", var=FIELD, value=FIELD)
+
+# ---- Conditionals ----
+CondNight = record_type("CondNight", type="conditional", action="conditional", var="isNight", condition="equal", value=True, actions=FIELD)
+CondDay = record_type("CondDay", type="conditional", action="conditional", var="isDay", condition="equal", value=True, actions=FIELD)
+CondEqual = _conditional("CondEqual", "conditional", "equal")
+CondNotEqual = _conditional("CondNotEqual", "conditional", "not_equal")
+CondLessThan = _conditional("CondLessThan", "conditional", "less_than")
+CondGreaterThan = _conditional("CondGreaterThan", "conditional", "greater_than")
+CondEqualGlobal = _conditional("CondEqualGlobal", "conditional_global", "equal")
+CondNotEqualGlobal = _conditional("CondNotEqualGlobal", "conditional_global", "not_equal")
+CondLessThanGlobal = _conditional("CondLessThanGlobal", "conditional_global", "less_than")
+CondGreaterThanGlobal = _conditional("CondGreaterThanGlobal", "conditional_global", "greater_than")
+
+# ---- Game ----
+GameAction = record_type("GameAction", type="game_action", actions=FIELD)
+GetGamemode = record_type("GetGamemode", type="command", action="get_gamemode")
+CustomCommand = record_type("CustomCommand", type="command", action="custom_command", command=FIELD)
+GivePlayer = record_type("GivePlayer", type="give_player", action="give_player", item_id=FIELD, amount=FIELD)
@@ -0,0 +1,216 @@
+import ast
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+from src.modules import VisualNovelModule
+from src.model import Character
+
+# Static compile mode.
+#
+# Project scripts are almost always straight-line VisualNovelModule calls with
+# literal arguments (that is all the Blockly editor generates). For those, this
+# module reads the script's AST and makes the same SDK calls directly. The
+# script itself is never executed, so there is no import or exec cost.
+# The action dicts come from the real VisualNovelModule methods, so the output
+# is exactly what executing the script would produce.
+#
+# What is understood:
+#   - 'from src.modules import VisualNovelModule' / 'from src.model import Character'
+#   - name = <expression>, at module level or in story()
+#   - VisualNovelModule(), Character.from_id("id"), vn.<any public method>(...)
+#   - literals: str/int/float/bool/None, lists, tuples, dicts, negative numbers
+#   - a docstring, 'pass', and 'return' at the end of story()
+# Anything else (loops, ifs, f-strings, other imports, helper functions...)
+# raises DynamicScript, and the caller executes the file as usual.
+
+SDK_EXPORTS = {
+    "src.modules": {"VisualNovelModule": VisualNovelModule},
+    "src.model": {"Character": Character},
+}
+
+
+class DynamicScript(Exception):
+    """The file does something the static compiler does not model; it has to be executed."""
+
+
+class _Lowering:
+    """Walks one file's AST, making the VisualNovelModule calls it describes."""
+
+    def __init__(self, file_path: Path):
+        self.file = str(file_path)
+        self.globals: Dict[str, Any] = {}
+        self.locals: Optional[Dict[str, Any]] = None   # Set while inside story()
+        self.local_names: Set[str] = set()             # Every name story() assigns (Python makes them local)
+
+    # ---- statements ----
+
+    def run_module(self, tree: ast.Module) -> bool:
+        """Runs the module body, then story(). Returns False if there is no story()."""
+        story = None
+        for node in tree.body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                self.bind_import(node)
+            elif isinstance(node, ast.FunctionDef) and node.name == "story":
+                if node.args.args or node.args.posonlyargs or node.args.kwonlyargs or node.args.vararg or node.args.kwarg or node.decorator_list:
+                    raise DynamicScript("story() has arguments or decorators")
+                story = node
+            else:
+                self.run_statement(node, self.globals)
+
+        if story is None:
+            return False
+
+        self.locals = {}
+        # Only top-level assignments can get this far: any nested statement is DynamicScript
+        self.local_names = {
+            target.id
+            for node in story.body
+            if isinstance(node, ast.Assign)
+            for target in node.targets
+            if isinstance(target, ast.Name)
+        }
+        for node in story.body:
+            if isinstance(node, ast.Return):
+                if node.value is not None:
+                    self.eval(node.value)
+                break
+            self.run_statement(node, self.locals)
+        return True
+
+    def bind_import(self, node):
+        if isinstance(node, ast.Import) or node.level or node.module not in SDK_EXPORTS:
+            raise DynamicScript(f"line {node.lineno}: imports something other than the SDK")
+        exports = SDK_EXPORTS[node.module]
+        for alias in node.names:
+            if alias.name not in exports:
+                raise DynamicScript(f"line {node.lineno}: imports {alias.name} from {node.module}")
+            self.globals[alias.asname or alias.name] = exports[alias.name]
+
+    def run_statement(self, node: ast.stmt, scope: Dict[str, Any]):
+        if isinstance(node, ast.Pass):
+            return
+        if isinstance(node, ast.Expr):
+            if isinstance(node.value, ast.Constant):
+                return  # Docstring or a stray literal
+            self.eval(node.value)
+            return
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            scope[node.targets[0].id] = self.eval(node.value)
+            return
+        raise DynamicScript(f"line {node.lineno}: {type(node).__name__} statement")
+
+    # ---- expressions ----
+
+    def lookup(self, node: ast.Name) -> Any:
+        name = node.id
+        if self.locals is not None and name in self.local_names:
+            if name not in self.locals:
+                raise DynamicScript(f"line {node.lineno}: '{name}' used before it is assigned")
+            return self.locals[name]
+        if name in self.globals:
+            return self.globals[name]
+        raise DynamicScript(f"line {node.lineno}: unknown name '{name}'")
+
+    def eval(self, node: ast.expr) -> Any:
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Name):
+            return self.lookup(node)
+        if isinstance(node, ast.List):
+            return [self.eval(item) for item in self.plain(node.elts)]
+        if isinstance(node, ast.Tuple):
+            return tuple(self.eval(item) for item in self.plain(node.elts))
+        if isinstance(node, ast.Dict):
+            if any(key is None for key in node.keys):
+                raise DynamicScript(f"line {node.lineno}: ** inside a dict")
+            result = {}
+            for key, value in zip(node.keys, node.values):
+                result[self.eval(key)] = self.eval(value)
+            return result
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            value = self.eval(node.operand)
+            if type(value) in (int, float):
+                return -value if isinstance(node.op, ast.USub) else +value
+        if isinstance(node, ast.Attribute) and node.attr == "dialogueDict":
+            owner = self.eval(node.value)
+            if isinstance(owner, VisualNovelModule):
+                return owner.dialogueDict
+        if isinstance(node, ast.Call):
+            return self.call(node)
+        raise DynamicScript(f"line {node.lineno}: {type(node).__name__} expression")
+
+    def plain(self, items: list) -> list:
+        if any(isinstance(item, ast.Starred) for item in items):
+            raise DynamicScript(f"line {items[0].lineno}: * unpacking")
+        return items
+
+    def call(self, node: ast.Call) -> Any:
+        func = self.resolve_callable(node.func)
+        # Same order Python evaluates them in
+        args = [self.eval(arg) for arg in self.plain(node.args)]
+        kwargs = {}
+        for keyword in node.keywords:
+            if keyword.arg is None:
+                raise DynamicScript(f"line {node.lineno}: ** in a call")
+            kwargs[keyword.arg] = self.eval(keyword.value)
+
+        instance = getattr(func, "__self__", None)
+        if not isinstance(instance, VisualNovelModule):
+            return func(*args, **kwargs)
+
+        # Point new actions at this line, as ActionList does for executed scripts
+        actions = instance.dialogueDict
+        before = len(actions)
+        result = func(*args, **kwargs)
+        origins = getattr(actions, "origins", None)
+        if origins is not None:
+            for index in range(before, len(actions)):
+                origins[index] = (self.file, node.lineno)
+        return result
+
+    def resolve_callable(self, func: ast.expr):
+        if isinstance(func, ast.Name):
+            target = self.lookup(func)
+            if target is VisualNovelModule:
+                return target
+        elif isinstance(func, ast.Attribute):
+            owner = self.eval(func.value)
+            if owner is Character and func.attr == "from_id":
+                return Character.from_id
+            if isinstance(owner, VisualNovelModule) and not func.attr.startswith("_") and callable(getattr(VisualNovelModule, func.attr, None)):
+                return getattr(owner, func.attr)
+        raise DynamicScript(f"line {func.lineno}: call to something other than the SDK")
+
+
+def run_static(file_path: Path) -> bool:
+    """
+    Compiles one script file without executing it: its module body and then
+    story(), as VisualNovelModule calls. Returns False if it has no story().
+
+    Raises DynamicScript if the file needs to be executed. Anything the file
+    had already added to the VisualNovelModule is undone first, so the caller
+    can simply execute it instead.
+    """
+    source = file_path.read_text(encoding="utf-8")
+    try:
+        tree = ast.parse(source, filename=str(file_path))
+    except SyntaxError as e:
+        raise DynamicScript(f"syntax error on line {e.lineno}")
+
+    instance = VisualNovelModule.active()
+    before = len(instance.dialogueDict) if instance is not None else 0
+    warned = len(instance.warnings) if instance is not None else 0
+    try:
+        return _Lowering(file_path).run_module(tree)
+    except Exception as e:
+        # Undo, then let execution reproduce whatever happened (with a proper traceback)
+        VisualNovelModule._restore(instance)
+        if instance is not None:
+            actions = instance.dialogueDict
+            del actions[before:]
+            if hasattr(actions, "origins"):
+                del actions.origins[before:]
+            del instance.warnings[warned:]
+        if isinstance(e, DynamicScript):
+            raise
+        raise DynamicScript(f"{type(e).__name__} while lowering: {e}") from e
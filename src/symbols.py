@@ -0,0 +1,133 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from src.compiler import Diagnostic
+
+# Project-wide symbol table.
+#
+# Every group compile yields its symbols (Validator.symbols): its labels with
+# their state index, the variables and globals it creates, and the events
+# (unlock_dialogues / random_dialogue) it names that are not its own labels.
+# Those events usually point at another group (idle chats, night events), so
+# they can only be checked once every group is known:
+#   - an unlock_dialogues event no group defines is an error
+#   - a random_dialogue event no group defines is a warning
+#   - an event defined by several other groups is a warning (the first one wins)
+#
+# The other way round, a group's labels that other groups' events name are
+# entry points of that group: the optimizer must keep them, and they are not
+# unreachable. Those labels (external_labels) are worked out before the groups
+# compile, from what is known of every group, and checked again afterwards
+# (see run_compile in routes/project_route.py).
+#
+# The merged table is written as 'generated/symbols.json'. Besides the labels,
+# variables and globals it holds every cross-group event already resolved to
+# a (group, state), so the runtime never has to load other groups to find it.
+
+SYMBOLS_FILE = "symbols.json"
+SYMBOLS_VERSION = 1
+
+
+def build_symbol_table(group_symbols: Dict[str, dict]) -> dict:
+    """
+    Merges per-group symbols (group slug -> Validator.symbols(), in manifest
+    order) into the project table.
+    """
+    labels: Dict[str, List[dict]] = {}
+    variables: Dict[str, List[str]] = {}
+    globals_: Dict[str, List[str]] = {}
+    for group, symbols in group_symbols.items():
+        for label, state in symbols["labels"].items():
+            labels.setdefault(label, []).append({"group": group, "state": state})
+        for name in symbols["variables"]:
+            variables.setdefault(name, []).append(group)
+        for name in symbols["globals"]:
+            globals_.setdefault(name, []).append(group)
+
+    events: Dict[str, Dict[str, dict]] = {}
+    for group, symbols in group_symbols.items():
+        for event in symbols["events"]:
+            targets = [target for target in labels.get(event["label"], []) if target["group"] != group]
+            if targets:
+                events.setdefault(group, {})[event["label"]] = targets[0]
+
+    return {
+        "version": SYMBOLS_VERSION,
+        "labels": labels,
+        "variables": variables,
+        "globals": globals_,
+        "events": events,
+    }
+
+def cross_group_diagnostics(group_symbols: Dict[str, dict], table: dict) -> List[Diagnostic]:
+    """Checks every group's external events against the project table."""
+    diagnostics = []
+    for group, symbols in group_symbols.items():
+        for event in symbols["events"]:
+            label = event["label"]
+            targets = [target["group"] for target in table["labels"].get(label, []) if target["group"] != group]
+            where = dict(file=event["file"], line=event["line"], group=group)
+            if not targets:
+                if event["type"] == "unlock_dialogues":
+                    diagnostics.append(Diagnostic("error", "missing_label", f"Label not found in any script group: {label}", **where))
+                else:
+                    diagnostics.append(Diagnostic("warning", "unresolved_event", f"Random event label not found in any script group: {label}", **where))
+            elif len(targets) > 1:
+                diagnostics.append(Diagnostic(
+                    "warning", "ambiguous_event",
+                    f"Event label {label} is defined in several script groups ({', '.join(targets)}); using {targets[0]}",
+                    **where,
+                ))
+    return diagnostics
+
+def external_labels(group: str, group_symbols: Dict[str, dict]) -> Set[str]:
+    """
+    Every label that the events of the other groups name (group_symbols: slug -> symbols).
+    Passed to build_group, which keeps them as entry points of the group.
+    """
+    return {
+        event["label"]
+        for other, symbols in group_symbols.items() if other != group
+        for event in symbols.get("events", ())
+    }
+
+def check_group_events(group: str, symbols: dict, known_groups: Dict[str, dict]) -> List[Diagnostic]:
+    """
+    cross_group_diagnostics for one group compiled on its own (compile_temp),
+    against what is known about the others (known_groups: slug -> symbols).
+    """
+    group_symbols = {**known_groups, group: symbols}
+    return cross_group_diagnostics({group: symbols}, build_symbol_table(group_symbols))
+
+def groups_from_table(table: dict) -> Dict[str, dict]:
+    """
+    The per-group symbols a saved table was built from. Only the events that
+    resolved are in the table, and only by label (their type, file and line are None).
+    """
+    groups: Dict[str, dict] = {}
+
+    def entry(group: str) -> dict:
+        return groups.setdefault(group, {"labels": {}, "variables": [], "globals": [], "events": []})
+
+    for label, targets in table.get("labels", {}).items():
+        for target in targets:
+            entry(target["group"])["labels"][label] = target["state"]
+    for name, owners in table.get("variables", {}).items():
+        for group in owners:
+            entry(group)["variables"].append(name)
+    for name, owners in table.get("globals", {}).items():
+        for group in owners:
+            entry(group)["globals"].append(name)
+    for group, events in table.get("events", {}).items():
+        entry(group)["events"] += [{"label": label, "type": None, "file": None, "line": None} for label in events]
+    return groups
+
+def load_symbol_table(output_dir: Path) -> Optional[dict]:
+    """'generated/symbols.json' from the last project compile, if it is there and readable."""
+    try:
+        with open(output_dir / SYMBOLS_FILE, "r", encoding="utf-8") as f:
+            table = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return table if table.get("version") == SYMBOLS_VERSION else None
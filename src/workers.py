@@ -0,0 +1,173 @@
+import os
+import sys
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+# Warm pool of script workers.
+#
+# User scripts used to be exec'd inside the API server for every compile.
+# Instead they now run in long-lived worker processes that already have the
+# SDK imported; a job runs one script group and sends the action list back.
+# Flattening, validation and serialization stay with the caller.
+#
+# HIKARIN_WORKERS sets the pool size (default: up to 4, one per CPU).
+# HIKARIN_WORKERS=0 turns the pool off and runs scripts in-process like before.
+# A project compile with jobs=N needs N processes at once; when the warm pool
+# is off or smaller than that, it gets a pool of its own (see batch).
+
+WORKER_COUNT = int(os.environ.get("HIKARIN_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Workers are replaced after this many jobs, so whatever user scripts leave
+# behind (globals, patched SDK objects, imported modules) cannot pile up.
+MAX_JOBS_PER_WORKER = 50
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_in_worker = False
+
+
+def _init_worker():
+    """Runs once in every new worker: make the SDK importable and import it."""
+    global _in_worker
+    _in_worker = True
+    if str(Path.cwd()) not in sys.path:
+        sys.path.append(str(Path.cwd()))
+
+    from src.log import configure_logging
+    configure_logging()
+
+    import src.model    # noqa: F401
+    import src.modules  # noqa: F401
+    import src.compiler # noqa: F401
+    import src.build    # noqa: F401
+    import src.static_compile  # noqa: F401
+
+def _ping() -> int:
+    return os.getpid()
+
+def in_worker() -> bool:
+    return _in_worker
+
+def enabled() -> bool:
+    """True if scripts should be sent to the pool (never from inside a worker)."""
+    return WORKER_COUNT > 0 and not _in_worker
+
+def get_pool() -> ProcessPoolExecutor:
+    """The shared pool, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn' so workers never inherit the server's threads and locks
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, WORKER_COUNT),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                max_tasks_per_child=MAX_JOBS_PER_WORKER,
+            )
+        return _pool
+
+def warm_up():
+    """Starts every worker now, so the first compile does not pay for it."""
+    if not enabled():
+        return
+    pool = get_pool()
+    for future in [pool.submit(_ping) for _ in range(WORKER_COUNT)]:
+        future.result()
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def submit(fn: Callable, *args) -> Future:
+    """
+    Submits fn(*args) to the pool. If a worker died (a script called os._exit,
+    crashed the interpreter...) the broken pool is dropped so the next job gets
+    a fresh one.
+    """
+    try:
+        return get_pool().submit(fn, *args)
+    except BrokenProcessPool:
+        shutdown()
+        return get_pool().submit(fn, *args)
+
+@contextmanager
+def batch(size: int) -> Iterator[Callable[..., Future]]:
+    """
+    A submit(fn, *args) that runs up to 'size' jobs at once: the warm pool's,
+    if it has that many workers, else one of a pool started for this batch
+    (and stopped when the batch ends).
+    """
+    if enabled() and WORKER_COUNT >= size:
+        yield submit
+        return
+    pool = ProcessPoolExecutor(max_workers=size, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker)
+    try:
+        yield pool.submit
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def result(future: Future):
+    """future.result(), turning a dead worker into a readable error."""
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        shutdown()
+        raise RuntimeError("The script worker stopped unexpectedly (did a script exit or crash the interpreter?)")
+
+
+# ==========================================
+# SCRIPT JOBS
+# ==========================================
+
+def _cache_counts() -> Dict[str, Dict[str, int]]:
+    """Hit/miss counters of this process's caches, by cache."""
+    from src.bytecode import bytecode_cache
+    from src.character_cache import character_cache
+    return {"bytecode": bytecode_cache.counts(), "character": character_cache.counts()}
+
+def _merge_cache_counts(counts: Dict[str, Dict[str, int]]):
+    from src.bytecode import bytecode_cache
+    from src.character_cache import character_cache
+    bytecode_cache.merge(counts["bytecode"])
+    character_cache.merge(counts["character"])
+
+def _collect_job(project_path: Path, slug: str, group, skip_missing: bool, static: bool) -> Tuple[list, Optional[list], Set[str], list, List[str], dict, dict]:
+    """Worker side of collect_group_actions: runs the scripts, returns plain data."""
+    from src.build import collect_group_actions
+    from src.instrument import profiling
+
+    logs = []
+    before = _cache_counts()
+    try:
+        with profiling() as profiler:
+            actions, origins, character_ids, warnings = collect_group_actions(project_path, slug, group, logs, skip_missing, static)
+        # What this job added to the worker's cache counters
+        counts = {cache: {name: value - before[cache][name] for name, value in after.items()} for cache, after in _cache_counts().items()}
+        # A plain list: ActionList's bookkeeping does not survive pickling and the origins travel separately
+        return list(actions), origins, character_ids, warnings, logs, profiler.phases, counts
+    finally:
+        # The next job may be another project; don't keep its script modules around
+        for name in [name for name in sys.modules if name.startswith(f"proj_{slug}_")]:
+            del sys.modules[name]
+
+def collect_group_actions(project_path: Path, slug: str, group, logs: List[str], skip_missing: bool = True, static: bool = False) -> Tuple[list, Optional[list], Set[str], list]:
+    """
+    Same contract as src.build.collect_group_actions, but the scripts run in a
+    warm worker. Logs, import/story timings and cache counters are merged into
+    the caller's.
+    """
+    from src.instrument import merge_phases
+
+    actions, origins, character_ids, warnings, worker_logs, phases, counts = result(submit(_collect_job, project_path, slug, group, skip_missing, static))
+    logs += worker_logs
+    merge_phases(phases)
+    _merge_cache_counts(counts)
+    return actions, origins, character_ids, warnings
@@ -1,3 +1,7 @@
+// Last successful compile per URL: { etag, data }.
+// Sent back as If-None-Match so an unchanged project is answered with a bodiless 304.
+const compiledResults = new Map();
+
 export class GameRunner {
     constructor(projectSlug, groupSlug, onExitCallback) {
         this.projectSlug = projectSlug;
@@ -118,12 +122,21 @@ export class GameRunner {
      * Internal: Fetches compiled JSON from the server.
      */
     async compileProject() {
-    const url = `/api/projects/${this.projectSlug}/compile_temp/${this.groupSlug}`;
+    // 'compact' = minified + gzipped payload (the browser decompresses it for us)
+    const url = `/api/projects/${this.projectSlug}/compile_temp/${this.groupSlug}?profile=compact`;
     
     // We'll wrap the whole thing in a try...catch to be safe, 
     // though the primary error handling is inside.
     try {
-        const res = await fetch(url, { method: 'POST' });
+        const previous = compiledResults.get(url);
+        const headers = previous ? { 'If-None-Match': previous.etag } : {};
+        const res = await fetch(url, { method: 'POST', headers });
+
+        // Nothing changed since the last Run: reuse what we already have
+        // (a copy, in case the last engine modified its script)
+        if (res.status === 304 && previous) {
+            return structuredClone(previous.data);
+        }
 
         // This block now correctly handles all non-2xx responses (like 400, 404, 500)
         if (!res.ok) {
@@ -132,7 +145,20 @@ export class GameRunner {
             
             // Throw an error with the USEFUL message from the server.
             // Use errorData.detail, and have a fallback just in case.
-            throw new Error(errorData.detail || `API Error: ${res.status} ${res.statusText}`);
+            // Validation errors send an object: { message, group, diagnostics: [{ message, file, line, ... }] }
+            const detail = errorData.detail;
+            if (detail && typeof detail === 'object') {
+                const problems = (detail.diagnostics || [])
+                    .filter(d => d.severity === 'error')
+                    .map(d => d.file ? `${d.file}:${d.line} ${d.message}` : d.message);
+                const error = new Error(problems.length ? problems.join('\n') : detail.message);
+                error.type = 'compilation';
+                error.diagnostics = detail.diagnostics || [];
+                const first = error.diagnostics.find(d => d.severity === 'error' && d.file);
+                if (first) error.file = first.file;
+                throw error;
+            }
+            throw new Error(detail || `API Error: ${res.status} ${res.statusText}`);
         }
         
         // If we get here, the request was successful (status 200 OK)
@@ -142,6 +168,11 @@ export class GameRunner {
         // That kind of error is now caught by the `!res.ok` check above.
         // A successful response will always have `status: 'success'`.
 
+        const etag = res.headers.get('ETag');
+        if (etag) {
+            compiledResults.set(url, { etag, data: structuredClone(responseJson.data) });
+        }
+
         return responseJson.data;
 
     } catch (error) {
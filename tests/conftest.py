@@ -0,0 +1,38 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import project_route
+from src import workers
+from src.cache import result_cache
+
+
+@pytest.fixture(autouse=True)
+def no_worker_pool(monkeypatch):
+    """Scripts run in-process (see src/workers.py)."""
+    monkeypatch.setattr(workers, "WORKER_COUNT", 0)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """An empty project folder, with the library character 'cupa' next to it."""
+    # BASE_CHAR_PATH is relative to the working directory
+    character_dir = tmp_path / "library" / "characters" / "cupa"
+    character_dir.mkdir(parents=True)
+    (character_dir / "data.json").write_text(json.dumps({"id": "cupa", "name": "Cupa", "outfit": "default", "dyn_outfit": "casual"}), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    project = tmp_path / "project"
+    project.mkdir()
+    return project
+
+
+@pytest.fixture
+def client(project, monkeypatch):
+    """The project routes, serving the 'project' fixture folder as /api/projects/project."""
+    monkeypatch.setattr(project_route, "PROJECTS_DIR", project.parent)
+    app = FastAPI()
+    app.include_router(project_route.router)
+    yield TestClient(app)
+    result_cache.clear()
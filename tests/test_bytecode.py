@@ -0,0 +1,73 @@
+from src import bytecode, workers
+from src.build import collect_group_actions, gather_group_actions
+from src.bytecode import BytecodeCache, bytecode_cache
+from src.model import ScriptGroup
+
+SCRIPT = '''from src.modules import VisualNovelModule
+
+def story():
+    vn = VisualNovelModule()
+    vn.label('start')
+    vn.say('Cupa', 'Hello there!')
+'''
+
+
+def run(code):
+    namespace = {}
+    exec(code, namespace)
+    return namespace
+
+
+def test_edit_recompiles(tmp_path):
+    script = tmp_path / "main.py"
+    script.write_text("GREETING = 'hello'\n", encoding="utf-8")
+    cache_dir = tmp_path / ".cache" / "bytecode"
+    cache = BytecodeCache()
+
+    assert run(cache.get_code(script, cache_dir))["GREETING"] == "hello"
+    assert run(cache.get_code(script, cache_dir))["GREETING"] == "hello"
+    assert cache.counts() == {"hits": 1, "disk_hits": 0, "misses": 1}
+
+    script.write_text("GREETING = 'hello again'\n", encoding="utf-8")
+    assert run(cache.get_code(script, cache_dir))["GREETING"] == "hello again"
+    assert run(cache.get_code(script, cache_dir))["GREETING"] == "hello again"
+    assert cache.counts() == {"hits": 2, "disk_hits": 0, "misses": 2}
+
+
+def test_disk_entries(tmp_path, monkeypatch):
+    script = tmp_path / "main.py"
+    script.write_text("GREETING = 'hello'\n", encoding="utf-8")
+    cache_dir = tmp_path / ".cache" / "bytecode"
+    BytecodeCache().get_code(script, cache_dir)
+
+    # A new process starts from the disk entry
+    cache = BytecodeCache()
+    assert run(cache.get_code(script, cache_dir))["GREETING"] == "hello"
+    assert cache.counts() == {"hits": 0, "disk_hits": 1, "misses": 0}
+
+    # Another Python version cannot use it
+    monkeypatch.setattr(bytecode, "MAGIC_NUMBER", b"\x00\x00\r\n")
+    cache = BytecodeCache()
+    assert run(cache.get_code(script, cache_dir))["GREETING"] == "hello"
+    assert cache.counts() == {"hits": 0, "disk_hits": 0, "misses": 1}
+
+
+def test_worker_counts_reach_compile_stats(project, client, monkeypatch):
+    (project / "main.py").write_text(SCRIPT, encoding="utf-8")
+    group = ScriptGroup(slug="main", name="Main", source_files=["main.py"])
+    before = client.get("/api/projects/compile-stats").json()["bytecode_cache"]
+
+    monkeypatch.setattr(workers, "WORKER_COUNT", 1)
+    try:
+        # Run twice in the worker: the first compiles, the second finds the code in memory
+        for _ in range(2):
+            gather_group_actions(project, "test", group, [])
+    finally:
+        workers.shutdown()
+    collect_group_actions(project, "test", group, [])
+
+    after = client.get("/api/projects/compile-stats").json()["bytecode_cache"]
+    assert after["entries"] == before["entries"] + 1
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] + after["disk_hits"] - before["hits"] - before["disk_hits"] == 2
+    assert bytecode_cache.stats() == after
@@ -0,0 +1,114 @@
+import gzip
+import json
+import threading
+
+import pytest
+
+from src.cache import CACHE_VERSION, CachedResult, CompileCache, ResultCache, body_etag
+from src.model import ScriptGroup
+
+SCRIPT = '''from src.modules import VisualNovelModule
+
+def story():
+    vn = VisualNovelModule()
+    vn.label('start')
+    vn.say('Cupa', 'Hello there!')
+    vn.finish()
+'''
+
+
+@pytest.fixture
+def script(project):
+    (project / "main.py").write_text(SCRIPT, encoding="utf-8")
+
+
+def test_concurrent_saves_leave_a_whole_file(tmp_path):
+    group = ScriptGroup(slug="main", name="Main", source_files=["main.py"])
+    caches = []
+    for i in range(8):
+        cache = CompileCache(tmp_path)
+        cache.store(group, f"key{i}", [], {"states": i, "lines": ["x" * 1000] * 50})
+        caches.append(cache)
+
+    def save_many(cache):
+        for _ in range(20):
+            cache.save()
+
+    threads = [threading.Thread(target=save_many, args=(cache,)) for cache in caches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    data = json.loads((tmp_path / ".cache" / "compile_cache.json").read_text(encoding="utf-8"))
+    assert data["version"] == CACHE_VERSION
+    assert data["groups"]["main"]["key"] in {f"key{i}" for i in range(8)}
+    assert [p.name for p in (tmp_path / ".cache").iterdir()] == ["compile_cache.json"]
+    assert CompileCache(tmp_path).entries == data["groups"]
+
+
+def test_compile_temp_etag(client, script):
+    url = "/api/projects/project/compile_temp/behavior"
+    first = client.post(url)
+    assert first.status_code == 200
+    assert first.headers["X-Compile-Cache"] == "miss"
+    # Strong: the hash of the exact bytes sent
+    etag = first.headers["ETag"]
+    assert etag == body_etag(first.content)
+
+    second = client.post(url)
+    assert second.headers["X-Compile-Cache"] == "hit"
+    assert (second.headers["ETag"], second.content) == (etag, first.content)
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        not_modified = client.post(url, headers={"If-None-Match": if_none_match})
+        assert (not_modified.status_code, not_modified.content) == (304, b"")
+        assert not_modified.headers["ETag"] == etag
+    assert client.post(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_compile_temp_gzip_etag(client, script):
+    url = "/api/projects/project/compile_temp/behavior?profile=compact"
+    plain = client.post(url, headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    assert plain.headers["Vary"] == "Accept-Encoding"
+
+    # Same bytes once decoded, but another representation: another ETag
+    zipped = client.post(url, headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert zipped.content == plain.content
+    assert zipped.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+
+    assert client.post(url, headers={"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["ETag"]}).status_code == 304
+    assert client.post(url, headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["ETag"]}).status_code == 200
+    assert client.post(url, headers={"Accept-Encoding": "gzip;q=0", "If-None-Match": plain.headers["ETag"]}).status_code == 304
+
+
+def cached(body: bytes, gzipped: bool = False) -> CachedResult:
+    return CachedResult(body_etag(body), body, gzip.compress(body) if gzipped else None, {})
+
+
+def test_result_cache_lru():
+    cache = ResultCache(max_bytes=300)
+    cache.put("a", cached(b"a" * 100))
+    cache.put("b", cached(b"b" * 100))
+    cache.put("c", cached(b"c" * 100))
+    # Using 'a' makes 'b' the least recently used
+    assert cache.get("a").body == b"a" * 100
+    cache.put("d", cached(b"d" * 100))
+
+    assert list(cache.entries) == ["c", "a", "d"]
+    assert cache.get("b") is None
+    # Too big to ever fit: returned, never cached
+    huge = cached(b"e" * 301)
+    assert cache.put("e", huge) is huge
+    assert "e" not in cache.entries
+    assert cache.stats() == {"entries": 3, "bytes": 300, "max_bytes": 300, "hits": 1, "misses": 1, "evictions": 1}
+
+    # The gzipped body counts towards the budget too
+    entry = cached(b"f" * 100, gzipped=True)
+    cache.put("f", entry)
+    assert entry.size > 100
+    assert list(cache.entries) == ["d", "f"]
+    assert cache.total_bytes == 100 + entry.size
+    assert cache.evictions == 3
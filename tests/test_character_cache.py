@@ -0,0 +1,50 @@
+import json
+
+from src import workers
+from src.build import gather_group_actions
+from src.character_cache import CharacterCache, character_cache
+from src.model import ScriptGroup
+
+SCRIPT = '''from src.modules import VisualNovelModule
+from src.model import Character
+
+def story():
+    vn = VisualNovelModule()
+    vn.label('start')
+    vn.say(Character.from_id("cupa"), 'Hello there!')
+    vn.say(Character.from_id("cupa"), 'Hello again!')
+'''
+
+
+def test_load_copies_and_rereads(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps({"id": "cupa", "tags": ["cute"]}), encoding="utf-8")
+    cache = CharacterCache()
+
+    first = cache.load(path)
+    first["tags"].append("edited by a script")
+    assert cache.load(path) == {"id": "cupa", "tags": ["cute"]}
+    assert cache.counts() == {"hits": 1, "misses": 1}
+
+    path.write_text(json.dumps({"id": "cupa", "tags": ["cute", "new"]}), encoding="utf-8")
+    cache.invalidate(path)
+    assert cache.load(path)["tags"] == ["cute", "new"]
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2, "invalidations": 1}
+
+
+def test_worker_counts_are_merged(project, monkeypatch):
+    (project / "main.py").write_text(SCRIPT, encoding="utf-8")
+    group = ScriptGroup(slug="main", name="Main", source_files=["main.py"])
+    before = character_cache.stats()
+
+    monkeypatch.setattr(workers, "WORKER_COUNT", 1)
+    try:
+        _, _, character_ids, _ = gather_group_actions(project, "test", group, [])
+    finally:
+        workers.shutdown()
+
+    # Read twice in the worker: once from disk, once from its cache
+    after = character_cache.stats()
+    assert character_ids == {"cupa"}
+    assert (after["hits"] - before["hits"], after["misses"] - before["misses"]) == (1, 1)
+    assert after["entries"] == before["entries"]
@@ -0,0 +1,125 @@
+import io
+import json
+
+import pytest
+
+from src import records
+from src.compiler import MAX_NESTING_DEPTH, ScriptValidationError, Validator, check, encode_json, flattenVN, process_fsm, stream_fsm, validate
+
+
+def nested_records(depth: int) -> list:
+    """[Label, CondEqual([Say, CondEqual([Say, ...])])], built without recursion."""
+    body = [records.Say("Cupa", f"level {depth}")]
+    for level in range(depth - 1, -1, -1):
+        body = [records.Say("Cupa", f"level {level}"), records.CondEqual("x", level, body)]
+    return [records.Label("start")] + body
+
+
+def test_flatten_deep_records():
+    depth = 5000
+    fsm = flattenVN(nested_records(depth))
+
+    assert len(fsm) == 2 + 2 * depth
+    assert [state["id"] for state in fsm] == list(range(len(fsm)))
+    conditionals = [state for state in fsm if state["type"] == "conditional"]
+    assert len(conditionals) == depth
+    # Every body runs to the end of the script
+    assert all(state["end"] == len(fsm) for state in conditionals)
+    # A conditional's actions are the flat states themselves, one level deep each
+    assert all(fsm[child["id"]] is child for state in conditionals for child in state["actions"])
+
+
+def test_flatten_records_matches_dicts():
+    actions = nested_records(20)
+    as_dicts = [records.materialize(action) for action in actions]
+    assert flattenVN(actions) == flattenVN(as_dicts)
+
+
+@pytest.mark.parametrize("profile", ["pretty", "compact"])
+def test_compile_at_nesting_limit(profile):
+    actions = nested_records(MAX_NESTING_DEPTH)
+    fsm = process_fsm(actions)
+    data = encode_json(fsm, profile)
+
+    assert json.loads(data) == fsm
+    out = io.BytesIO()
+    stream_fsm(actions, [out], profile)
+    assert out.getvalue() == data
+
+
+def test_compile_too_deep():
+    depth = 5000
+    actions = nested_records(depth)
+    origins = [("deep.py", 1), ("deep.py", 2), ("deep.py", 3)]
+    assert len(flattenVN(actions)) == 2 + 2 * depth
+
+    for compile_fsm in (lambda: process_fsm(actions), lambda: stream_fsm(actions, [io.BytesIO()], origins=origins)):
+        with pytest.raises(ScriptValidationError) as error:
+            compile_fsm()
+        assert [d.code for d in error.value.diagnostics] == ["nesting_too_deep"]
+    assert (error.value.diagnostics[0].file, error.value.diagnostics[0].line) == ("deep.py", 3)
+
+
+def test_validator_reports_every_problem():
+    fsm = [
+        {"id": 0, "type": "label", "label": "start"},
+        {"id": 1, "type": "transition", "label": "nowhere"},
+        {"id": 2, "type": "choice", "choice": [{"label": "start", "display": "Again"}, {"label": "gone", "display": "Leave"}]},
+        {"id": 3, "type": "dialogue", "label": "Cupa", "content": "Hi"},
+        {"id": 3, "type": "dialogue", "label": "Cupa", "content": "Hi"},
+        {"id": 5, "type": "label", "label": "lonely"},
+        {"id": 6, "type": "label", "label": "start"},
+        {"id": 7, "type": "transition", "label": "nowhere"},
+    ]
+    origins = [("main.py", line) for line in range(10, 10 + len(fsm))]
+
+    diagnostics = validate(fsm, origins)
+    found = [(d.severity, d.code, d.state, d.line) for d in diagnostics]
+    assert sorted(found) == sorted([
+        ("warning", "duplicate_label", 6, 16),
+        ("error", "missing_label", 1, 11),
+        ("error", "missing_label", 7, 17),
+        ("error", "missing_label", 2, 12),
+        ("error", "duplicate_id", 4, 14),
+        # 'start' is the entry point, so only 'lonely' counts as unreachable
+        ("warning", "unreachable_label", 5, 15),
+    ])
+    assert all(d.file == "main.py" for d in diagnostics)
+
+    # check() raises with all of them, errors and warnings
+    with pytest.raises(ScriptValidationError) as error:
+        check(fsm, origins)
+    assert sorted((d.code, d.state) for d in error.value.diagnostics) == sorted((code, state) for _, code, state, _ in found)
+
+
+def test_validator_warnings_only():
+    fsm = process_fsm([
+        records.Label("start"),
+        records.Jump("end"),
+        records.Label("lonely"),
+        records.Label("end"),
+        records.Finish(),
+    ])
+    assert [(d.code, d.state, d.file) for d in check(fsm)] == [("unreachable_label", 2, None)]
+    # A label another group's event names is not unreachable
+    assert check(fsm, validator=Validator(external_labels={"lonely"})) == []
+
+
+def test_compile_temp_returns_diagnostics(project, client):
+    (project / "main.py").write_text('''from src.modules import VisualNovelModule
+
+def story():
+    vn = VisualNovelModule()
+    vn.label('start')
+    vn.jumpTo('nowhere')
+    vn.jumpTo('elsewhere')
+''', encoding="utf-8")
+
+    response = client.post("/api/projects/project/compile_temp/behavior")
+    assert response.status_code == 400
+    detail = response.json()["detail"]
+    assert detail["group"] == "behavior"
+    assert [(d["severity"], d["code"], d["state"], d["file"].endswith("main.py"), d["line"]) for d in detail["diagnostics"]] == [
+        ("error", "missing_label", 1, True, 6),
+        ("error", "missing_label", 2, True, 7),
+    ]
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from routes import project_route
+from src.build import CompileOptions
+
+MAIN = '''from src.modules import VisualNovelModule
+
+def story():
+    vn = VisualNovelModule()
+    vn.label('start')
+    vn.say('Cupa', 'See you tonight.')
+    vn.unlock_dialogue([{events}])
+    vn.finish()
+'''
+
+# night_talk comes after a finish: only main's unlock_dialogue can reach it
+IDLE = '''from src.modules import VisualNovelModule
+
+def story():
+    vn = VisualNovelModule()
+    vn.label('idle')
+    vn.say('Cupa', 'Nice weather.')
+    vn.finish()
+    vn.label('night_talk')
+    vn.say('Cupa', 'The stars are out.')
+    vn.finish()
+'''
+
+
+@pytest.fixture
+def demo(project, monkeypatch):
+    monkeypatch.setattr(project_route, "PROJECTS_DIR", project.parent)
+    (project / "manifest.json").write_text(json.dumps({
+        "slug": project.name,
+        "name": "Demo",
+        "script_groups": [
+            {"slug": "main", "name": "Main", "source_files": ["main.py"]},
+            {"slug": "idle", "name": "Idle", "source_files": ["idle.py"]},
+        ],
+    }), encoding="utf-8")
+    (project / "main.py").write_text(MAIN.replace("{events}", "'night_talk'"), encoding="utf-8")
+    (project / "idle.py").write_text(IDLE, encoding="utf-8")
+    return project
+
+
+def labels(project, group):
+    return [state["label"] for state in json.loads((project / "generated" / f"{group}.json").read_text(encoding="utf-8")) if state["type"] == "label"]
+
+
+def warnings(result, group):
+    return [(d["code"], d["message"]) for d in result["report"][group]["diagnostics"]]
+
+
+@pytest.mark.parametrize("optimize", [False, True])
+def test_labels_reached_from_another_group(demo, optimize):
+    options = CompileOptions(optimize=optimize)
+    result = project_route.run_compile(demo.name, options=options)
+
+    assert "night_talk" in labels(demo, "idle")
+    assert not any(code == "unreachable_label" for code, _ in warnings(result, "idle"))
+    symbols = json.loads((demo / "generated" / "symbols.json").read_text(encoding="utf-8"))
+    assert symbols["events"]["main"]["night_talk"]["group"] == "idle"
+
+    # Nothing changed: every group comes from the cache
+    assert project_route.run_compile(demo.name, options=options)["cache_hits"] == ["main", "idle"]
+
+
+def test_labels_no_longer_reached(demo):
+    options = CompileOptions(optimize=True)
+    project_route.run_compile(demo.name, options=options)
+
+    # idle did not change, but main's event no longer keeps night_talk alive
+    (demo / "main.py").write_text(MAIN.replace("{events}", ""), encoding="utf-8")
+    result = project_route.run_compile(demo.name, options=options)
+    assert result["cache_hits"] == []
+    assert labels(demo, "idle") == ["idle"]
+
+    result = project_route.run_compile(demo.name)
+    assert ("unreachable_label", "Label is never jumped to: night_talk") in warnings(result, "idle")
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from src.build import CompileOptions, compile_group
+from src.compiler import ScriptValidationError
+from src.model import ScriptGroup
+
+SCENE_CSV = (
+    "label,speaker,sprite,text,voice\n"
+    "scene,cupa,smile,Hello there!,\n"
+    ",Narrator,,The wind blows.,sfx/wind.ogg\n"
+)
+
+TOP_LEVEL = '''from src.modules import VisualNovelModule
+
+def story():
+    vn = VisualNovelModule()
+    vn.label('start')
+    vn.import_dialogue('scene.csv')
+    vn.finish()
+'''
+
+IN_CONDITION = '''from src.modules import VisualNovelModule
+
+def story():
+    vn = VisualNovelModule()
+    vn.label('start')
+    vn.condSame('met', 1, actions=[
+        vn.say('Cupa', 'Again?', nested=True),
+        vn.import_dialogue('scene.csv'),
+    ])
+    vn.finish()
+'''
+
+
+def compile_script(project, source, options):
+    (project / "scene.csv").write_text(SCENE_CSV, encoding="utf-8")
+    (project / "main.py").write_text(source, encoding="utf-8")
+    output_dir = project / "generated"
+    output_dir.mkdir(exist_ok=True)
+    group = ScriptGroup(slug="main", name="Main", source_files=["main.py"])
+    report, _, _ = compile_group(project, "test", group, output_dir, options)
+    return report, json.loads((output_dir / "main.json").read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("options", [CompileOptions(), CompileOptions(optimize=True)], ids=["streamed", "whole"])
+def test_import_at_top_level(project, options):
+    report, fsm = compile_script(project, TOP_LEVEL, options)
+    assert [(s["type"], s.get("label"), s.get("content")) for s in fsm] == [
+        ("label", "start", None),
+        ("label", "scene", None),
+        ("show_sprite", None, None),
+        ("dialogue", "Cupa", "Hello there!"),
+        ("dialogue", "Narrator", "The wind blows."),
+        ("finish_dialogue", None, None),
+    ]
+    assert (fsm[2]["sprite"], fsm[2]["location"]) == ("cupa", "characters/cupa/default/smile")
+    assert {"characters/cupa/default/smile", "characters/cupa/casual/smile", "sfx/wind.ogg"} <= set(report["assets"])
+
+
+@pytest.mark.parametrize("options", [CompileOptions(), CompileOptions(optimize=True)], ids=["streamed", "whole"])
+def test_import_in_condition_is_an_error(project, options):
+    with pytest.raises(ScriptValidationError) as error:
+        compile_script(project, IN_CONDITION, options)
+    [diagnostic] = error.value.diagnostics
+    assert diagnostic.code == "nested_import"
+    assert "scene.csv" in diagnostic.message
+    assert (diagnostic.file, diagnostic.line) == ("main.py", 6)
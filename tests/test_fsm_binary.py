@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from src import records
+from src.compiler import encode_json, process_fsm
+from src.fsm_binary import dumps, loads
+
+
+def sample_fsm() -> list:
+    return process_fsm([
+        records.Label("start"),
+        records.Background("bg/room.png"),
+        records.ShowCenter("cupa", "characters/cupa/default/smile.png", "characters/cupa/default/smile.png"),
+        records.Say("Cupa", "Héllo — “quoted” ✨"),
+        records.CreateVar("affection", 0),
+        records.IncrementVar("affection", 300),
+        records.SubtractVar("affection", -7),
+        records.ModifyVar("ratio", 0.25),
+        records.CondEqual("affection", 3, [
+            records.Say("Cupa", "Nested"),
+            records.CondLessThanGlobal("day", 2, [records.PlayMusic("bgm/night.ogg")]),
+        ]),
+        records.Choice([{"display": "Yes", "label": "start"}, {"display": "No", "label": "end"}]),
+        records.UnlockDialogues(["start", "end"]),
+        records.StopMusic(),
+        {"type": "custom_type", "action": "whatever", "data": {"nested": [1, None, True, False, -2**40]}},
+        records.Label("end"),
+        records.Finish(),
+    ])
+
+
+def test_round_trip():
+    fsm = sample_fsm()
+    assert loads(dumps(fsm)) == fsm
+
+
+def test_round_trip_empty():
+    assert loads(dumps([])) == []
+
+
+def test_non_str_keys_match_json():
+    fsm = [{"type": "game_action", "actions": {1: "one", 2.5: "half", True: "yes", None: "nothing"}}]
+    assert loads(dumps(fsm)) == json.loads(encode_json(fsm))
+
+
+def test_unencodable_key():
+    with pytest.raises(TypeError):
+        dumps([{"type": "game_action", "actions": {(1, 2): "pair"}}])
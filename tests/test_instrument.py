@@ -0,0 +1,99 @@
+import pytest
+
+from src.build import CompileOptions, compile_group
+from src.instrument import CompileStats, merge_phases, percentile, phase, profiling
+from src.model import ScriptGroup
+
+
+def timings(wall_ms, phases=None):
+    return {"wall_ms": wall_ms, "cpu_ms": wall_ms / 2, "phases": phases or {}}
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert [percentile(values, p) for p in (50, 90, 99, 100)] == [50, 90, 99, 100]
+    assert percentile([7.0], 50) == percentile([7.0], 99) == 7.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.0
+    assert percentile([], 90) == 0.0
+
+
+def test_summary():
+    stats = CompileStats()
+    for wall in range(1, 11):
+        stats.record("slow", "main", "compile", timings(wall * 10.0, {"story": {"wall_ms": wall * 1.0}}))
+    for wall in (1.0, 2.0):
+        stats.record("fast", "main", "compile_temp", timings(wall, {"flatten": {"wall_ms": wall}}))
+
+    summary = stats.summary()
+    assert summary["samples"] == 12
+    assert summary["wall_ms"] == {"p50": 40.0, "p90": 90.0, "p99": 100.0, "max": 100.0}
+    assert summary["cpu_ms"]["max"] == 50.0
+    assert summary["phases"] == {
+        "story": {"p50": 5.0, "p90": 9.0, "p99": 10.0, "max": 10.0},
+        "flatten": {"p50": 1.0, "p90": 2.0, "p99": 2.0, "max": 2.0},
+    }
+    # Slowest projects (by p90) first
+    assert [(entry["project"], entry["compiles"], entry["p90"]) for entry in summary["projects"]] == [("slow", 10, 90.0), ("fast", 2, 2.0)]
+
+    only_fast = stats.summary("fast")
+    assert only_fast["samples"] == 2
+    assert list(only_fast["phases"]) == ["flatten"]
+    assert CompileStats().summary()["wall_ms"] == {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+
+
+def test_summary_keeps_the_last_samples():
+    stats = CompileStats(size=3)
+    for wall in (100.0, 1.0, 2.0, 3.0):
+        stats.record("project", "main", "compile", timings(wall))
+    assert stats.summary()["wall_ms"]["max"] == 3.0
+
+
+def test_merge_phases():
+    with profiling() as profiler:
+        with phase("story") as sample:
+            sample.states = 3
+        with phase("serialize") as sample:
+            sample.bytes = 100
+        # What a worker's Profiler recorded for the same compile
+        merge_phases({
+            "story": {"wall_ms": 5.0, "cpu_ms": 4.0, "calls": 1, "states": 7},
+            "serialize": {"wall_ms": 1.0, "cpu_ms": 1.0, "calls": 2, "bytes": 50},
+            "import": {"wall_ms": 2.0, "cpu_ms": 2.0, "calls": 1},
+        })
+
+    phases = profiler.phases
+    assert phases["story"]["calls"] == 2
+    assert phases["story"]["wall_ms"] >= 5.0
+    # Counts of states are replaced, everything else adds up
+    assert phases["story"]["states"] == 7
+    assert (phases["serialize"]["calls"], phases["serialize"]["bytes"]) == (3, 150)
+    assert phases["import"] == {"wall_ms": 2.0, "cpu_ms": 2.0, "calls": 1}
+    assert list(profiler.report()["phases"]) == ["story", "serialize", "import"]
+
+    # Outside of profiling() there is nothing to merge into
+    merge_phases({"story": {"wall_ms": 1.0, "cpu_ms": 1.0, "calls": 1}})
+
+
+@pytest.mark.parametrize("options", [CompileOptions(), CompileOptions(optimize=True, jump_table=True)], ids=["streamed", "whole"])
+def test_compile_report_timings(project, options):
+    (project / "main.py").write_text('''from src.modules import VisualNovelModule
+
+def story():
+    vn = VisualNovelModule()
+    vn.label('start')
+    vn.say('Cupa', 'Hello there!')
+    vn.finish()
+''', encoding="utf-8")
+    output_dir = project / "generated"
+    output_dir.mkdir()
+    group = ScriptGroup(slug="main", name="Main", source_files=["main.py"])
+
+    report, _, _ = compile_group(project, "test", group, output_dir, options)
+    timings = report["timings"]
+    expected = ["compile", "import", "story"] + (["flatten", "sanitize", "check", "optimize", "jump_table", "serialize"] if options.optimize else ["stream"])
+    assert list(timings["phases"]) == expected
+    assert all(entry["calls"] >= 1 and entry["wall_ms"] >= 0 for entry in timings["phases"].values())
+    assert timings["wall_ms"] >= sum(entry["wall_ms"] for entry in timings["phases"].values()) - 0.01
+    written = timings["phases"]["serialize" if options.optimize else "stream"]
+    assert written["states"] == report["states"]
+    assert written["bytes"] == sum((output_dir / name).stat().st_size for name in report["outputs"])
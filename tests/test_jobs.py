@@ -0,0 +1,45 @@
+import asyncio
+import threading
+import time
+
+from src.jobs import Job
+
+
+def test_wait_events_wakes_on_progress():
+    job = Job("compile", "demo")
+
+    async def wait():
+        threading.Timer(0.05, job.progress, args=("groups",), kwargs={"force": True, "done": 1}).start()
+        started = time.monotonic()
+        events, finished = await job.wait_events(0, timeout=5)
+        return events, finished, time.monotonic() - started
+
+    events, finished, waited = asyncio.run(wait())
+    assert [(e.seq, e.event, e.data) for e in events] == [(1, "groups", {"done": 1})]
+    assert not finished
+    assert waited < 1
+    assert not job._waiters
+
+
+def test_wait_events_times_out_and_sees_the_end():
+    job = Job("compile", "demo")
+    events, finished = asyncio.run(job.wait_events(0, timeout=0.05))
+    assert (events, finished) == ([], False)
+
+    job.set_status("done")
+    events, finished = asyncio.run(job.wait_events(0, timeout=5))
+    assert [e.event for e in events] == ["status"]
+    assert finished
+
+
+def test_many_streams_share_one_thread():
+    job = Job("compile", "demo")
+
+    async def streams():
+        waits = [asyncio.create_task(job.wait_events(0, timeout=5)) for _ in range(200)]
+        await asyncio.sleep(0.05)
+        threading.Thread(target=job.set_status, args=("done",)).start()
+        return await asyncio.gather(*waits)
+
+    results = asyncio.run(streams())
+    assert all(finished and [e.event for e in events] == ["status"] for events, finished in results)
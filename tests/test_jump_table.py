@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from src import records
+from src.build import CompileOptions, compile_group
+from src.compiler import build_jump_table, process_fsm, resolve_jumps
+from src.model import ScriptGroup
+
+SCRIPT = '''from src.modules import VisualNovelModule
+
+def story():
+    vn = VisualNovelModule()
+    vn.label('start')
+    vn.choice({'left': 'Go left', 'right': 'Go right'})
+    vn.label('left')
+    vn.say('Cupa', 'Left it is.')
+    vn.jumpTo('end')
+    vn.label('right')
+    vn.condSame('met', 1, [vn.jumpTo('end', nested=True)])
+    vn.say('Cupa', 'Right it is.')
+    vn.label('end')
+    vn.finish()
+'''
+
+
+def test_resolve_jumps():
+    fsm = process_fsm([
+        records.Label("start"),
+        records.Choice([{"label": "left", "display": "Left"}, {"label": "right", "display": "Right"}]),
+        records.Label("left"),
+        records.Next("right"),
+        records.Label("right"),
+        records.CondEqual("met", 1, [records.Jump("start")]),
+        records.UnlockDialogues(["left", "right"]),
+        # Defined in another group: nothing to resolve here
+        records.RandomDialogue(["elsewhere"]),
+        records.Finish(),
+    ])
+    table = build_jump_table(fsm)
+    assert table == {"start": 0, "left": 2, "right": 4}
+
+    assert resolve_jumps(fsm, table) is fsm
+    assert [choice["target"] for choice in fsm[1]["choice"]] == [2, 4]
+    assert fsm[3]["target"] == 4
+    assert fsm[5]["actions"][0]["target"] == 0
+    assert fsm[6]["target"] == 0
+    assert fsm[7]["targets"] == [2, 4]
+    assert fsm[8]["targets"] == [None]
+
+
+def test_jump_table_keeps_the_first_label():
+    fsm = process_fsm([records.Label("start"), records.Label("again"), records.Label("start"), records.Finish()])
+    assert build_jump_table(fsm) == {"start": 0, "again": 1}
+
+
+@pytest.mark.parametrize("profile", ["pretty", "compact"])
+def test_compile_group_jump_table(project, profile):
+    (project / "main.py").write_text(SCRIPT, encoding="utf-8")
+    group = ScriptGroup(slug="main", name="Main", source_files=["main.py"])
+    streamed_dir, inline_dir = project / "streamed", project / "inline"
+    streamed_dir.mkdir()
+    inline_dir.mkdir()
+
+    # Streamed: the table comes from the validator
+    report, _, _ = compile_group(project, "test", group, streamed_dir, CompileOptions(profile=profile, jump_table=True))
+    assert "main.labels.json" in report["outputs"]
+    fsm = json.loads((streamed_dir / "main.json").read_bytes())
+    table = json.loads((streamed_dir / "main.labels.json").read_bytes())
+    assert table == build_jump_table(fsm)
+    assert all(fsm[index]["type"] == "label" and fsm[index]["label"] == label for label, index in table.items())
+    assert "target" not in fsm[1]["choice"][0]
+
+    # Inline: every reference carries its target id, no table file unless asked for
+    report, _, _ = compile_group(project, "test", group, inline_dir, CompileOptions(profile=profile, inline_jumps=True))
+    assert "main.labels.json" not in report["outputs"]
+    inlined = json.loads((inline_dir / "main.json").read_bytes())
+    assert [choice["target"] for choice in inlined[1]["choice"]] == [table["left"], table["right"]]
+    jumps = [state for state in inlined if state["type"] == "transition"]
+    assert jumps and all(state["target"] == table["end"] for state in jumps)
+    assert resolve_jumps(fsm, table) == inlined
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+from src.modules import VisualNovelModule
+
+STEPS = 20
+
+
+def contents(actions):
+    return [action["content"] for action in actions]
+
+
+def test_sessions_on_threads_keep_their_actions():
+    barrier = threading.Barrier(2)
+    results = {}
+
+    def compile_script(name):
+        with VisualNovelModule.session():
+            for step in range(STEPS):
+                # Both threads are inside their sessions between every step
+                barrier.wait()
+                VisualNovelModule().say(name, f"{name} {step}")
+                VisualNovelModule().warn("suspicious_say", f"{name} warns")
+            barrier.wait()
+            vn = VisualNovelModule()
+            results[name] = (contents(vn.to_list()), [message for _, _, message in vn.warnings])
+
+    threads = [threading.Thread(target=compile_script, args=(name,)) for name in ("cupa", "zomb")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name in ("cupa", "zomb"):
+        actions, warnings = results[name]
+        assert actions == [f"{name} {step}" for step in range(STEPS)]
+        assert warnings == [f"{name} warns"] * STEPS
+    # Nothing leaked into this thread either
+    assert VisualNovelModule.active() is None
+
+
+def test_sessions_on_tasks_keep_their_actions():
+    async def compile_script(name):
+        with VisualNovelModule.session():
+            for step in range(STEPS):
+                VisualNovelModule().say(name, f"{name} {step}")
+                await asyncio.sleep(0)
+            return contents(VisualNovelModule().to_list())
+
+    async def main():
+        return await asyncio.gather(compile_script("cupa"), compile_script("zomb"))
+
+    cupa, zomb = asyncio.run(main())
+    assert cupa == [f"cupa {step}" for step in range(STEPS)]
+    assert zomb == [f"zomb {step}" for step in range(STEPS)]
+
+
+def test_session_restores_the_outer_instance():
+    with VisualNovelModule.session():
+        outer = VisualNovelModule()
+        outer.say("Cupa", "outer")
+        with VisualNovelModule.session():
+            assert VisualNovelModule.active() is None
+            VisualNovelModule().say("Cupa", "inner")
+        assert VisualNovelModule() is outer
+        assert contents(outer.to_list()) == ["outer"]
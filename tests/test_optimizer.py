@@ -0,0 +1,212 @@
+from src import records
+from src.build import CompileOptions, build_group
+from src.compiler import build_jump_table, compact_fsm, optimize_fsm, process_fsm
+from src.model import ScriptGroup
+
+
+def optimize(actions, *passes, entry_points=()):
+    fsm, removed = optimize_fsm(process_fsm(actions), entry_points, passes or None)
+    assert [state["id"] for state in fsm] == list(range(len(fsm)))
+    return fsm, removed
+
+
+def summary(fsm):
+    """(type, what it names) per state, enough to tell which states survived."""
+    keys = ("content", "label", "background", "sprite", "music")
+    return [(state["type"], next((state[key] for key in keys if key in state), None)) for state in fsm]
+
+
+def test_coalesce_backgrounds():
+    fsm, removed = optimize([
+        records.Label("start"),
+        records.Background("day.png"),
+        records.Background("dusk.png"),
+        records.Background("night.png"),
+        records.Say("Cupa", "It got dark."),
+        records.Background("day.png"),
+        records.Finish(),
+    ], "coalesce_backgrounds")
+
+    assert removed == {"coalesce_backgrounds": 2}
+    assert summary(fsm) == [
+        ("label", "start"),
+        ("modify_background", "night.png"),
+        ("dialogue", "It got dark."),
+        ("modify_background", "day.png"),
+        ("finish_dialogue", None),
+    ]
+
+
+def test_overwritten_sprites():
+    fsm, removed = optimize([
+        records.Label("start"),
+        records.ShowCenter("cupa", "cupa/smile.png", "cupa/smile.png"),
+        records.ShowCenter("cupa", "cupa/angry.png", "cupa/angry.png"),
+        # Another character's sprite does not overwrite Cupa's
+        records.ShowCenter("zomb", "zomb/idle.png", "zomb/idle.png"),
+        records.Finish(),
+    ], "overwritten_sprites")
+
+    assert removed == {"overwritten_sprites": 1}
+    assert [state.get("location") for state in fsm] == [None, "cupa/angry.png", "zomb/idle.png", None]
+
+
+def test_overwritten_music():
+    fsm, removed = optimize([
+        records.Label("start"),
+        records.PlayMusic("calm.ogg"),
+        records.PlayMusic("battle.ogg"),
+        records.Say("Cupa", "Fight!"),
+        # A track right before stop_music stays: a jump to it would hear something else otherwise
+        records.PlayMusic("victory.ogg"),
+        records.StopMusic(),
+        records.Finish(),
+    ], "overwritten_music")
+
+    assert removed == {"overwritten_music": 1}
+    assert [(state.get("action"), state.get("music")) for state in fsm if state["type"] == "play_music"] == [
+        ("play_music", "battle.ogg"),
+        ("play_music", "victory.ogg"),
+        ("stop_music", None),
+    ]
+
+
+def test_overwritten_keeps_what_a_say_separates():
+    actions = [
+        records.Label("start"),
+        records.Background("day.png"),
+        records.Say("Cupa", "Morning."),
+        records.Background("night.png"),
+        records.PlayMusic("calm.ogg"),
+        records.Say("Cupa", "Evening."),
+        records.PlayMusic("battle.ogg"),
+        records.Finish(),
+    ]
+    fsm, removed = optimize(actions, "coalesce_backgrounds", "overwritten_music")
+    assert removed == {"coalesce_backgrounds": 0, "overwritten_music": 0}
+    assert len(fsm) == len(actions)
+
+
+def test_thread_jumps():
+    fsm, removed = optimize([
+        records.Label("start"),
+        records.Choice([{"label": "a", "display": "A"}, {"label": "end", "display": "End"}]),
+        records.Label("a"),
+        records.Jump("b"),
+        records.Label("b"),
+        records.Jump("c"),
+        records.Label("c"),
+        records.Say("Cupa", "Here."),
+        records.Jump("end"),
+        records.Label("end"),
+        records.Finish(),
+    ], "thread_jumps")
+
+    # The choice goes straight to the end of the chain; jumps that only fall through are gone,
+    # 'jump c' too once 'jump b' was threaded to it and 'jump c' dropped
+    assert [choice["label"] for choice in fsm[1]["choice"]] == ["c", "end"]
+    assert not [state for state in fsm if state["type"] == "transition"]
+    assert removed == {"thread_jumps": 3}
+
+
+def test_thread_jumps_until_nothing_changes():
+    # Dropping 'jump c' makes 'jump b' fall through to where it jumps
+    fsm, removed = optimize([
+        records.Label("start"),
+        records.Jump("b"),
+        records.Jump("c"),
+        records.Label("b"),
+        records.Label("c"),
+        records.Finish(),
+    ], "thread_jumps")
+
+    assert removed == {"thread_jumps": 2}
+    assert [state["type"] for state in fsm] == ["label", "label", "label", "finish_dialogue"]
+
+
+def test_dead_states():
+    fsm, removed = optimize([
+        records.Label("start"),
+        records.Jump("end"),
+        records.Say("Cupa", "Never said."),
+        records.Label("dead"),
+        records.Say("Cupa", "Never said either."),
+        records.Label("event"),
+        records.Say("Cupa", "Entered by the mod."),
+        records.Label("end"),
+        records.Finish(),
+    ], "dead_states", entry_points={"event"})
+
+    assert removed == {"dead_states": 3}
+    assert summary(fsm) == [
+        ("label", "start"),
+        ("transition", "end"),
+        ("label", "event"),
+        ("dialogue", "Entered by the mod."),
+        ("label", "end"),
+        ("finish_dialogue", None),
+    ]
+
+
+def test_compact_fsm_renumbers():
+    fsm = process_fsm([
+        records.Label("start"),
+        records.Background("day.png"),
+        records.CondEqual("met", 1, [
+            records.Background("dusk.png"),
+            records.Say("Cupa", "Again?"),
+        ]),
+        records.Background("night.png"),
+        records.Jump("end"),
+        records.Label("end"),
+        records.Finish(),
+    ])
+    conditional = fsm[2]
+    assert (conditional["type"], conditional["end"]) == ("conditional", 5)
+
+    # Drop the first background, the first state of the body and the state 'end' pointed at
+    keep = bytearray(b"\x01") * len(fsm)
+    for index in (1, 3, 5):
+        keep[index] = 0
+    compacted = compact_fsm(fsm, keep)
+
+    assert [state["id"] for state in compacted] == list(range(len(compacted)))
+    assert summary(compacted) == [
+        ("label", "start"),
+        ("conditional", None),
+        ("dialogue", "Again?"),
+        ("transition", "end"),
+        ("label", "end"),
+        ("finish_dialogue", None),
+    ]
+    # The body holds only its kept state, renumbered; 'end' moved on to the next kept state
+    assert conditional["actions"] == [compacted[2]]
+    assert conditional["end"] == 3
+    assert build_jump_table(compacted) == {"start": 0, "end": 4}
+
+
+def test_optimized_diagnostics_follow_their_states(project):
+    (project / "main.py").write_text('''from src.modules import VisualNovelModule
+
+def story():
+    vn = VisualNovelModule()
+    vn.label('start')
+    vn.background('day.png')
+    vn.background('night.png')
+    vn.jumpTo('end')
+    vn.label('dead')
+    vn.say('Cupa', 'Never said.')
+    vn.label('event')
+    vn.say('Cupa', 'Entered by the mod.')
+    vn.label('end')
+    vn.finish()
+''', encoding="utf-8")
+    group = ScriptGroup(slug="main", name="Main", source_files=["main.py"], entry_points=["event"])
+
+    plain = build_group(project, "test", group, [])
+    assert [(d.code, d.state) for d in plain.diagnostics] == [("unreachable_label", 4), ("unreachable_label", 6)]
+
+    optimized = build_group(project, "test", group, [], options=CompileOptions(optimize=True))
+    # 'dead' was removed with its label, 'event' moved up by three states
+    assert [(d.code, d.state) for d in optimized.diagnostics] == [("unreachable_label", 3)]
+    assert optimized.fsm[3]["label"] == "event"
@@ -0,0 +1,79 @@
+import gzip
+import json
+
+import pytest
+
+from src.build import CompileOptions, compile_group
+from src.compiler import encode_json
+from src.model import ScriptGroup
+
+SCRIPT = '''from src.modules import VisualNovelModule
+
+def story():
+    vn = VisualNovelModule()
+    vn.label('start')
+    vn.say('Cupa', 'Hello there!')
+    vn.condSame('met', 1, [vn.say('Cupa', 'Again?', nested=True)])
+    vn.finish()
+'''
+
+
+@pytest.fixture
+def group(project):
+    (project / "main.py").write_text(SCRIPT, encoding="utf-8")
+    (project / "generated").mkdir()
+    return ScriptGroup(slug="main", name="Main", source_files=["main.py"])
+
+
+def test_encode_json_profiles():
+    data = [{"id": 0, "type": "label", "label": "start"}, {"id": 1, "type": "dialogue", "content": "Hé"}]
+    pretty, compact = encode_json(data, "pretty"), encode_json(data, "compact")
+
+    assert pretty == json.dumps(data, indent=4).encode("utf-8")
+    assert compact == b'[{"id":0,"type":"label","label":"start"},{"id":1,"type":"dialogue","content":"H\\u00e9"}]'
+    assert json.loads(pretty) == json.loads(compact) == data
+
+
+@pytest.mark.parametrize("options", [CompileOptions(profile="compact"), CompileOptions(profile="compact", binary=True)], ids=["streamed", "whole"])
+def test_compact_artifacts(project, group, options):
+    output_dir = project / "generated"
+    report, _, _ = compile_group(project, "test", group, output_dir, options)
+
+    assert {"main.json", "main.json.gz"} <= set(report["outputs"])
+    data = (output_dir / "main.json").read_bytes()
+    fsm = json.loads(data)
+    assert data == encode_json(fsm, "compact")
+    # The precompressed sibling holds the very same bytes, and is reproducible
+    compressed = (output_dir / "main.json.gz").read_bytes()
+    assert gzip.decompress(compressed) == data
+    compile_group(project, "test", group, output_dir, options)
+    assert (output_dir / "main.json.gz").read_bytes() == compressed
+
+    # Back to pretty: indented, and the stale .json.gz is gone
+    report, _, _ = compile_group(project, "test", group, output_dir, CompileOptions())
+    assert report["outputs"] == ["main.json"]
+    assert (output_dir / "main.json").read_bytes() == encode_json(fsm, "pretty")
+    assert not (output_dir / "main.json.gz").exists()
+
+
+def test_generated_serves_precompressed_bytes(project, group, client):
+    url = "/api/projects/project/generated/main"
+    assert client.get(url).status_code == 404
+    compile_group(project, "test", group, project / "generated", CompileOptions(profile="compact"))
+    data = (project / "generated" / "main.json").read_bytes()
+
+    zipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert zipped.headers["Vary"] == "Accept-Encoding"
+    assert zipped.content == data
+
+    for accept in ("identity", "gzip;q=0"):
+        plain = client.get(url, headers={"Accept-Encoding": accept})
+        assert "Content-Encoding" not in plain.headers
+        assert plain.content == data
+
+    # Pretty compiles have no .json.gz to send
+    compile_group(project, "test", group, project / "generated", CompileOptions())
+    pretty = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in pretty.headers
+    assert json.loads(pretty.content) == json.loads(data)
@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+
+import pytest
+
+from src import precompile
+from src.build import CompileOptions
+from src.cache import result_cache
+from src.character_cache import character_cache
+from src.precompile import PrecompileScheduler, build_preview, preview_key
+from src.project_index import project_indexes
+
+MAIN = '''from src.modules import VisualNovelModule
+from src.model import Character
+
+def story():
+    vn = VisualNovelModule()
+    cupa = Character.from_id("cupa")
+    vn.label('start')
+    vn.say(cupa, 'Hello there!')
+    vn.finish()
+'''
+
+OTHER = '''from src.modules import VisualNovelModule
+
+def story():
+    vn = VisualNovelModule()
+    vn.label('other')
+    vn.say('Narrator', 'Nobody here.')
+    vn.finish()
+'''
+
+OPTIONS = CompileOptions(profile="compact")
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = PrecompileScheduler(delay=0.05)
+    yield scheduler
+    scheduler.shutdown()
+    result_cache.clear()
+
+
+def write_project(project):
+    (project / "main.py").write_text(MAIN, encoding="utf-8")
+    (project / "other.py").write_text(OTHER, encoding="utf-8")
+    (project / "manifest.json").write_text(json.dumps({"script_groups": [
+        {"slug": "main", "name": "Main", "source_files": ["main.py"]},
+        {"slug": "other", "name": "Other", "source_files": ["other.py"]},
+    ]}), encoding="utf-8")
+    return {group.slug: group for group in project_indexes.get(project).script_groups}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def preview(project, group):
+    """A compile_temp of the group, cached like the endpoint does."""
+    key = preview_key(project, "project", group, OPTIONS)
+    result_cache.put(key, build_preview(project, "project", group, OPTIONS))
+    return key
+
+
+def test_character_save_only_drops_its_groups(project, scheduler):
+    groups = write_project(project)
+    main_key, other_key = preview(project, groups["main"]), preview(project, groups["other"])
+    assert project_indexes.get(project).groups_for_character("cupa") == [groups["main"]]
+
+    character = project.parent / "library" / "characters" / "cupa" / "data.json"
+    character.write_text(json.dumps({"id": "cupa", "name": "Cupa-chan", "outfit": "default", "dyn_outfit": "casual"}), encoding="utf-8")
+    character_cache.invalidate(character)
+    assert scheduler.character_saved("cupa") == ["project/main"]
+    assert scheduler.character_saved("zomb") == []
+
+    # Only the group that read the character lost its response, and is compiled again
+    assert main_key not in result_cache.entries
+    assert other_key in result_cache.entries
+    assert scheduler.stats()["pending"] == 1
+    wait_for(lambda: scheduler.stats()["completed"])
+    assert scheduler.stats()["completed"] == 1
+    assert b"Cupa-chan" in result_cache.get(main_key).body
+
+
+def test_saves_debounce_into_one_compile(project, scheduler):
+    groups = write_project(project)
+    for _ in range(3):
+        assert scheduler.file_saved(project, "project", "other.py") == ["other"]
+    assert scheduler.file_saved(project, "project", "notes.txt") == []
+
+    wait_for(lambda: scheduler.stats()["completed"])
+    stats = scheduler.stats()
+    assert (stats["completed"], stats["superseded"], stats["pending"], stats["failed"]) == (1, 2, 0, 0)
+    # Only the group that lists the file was compiled
+    assert preview_key(project, "project", groups["other"], OPTIONS) in result_cache.entries
+    assert preview_key(project, "project", groups["main"], OPTIONS) not in result_cache.entries
+
+
+def test_manifest_save_schedules_every_group(project, scheduler):
+    groups = write_project(project)
+    # Already compiled by Run: nothing to do for it
+    preview(project, groups["main"])
+
+    assert scheduler.file_saved(project, "project", "manifest.json") == ["main", "other"]
+    wait_for(lambda: scheduler.stats()["completed"] + scheduler.stats()["skipped"] == 2)
+    stats = scheduler.stats()
+    assert (stats["completed"], stats["skipped"]) == (1, 1)
+
+
+def test_run_after_a_save_is_a_hit(project, scheduler, client):
+    write_project(project)
+    scheduler.file_saved(project, "project", "main.py")
+    wait_for(lambda: scheduler.stats()["completed"])
+
+    response = client.post("/api/projects/project/compile_temp/main?profile=compact")
+    assert response.status_code == 200
+    assert response.headers["X-Compile-Cache"] == "hit"
+    assert response.json()["data"][1]["content"] == "Hello there!"
+
+
+def test_save_while_compiling_drops_the_result(project, scheduler, monkeypatch):
+    groups = write_project(project)
+    started, release = threading.Event(), threading.Event()
+    compiled = []
+
+    def slow_preview(*args, **kwargs):
+        compiled.append(args[2].slug)
+        if len(compiled) == 1:
+            started.set()
+            release.wait(5)
+        return build_preview(*args, **kwargs)
+
+    monkeypatch.setattr(precompile, "build_preview", slow_preview)
+    scheduler.file_saved(project, "project", "main.py")
+    assert started.wait(5)
+    # Saved again mid-compile: the running job's result may mix old and new sources
+    scheduler.file_saved(project, "project", "main.py")
+    release.set()
+
+    wait_for(lambda: scheduler.stats()["completed"])
+    stats = scheduler.stats()
+    assert compiled == ["main", "main"]
+    assert (stats["completed"], stats["superseded"]) == (1, 1)
+    assert preview_key(project, "project", groups["main"], OPTIONS) in result_cache.entries
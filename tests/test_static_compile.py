@@ -0,0 +1,143 @@
+import pytest
+
+from src.build import collect_group_actions
+from src.model import ScriptGroup
+from src.modules import VisualNovelModule
+from src.records import materialize
+from src.static_compile import DynamicScript, run_static
+
+# New project script (routes/project_route.py, create_project)
+PROJECT_TEMPLATE = (
+    "from src.modules import VisualNovelModule\n"
+    "from src.model import Character\n\n"
+    "vn = VisualNovelModule()\n\n"
+    "def story():\n"
+    "    vn.label('start')\n"
+    "    vn.say('', 'Hello World!')\n"
+    "    vn.finish()\n"
+    "    return vn.dialogueDict\n"
+)
+
+# New file in the editor (static/hikarin/js/file_manager.js)
+EDITOR_TEMPLATE = (
+    "# Script: scene.py\n"
+    "from src.modules import VisualNovelModule\n\n"
+    "vn = VisualNovelModule()\n\n"
+    "def story():\n"
+    "    vn.label('start')\n"
+    "    vn.say('Player', 'Hello World!')\n"
+    "    vn.finish()\n"
+)
+
+# What the Blockly blocks generate (static/hikarin/js/custom_blocks)
+BLOCKLY_SCRIPT = '''from src.modules import VisualNovelModule
+from src.model import Character
+
+def story():
+  vn = VisualNovelModule()
+
+  cupa = Character.from_id("cupa")
+  vn.start()
+  vn.label("intro")
+  vn.show(cupa, 'smile')
+  vn.say(cupa, 'Hello there!')
+  vn.speak(cupa, 'waves', voice='voice/wave.ogg')
+  vn.speak(cupa, 'Listen.', voice='voice/listen.ogg')
+  vn.setVar('affection', 0)
+  vn.addVar('affection', 2)
+  vn.setGlobal('day', 1)
+  vn.choice({
+    'good': 'Be nice',
+    'bad': 'Be rude',
+    })
+  vn.label("good")
+  actions_list = [
+    vn.say(cupa, 'Thanks!', nested=True),
+    vn.show_left(cupa, 'happy', nested=True),
+    vn.jumpTo("end", nested=True),
+    ]
+  vn.condSame('affection', 2, actions=actions_list)
+  actions_list = [
+    vn.label("night",nested=True),
+    vn.unlock_dialogue(['night_talk', 'idle'], nested=True),
+    ]
+  vn.condNight(actions=actions_list)
+  vn.label("bad")
+  vn.remove(cupa)
+  vn.show_custom('images', 'cg/sunset', 16, 9, 16, 9, 1, 1)
+  vn.subVarGlobal('day', -1)
+  vn.label("end")
+  vn.idle_chats()
+  vn.finish()
+
+  return vn.dialogueDict
+'''
+
+# A loop and an f-string after some calls: run_static has to undo those calls
+LOOP_SCRIPT = '''from src.modules import VisualNovelModule
+
+vn = VisualNovelModule()
+
+def story():
+    vn.label('loop')
+    vn.say('Cupa', 'before')
+    for i in range(3):
+        vn.say('Cupa', 'again')
+    vn.finish()
+'''
+
+FSTRING_SCRIPT = '''from src.modules import VisualNovelModule
+
+vn = VisualNovelModule()
+name = "Cupa"
+
+def story():
+    vn.label('fstring')
+    vn.say(name, f"Hi, {name}")
+    vn.finish()
+'''
+
+
+def compile_both(project, scripts: dict):
+    for filename, source in scripts.items():
+        (project / filename).write_text(source, encoding="utf-8")
+    group = ScriptGroup(slug="main", name="Main", source_files=list(scripts))
+    results = []
+    for static in (True, False):
+        logs = []
+        actions, origins, character_ids, warnings = collect_group_actions(project, "test", group, logs, static=static)
+        results.append(((materialize(list(actions)), origins, character_ids, warnings), logs))
+    return results
+
+
+@pytest.mark.parametrize("source", [PROJECT_TEMPLATE, EDITOR_TEMPLATE, BLOCKLY_SCRIPT], ids=["project", "editor", "blockly"])
+def test_static_matches_exec(project, source):
+    (static, static_logs), (executed, _) = compile_both(project, {"scene.py": source})
+    assert static == executed
+    assert "Compiled statically" in static_logs[0]
+
+
+def test_static_matches_exec_across_files(project):
+    (static, static_logs), (executed, _) = compile_both(project, {"intro.py": PROJECT_TEMPLATE, "scene.py": BLOCKLY_SCRIPT})
+    assert static == executed
+    assert all("Compiled statically" in line for line in static_logs)
+
+
+@pytest.mark.parametrize("source", [LOOP_SCRIPT, FSTRING_SCRIPT], ids=["loop", "fstring"])
+def test_dynamic_script_falls_back(project, source):
+    (project / "intro.py").write_text(BLOCKLY_SCRIPT, encoding="utf-8")
+    (project / "dynamic.py").write_text(source, encoding="utf-8")
+
+    with VisualNovelModule.session(project):
+        assert run_static(project / "intro.py")
+        vn = VisualNovelModule()
+        before = (materialize(list(vn.dialogueDict)), vn.dialogueDict.resolved_origins(), list(vn.warnings))
+
+        with pytest.raises(DynamicScript):
+            run_static(project / "dynamic.py")
+        assert VisualNovelModule.active() is vn
+        assert (materialize(list(vn.dialogueDict)), vn.dialogueDict.resolved_origins(), list(vn.warnings)) == before
+
+    (static, static_logs), (executed, _) = compile_both(project, {"intro.py": BLOCKLY_SCRIPT, "dynamic.py": source})
+    assert static == executed
+    assert "executing it instead" in static_logs[1]
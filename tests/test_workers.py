@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+from src import workers
+from src.build import CompileOptions, compile_group, compile_groups
+from src.compiler import ScriptValidationError
+from src.model import ScriptGroup
+
+MAIN = '''from src.modules import VisualNovelModule
+from src.model import Character
+
+def story():
+    vn = VisualNovelModule()
+    cupa = Character.from_id("cupa")
+    vn.label('start')
+    vn.show(cupa, 'smile')
+    vn.speak(cupa, 'hmm', voice='voice/hmm.ogg')
+    vn.setVar('met', 1)
+    vn.condSame('met', 1, [vn.say(cupa, 'Hi again!', nested=True), vn.jumpTo('end', nested=True)])
+    vn.label('end')
+    vn.import_dialogue('scene.csv')
+    vn.finish()
+'''
+
+SCENE_CSV = "label,speaker,sprite,text,voice\nscene,cupa,smile,A whole scene.,\n"
+
+BROKEN = '''from src.modules import VisualNovelModule
+
+def story():
+    vn = VisualNovelModule()
+    vn.label('start')
+    vn.jumpTo('nowhere')
+'''
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A warm pool of one worker, stopped after the test."""
+    monkeypatch.setattr(workers, "WORKER_COUNT", 1)
+    yield
+    workers.shutdown()
+
+
+def write_project(project):
+    (project / "main.py").write_text(MAIN, encoding="utf-8")
+    (project / "scene.csv").write_text(SCENE_CSV, encoding="utf-8")
+    (project / "broken.py").write_text(BROKEN, encoding="utf-8")
+    return ScriptGroup(slug="main", name="Main", source_files=["main.py"])
+
+
+def compile_into(project, group, name, options):
+    output_dir = project / name
+    output_dir.mkdir()
+    report, _, character_ids = compile_group(project, "test", group, output_dir, options)
+    return report, character_ids, (output_dir / "main.json").read_bytes()
+
+
+@pytest.mark.parametrize("options", [CompileOptions(), CompileOptions(optimize=True, profile="compact")], ids=["streamed", "whole"])
+def test_pool_compile_matches_in_process(project, monkeypatch, options):
+    group = write_project(project)
+    local_report, local_characters, local_output = compile_into(project, group, "local", options)
+
+    monkeypatch.setattr(workers, "WORKER_COUNT", 1)
+    try:
+        pooled_report, pooled_characters, pooled_output = compile_into(project, group, "pooled", options)
+    finally:
+        workers.shutdown()
+
+    assert pooled_output == local_output
+    assert pooled_characters == local_characters == {"cupa"}
+    for key in ("states", "diagnostics", "assets", "symbols"):
+        assert pooled_report[key] == local_report[key]
+    assert [d["code"] for d in pooled_report["diagnostics"]] == ["suspicious_say", "unreachable_label"]
+    # The scripts ran in the worker; its phases were merged into this compile's timings
+    assert pooled_report["timings"]["phases"]["story"]["calls"] == 1
+    assert pooled_report["timings"]["phases"]["import"]["calls"] == 1
+
+
+def test_pool_script_error(project, pool):
+    write_project(project)
+    group = ScriptGroup(slug="broken", name="Broken", source_files=["broken.py"])
+    output_dir = project / "generated"
+    output_dir.mkdir()
+
+    # Raised inside the worker, pickled back with its diagnostics and group
+    with pytest.raises(ScriptValidationError) as error:
+        workers.result(workers.submit(compile_group, project, "test", group, output_dir, CompileOptions()))
+    assert error.value.group == "broken"
+    assert [d.code for d in error.value.diagnostics] == ["missing_label"]
+    assert (error.value.diagnostics[0].file, error.value.diagnostics[0].line) == ("broken.py", 6)
+
+
+@pytest.mark.parametrize("worker_count", [0, 1], ids=["pool off", "pool too small"])
+def test_jobs_get_a_pool_of_their_own(project, monkeypatch, worker_count):
+    """jobs=2 runs two processes at once even when the warm pool is off or has one worker."""
+    write_project(project)
+    monkeypatch.setattr(os, "cpu_count", lambda: 2)
+    monkeypatch.setattr(workers, "WORKER_COUNT", worker_count)
+    groups = [
+        ScriptGroup(slug="main", name="Main", source_files=["main.py"]),
+        ScriptGroup(slug="broken", name="Broken", source_files=["broken.py"]),
+    ]
+    output_dir = project / "generated"
+    output_dir.mkdir()
+
+    results = compile_groups(project, "test", groups, output_dir, jobs=2)
+    try:
+        group, report, logs, character_ids = next(results)
+        assert (group.slug, report["status"], character_ids) == ("main", "success", {"cupa"})
+        assert report["timings"]["phases"]["story"]["calls"] == 1
+        with pytest.raises(ScriptValidationError) as error:
+            next(results)
+        assert error.value.group == "broken"
+    finally:
+        results.close()
+        workers.shutdown()